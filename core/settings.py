@@ -44,10 +44,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'tasks.estaticos.EstaticosComprimidosMiddleware',  # Antes de sesión/auth: los estáticos no las necesitan
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tasks.perfilado.PerfiladoMiddleware',  # Perfilado a demanda (staff): necesita request.user
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,6 +66,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'tasks.notificaciones.contador',
             ],
         },
     },
@@ -129,6 +132,28 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# collectstatic deja aquí los archivos con hash en el nombre y sus versiones .gz/.br
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "tasks.estaticos.AlmacenEstaticosComprimidos"},
+}
+
+# Caché compartida por todos los workers. Las versiones de calendario, el contador
+# de notificaciones y las facetas del tablero se invalidan escribiendo en la caché:
+# con la LocMemCache por defecto (una por proceso) el cambio solo lo vería el
+# worker que lo atendió. Con REDIS_URL (requiere el paquete redis) se usa Redis;
+# si no, una tabla de la base, que crea la migración tasks 0030.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.environ['REDIS_URL']},
+    }
+else:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache_compartida'},
+    }
+
 # ... (Debajo de STATIC_ROOT) ...
 
 # URL base para acceder a las fotos
@@ -137,6 +162,14 @@ MEDIA_URL = '/media/'
 # Carpeta física donde se guardarán las fotos
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Quién transfiere los archivos subidos después de verificar el acceso:
+#   None               -> Django, por bloques y con soporte de Range
+#   'x-accel-redirect' -> nginx, con una location interna sobre MEDIA_ROOT:
+#                         location /media-interno/ { internal; alias /ruta/a/media/; }
+#   'x-sendfile'       -> Apache (mod_xsendfile) o lighttpd
+MEDIA_ENVIO = None
+MEDIA_PREFIJO_INTERNO = '/media-interno/'
+
 # ... al final del archivo ...
 
 # A dónde ir después de loguearse (si no iba a una url específica)
@@ -149,3 +182,10 @@ LOGOUT_REDIRECT_URL = 'login'
 LOGIN_URL = 'login'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Perfilado de peticiones (tasks/perfilado.py). El staff lo pide con la cabecera
+# X-Perfilar: 1 o con ?perfilar=1; además se muestrea esta fracción de las
+# peticiones (0 = nunca), opcionalmente solo de los usuarios listados.
+PERFILADO_MUESTREO = 0.0
+PERFILADO_USUARIOS = []
+PERFILADO_MAXIMO = 500
@@ -1,7 +1,6 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from tasks import views 
 
 urlpatterns = [
@@ -14,7 +13,7 @@ urlpatterns = [
     path('', include('tasks.urls')),
     
     path('accounts/', include('django.contrib.auth.urls')),
-]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Archivos subidos: siempre con control de acceso (también en producción)
+    re_path(r'^%s(?P<ruta>.+)$' % settings.MEDIA_URL.lstrip('/'), views.archivo_subido, name='archivo_subido'),
+]
@@ -0,0 +1,36 @@
+from collections import defaultdict
+
+from .models import Tarea, Proyecto, Actividad
+
+
+def destinatarios_por_tarea(tareas):
+    """
+    {tarea_id: {user_id, ...}} con dueño, responsable, colaboradores y
+    equipo del proyecto. Tres consultas sin importar cuántas tareas sean.
+    """
+    destinatarios = {t.id: {t.usuario_id} | ({t.responsable_id} if t.responsable_id else set()) for t in tareas}
+    for tarea_id, user_id in Tarea.compartida_con.through.objects.filter(
+        tarea_id__in=destinatarios
+    ).values_list('tarea_id', 'user_id'):
+        destinatarios[tarea_id].add(user_id)
+
+    por_proyecto = defaultdict(set)
+    for t in tareas:
+        if t.proyecto_id: por_proyecto[t.proyecto_id].add(t.id)
+    if por_proyecto:
+        miembros = list(Proyecto.objects.filter(id__in=por_proyecto).values_list('id', 'usuario_id'))
+        miembros += Proyecto.equipo.through.objects.filter(proyecto_id__in=por_proyecto).values_list('proyecto_id', 'user_id')
+        for proyecto_id, user_id in miembros:
+            for tarea_id in por_proyecto[proyecto_id]:
+                destinatarios[tarea_id].add(user_id)
+    return destinatarios
+
+
+def registrar_actividad(tarea, autor, tipo, texto='', monto=0, historial=None):
+    """Escribe el movimiento en el feed de cada destinatario con un solo INSERT."""
+    filas = []
+    for uid in destinatarios_por_tarea([tarea])[tarea.id]:
+        fila = Actividad(usuario_id=uid, autor=autor, tarea=tarea, historial=historial, tipo=tipo, texto=texto, monto=monto)
+        if historial: fila.fecha = historial.fecha
+        filas.append(fila)
+    Actividad.objects.bulk_create(filas)
@@ -0,0 +1,140 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .models import HistorialAvance, Perfil
+from .permisos import tareas_visibles_para
+
+# ======================================================
+# ARCHIVOS SUBIDOS (ADJUNTOS Y FOTOS DE PERFIL)
+# ======================================================
+# Todo lo que está bajo MEDIA_ROOT pasa por una vista con login: el adjunto de
+# un avance solo lo descarga quien puede ver la tarea (una consulta), las fotos
+# de perfil cualquier usuario logueado y el resto no se sirve.
+#
+# Verificado el acceso, la transferencia la hace el servidor del frente si
+# MEDIA_ENVIO lo indica (X-Accel-Redirect en nginx, X-Sendfile en Apache o
+# lighttpd); si no, Django la hace por bloques, con Range (para retomar
+# descargas y adelantar videos) y con ETag/Last-Modified para responder 304.
+
+BLOQUE = 64 * 1024
+CARPETA_ADJUNTOS = HistorialAvance._meta.get_field('archivo').upload_to
+CARPETA_FOTOS = Perfil._meta.get_field('imagen').upload_to
+FOTO_POR_DEFECTO = Perfil._meta.get_field('imagen').default
+_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def puede_descargar(usuario_id, relativa):
+    if '..' in relativa.split('/'):
+        return False  # perfiles_fotos/../x saldría de la carpeta permitida
+    if relativa.startswith(CARPETA_ADJUNTOS + '/'):
+        return HistorialAvance.objects.filter(
+            archivo=relativa, tarea__in=tareas_visibles_para(usuario_id)
+        ).exists()
+    return relativa.startswith(CARPETA_FOTOS + '/') or relativa == FOTO_POR_DEFECTO
+
+
+def _rango(request, tamano, etag, modificado):
+    """
+    (inicio, fin) del rango pedido, None para mandar el archivo entero o False
+    si el rango cae fuera del archivo. Varios rangos a la vez no se atienden:
+    se manda el archivo completo, que la norma permite.
+    """
+    m = _RANGO.match(request.META.get('HTTP_RANGE', '').strip())
+    if not m or not any(m.groups()):
+        return None
+    # If-Range: el rango vale solo si el archivo sigue siendo el mismo que tiene el cliente
+    si_rango = request.META.get('HTTP_IF_RANGE', '').strip()
+    if si_rango:
+        if si_rango.startswith(('"', 'W/')):
+            if si_rango != etag:
+                return None
+        elif parse_http_date_safe(si_rango) != modificado:
+            return None
+
+    inicio, fin = m.groups()
+    if inicio:
+        inicio = int(inicio)
+        if fin and int(fin) < inicio:
+            return None  # Rango mal formado: se ignora
+        fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    else:
+        # bytes=-N: los últimos N bytes
+        if not int(fin):
+            return False
+        inicio, fin = max(tamano - int(fin), 0), tamano - 1
+    if inicio >= tamano:
+        return False
+    return inicio, fin
+
+
+def _leer(ruta, inicio, largo):
+    with open(ruta, 'rb') as f:
+        f.seek(inicio)
+        while largo > 0:
+            datos = f.read(min(BLOQUE, largo))
+            if not datos:
+                return
+            largo -= len(datos)
+            yield datos
+
+
+def _entregar(request, ruta, relativa, estado, etag):
+    envio = getattr(settings, 'MEDIA_ENVIO', None)
+    tipo, _ = mimetypes.guess_type(ruta)
+    if envio == 'x-accel-redirect':
+        # nginx atiende Range y cierra la transferencia sin ocupar al worker
+        respuesta = HttpResponse(content_type=tipo or 'application/octet-stream')
+        respuesta.headers['X-Accel-Redirect'] = settings.MEDIA_PREFIJO_INTERNO.rstrip('/') + '/' + quote(relativa)
+        return respuesta
+    if envio == 'x-sendfile':
+        respuesta = HttpResponse(content_type=tipo or 'application/octet-stream')
+        respuesta.headers['X-Sendfile'] = ruta
+        return respuesta
+
+    tamano = estado.st_size
+    rango = _rango(request, tamano, etag, int(estado.st_mtime))
+    if rango is False:
+        respuesta = HttpResponse(status=416)
+        respuesta.headers['Content-Range'] = f'bytes */{tamano}'
+    elif rango is None:
+        # FileResponse usa wsgi.file_wrapper (sendfile) si el servidor lo ofrece
+        respuesta = FileResponse(open(ruta, 'rb'))
+    else:
+        inicio, fin = rango
+        respuesta = StreamingHttpResponse(
+            _leer(ruta, inicio, fin - inicio + 1), status=206, content_type=tipo or 'application/octet-stream'
+        )
+        respuesta.headers['Content-Length'] = str(fin - inicio + 1)
+        respuesta.headers['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    respuesta.headers['Accept-Ranges'] = 'bytes'
+    return respuesta
+
+
+def servir(request, relativa):
+    """Entrega un archivo de MEDIA_ROOT. El acceso ya debe estar verificado."""
+    try:
+        ruta = safe_join(settings.MEDIA_ROOT, relativa)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(ruta):
+        raise Http404
+
+    estado = os.stat(ruta)
+    etag = f'"{estado.st_size:x}-{int(estado.st_mtime):x}"'
+    respuesta = get_conditional_response(request, etag=etag, last_modified=int(estado.st_mtime))
+    if respuesta is None:
+        respuesta = _entregar(request, ruta, relativa, estado, etag)
+    respuesta.headers['ETag'] = etag
+    respuesta.headers['Last-Modified'] = http_date(estado.st_mtime)
+    # Contenido con control de acceso: solo la caché del navegador
+    respuesta.headers['Cache-Control'] = 'private, max-age=3600'
+    return respuesta
@@ -1,18 +1,321 @@
-from django.contrib import admin
-from .models import Tarea, Etiqueta, Perfil, HistorialAvance, Proyecto
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html, format_html_join
+from .models import Tarea, Etiqueta, Perfil, HistorialAvance, Proyecto, PlantillaProyecto, ArchivoPendiente, ResumenEnviado, Actividad, Dependencia, Recurrencia, EventoTarea, InstantaneaDiaria, Perfilado, CambioSync, Notificacion
+from .perfilado import resumen_funciones
+from .masivo import cerrar_tareas, reasignar_responsable, contar_traspaso, traspasar_usuario, ETIQUETAS_TRASPASO
 
-class TareaAdmin(admin.ModelAdmin):
+# ======================================================
+# PIEZAS PARA TABLAS GRANDES
+# ======================================================
+
+class PaginadorEstimado(Paginator):
+    """
+    Sin filtros, en PostgreSQL el total sale de las estadísticas del planificador
+    (pg_class.reltuples) en lugar de un COUNT(*) que recorre toda la tabla.
+    Con filtros, o si la tabla es chica o nunca se analizó, se cuenta exacto.
+    """
+    MINIMO_ESTIMADO = 10000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        conexion = connections[qs.db]
+        if conexion.vendor == 'postgresql' and not qs.query.where:
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [qs.model._meta.db_table])
+                fila = cursor.fetchone()
+            if fila and fila[0] >= self.MINIMO_ESTIMADO:
+                return fila[0]
+        return super().count
+
+
+class FiltroAutocompletar(admin.RelatedFieldListFilter):
+    """Filtro por FK que busca con el autocompletado del admin en vez de listar todas las opciones."""
+    template = 'admin/filtro_autocompletar.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.admin_site = model_admin.admin_site
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def field_choices(self, field, request, model_admin):
+        return []
+
+    def has_output(self):
+        return True
+
+    def selector(self):
+        campo = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model._default_manager.all(), required=False,
+            widget=AutocompleteSelect(self.field, self.admin_site, attrs={'class': 'filtro-autocompletar', 'style': 'width: 100%'}),
+        )
+        valor = self.lookup_val[0] if isinstance(self.lookup_val, list) else self.lookup_val
+        return campo.widget.render(self.lookup_kwarg, valor)
+
+
+class AdminEscalable(admin.ModelAdmin):
+    # Sin el COUNT(*) extra del total sin filtrar y con el total estimado en el paginador
+    show_full_result_count = False
+    paginator = PaginadorEstimado
+
+    @property
+    def media(self):
+        # Select2 y autocomplete.js para los FiltroAutocompletar del listado
+        return super().media + AutocompleteSelect(Tarea._meta.get_field('usuario'), self.admin_site).media
+
+
+class ReasignarForm(forms.Form):
+    def __init__(self, *args, admin_site=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        campo = Tarea._meta.get_field('responsable')
+        self.fields['responsable'] = forms.ModelChoiceField(
+            queryset=campo.remote_field.model._default_manager.all(), required=False, label='Nuevo responsable',
+            widget=AutocompleteSelect(campo, admin_site, attrs={'style': 'width: 20em'}),
+        )
+
+
+class TraspasoForm(forms.Form):
+    propiedad = forms.BooleanField(required=False, label='Traspasar también las tareas y proyectos de los que es dueño')
+
+    def __init__(self, *args, admin_site=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        campo = Tarea._meta.get_field('responsable')
+        self.fields['nuevo'] = forms.ModelChoiceField(
+            queryset=campo.remote_field.model._default_manager.filter(is_active=True), label='Pasar todo a',
+            widget=AutocompleteSelect(campo, admin_site, attrs={'style': 'width: 20em'}),
+        )
+        self.order_fields(['nuevo', 'propiedad'])
+
+# ======================================================
+# MODELOS
+# ======================================================
+
+class TareaAdmin(AdminEscalable):
     list_display = ('titulo', 'usuario', 'proyecto', 'fecha_objetivo', 'estado')
-    list_filter = ('estado', 'usuario', 'proyecto')
+    list_select_related = ('usuario', 'proyecto')
+    list_filter = ('estado', ('usuario', FiltroAutocompletar), ('proyecto', FiltroAutocompletar))
     search_fields = ('titulo', 'usuario__username')
-    filter_horizontal = ('etiquetas', 'compartida_con')
+    autocomplete_fields = ('usuario', 'responsable', 'proyecto', 'etiquetas', 'compartida_con')
+    # Cubierto por tarea_vencimiento_idx (fecha_objetivo es su primera columna)
+    date_hierarchy = 'fecha_objetivo'
+    actions = ['cerrar', 'reasignar']
+
+    @admin.action(description='Cerrar (marcar como completadas)')
+    def cerrar(self, request, queryset):
+        cerradas = cerrar_tareas(queryset)
+        self.message_user(request, f'{cerradas} tareas cerradas.', messages.SUCCESS)
+
+    @admin.action(description='Reasignar responsable…')
+    def reasignar(self, request, queryset):
+        # Página intermedia: se elige el responsable y se vuelve a enviar la acción
+        if 'aplicar' in request.POST:
+            form = ReasignarForm(request.POST, admin_site=self.admin_site)
+            if form.is_valid():
+                cambiadas = reasignar_responsable(queryset, form.cleaned_data['responsable'])
+                self.message_user(request, f'{cambiadas} tareas reasignadas.', messages.SUCCESS)
+                return None
+        else:
+            form = ReasignarForm(admin_site=self.admin_site)
+        return TemplateResponse(request, 'admin/reasignar_tareas.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Reasignar responsable',
+            'opts': self.model._meta,
+            'form': form,
+            'seleccion': request.POST.getlist(admin.helpers.ACTION_CHECKBOX_NAME),
+            'seleccionar_todo': request.POST.get('select_across', '0'),
+            'total': queryset.count(),
+            'media': self.media + form.media,
+        })
 
 class ProyectoAdmin(admin.ModelAdmin):
     list_display = ('titulo', 'usuario', 'presupuesto', 'fecha_inicio')
-    filter_horizontal = ('equipo',)
+    list_select_related = ('usuario',)
+    search_fields = ('titulo',)
+    autocomplete_fields = ('usuario', 'equipo')
+
+class EtiquetaAdmin(admin.ModelAdmin):
+    search_fields = ('nombre',)
+
+class HistorialAvanceAdmin(AdminEscalable):
+    list_display = ('fecha', 'tarea', 'usuario', 'monto')
+    list_select_related = ('tarea', 'usuario')
+    list_filter = (('usuario', FiltroAutocompletar),)
+    autocomplete_fields = ('tarea', 'usuario')
+    date_hierarchy = 'fecha'
+
+class ActividadAdmin(AdminEscalable):
+    list_display = ('fecha', 'tipo', 'autor', 'usuario', 'tarea')
+    list_select_related = ('autor', 'usuario', 'tarea')
+    list_filter = ('tipo', ('usuario', FiltroAutocompletar))
+    raw_id_fields = ('usuario', 'autor', 'tarea', 'historial')
+
+class EventoTareaAdmin(AdminEscalable):
+    list_display = ('fecha', 'campo', 'tarea_id', 'proyecto_id', 'anterior', 'nuevo')
+    list_filter = ('campo',)
+    raw_id_fields = ('tarea', 'proyecto')
+
+class NotificacionAdmin(AdminEscalable):
+    list_display = ('fecha', 'usuario', 'tipo', 'texto', 'leida')
+    list_select_related = ('usuario',)
+    list_filter = ('tipo', 'leida', ('usuario', FiltroAutocompletar))
+    raw_id_fields = ('usuario', 'autor', 'tarea')
+
+class CambioSyncAdmin(AdminEscalable):
+    list_display = ('fecha', 'modelo', 'objeto_id', 'tipo', 'usuario', 'proyecto_id')
+    list_select_related = ('usuario',)
+    list_filter = ('modelo', 'tipo')
+    raw_id_fields = ('usuario', 'proyecto')
+
+class DependenciaAdmin(AdminEscalable):
+    list_display = ('tarea', 'requisito', 'creada_el')
+    list_select_related = ('tarea', 'requisito')
+    autocomplete_fields = ('tarea', 'requisito')
+
+class RecurrenciaAdmin(AdminEscalable):
+    list_display = ('origen', 'frecuencia', 'intervalo', 'fecha_fin', 'generada_hasta')
+    list_select_related = ('origen',)
+    list_filter = ('frecuencia',)
+    autocomplete_fields = ('origen',)
+
+class InstantaneaDiariaAdmin(AdminEscalable):
+    list_display = ('fecha', 'proyecto', 'ultimo_evento')
+    list_select_related = ('proyecto',)
+    list_filter = (('proyecto', FiltroAutocompletar),)
+    autocomplete_fields = ('proyecto',)
+
+class ResumenEnviadoAdmin(AdminEscalable):
+    list_display = ('fecha', 'usuario', 'enviado_el')
+    list_select_related = ('usuario',)
+    list_filter = (('usuario', FiltroAutocompletar),)
+    raw_id_fields = ('usuario',)
+
+class ArchivoPendienteAdmin(AdminEscalable):
+    list_display = ('ruta', 'encolado_el')
+
+class PlantillaProyectoAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'usuario', 'creado_el')
+    list_select_related = ('usuario',)
+    search_fields = ('nombre',)
+    autocomplete_fields = ('usuario', 'origen')
+
+class PerfilAdmin(admin.ModelAdmin):
+    list_display = ('usuario',)
+    list_select_related = ('usuario',)
+    autocomplete_fields = ('usuario',)
+
+class UsuarioAdmin(UserAdmin):
+    actions = ['traspasar']
+
+    @admin.action(description='Traspasar su trabajo a otro usuario…')
+    def traspasar(self, request, queryset):
+        # Página intermedia: primero muestra lo que se movería, y solo con 'aplicar' lo hace
+        form = TraspasoForm(request.POST if 'simular' in request.POST or 'aplicar' in request.POST else None,
+                            admin_site=self.admin_site)
+        usuarios = list(queryset)
+        resumen = None
+        if form.is_valid():
+            nuevo, propiedad = form.cleaned_data['nuevo'], form.cleaned_data['propiedad']
+            if any(u.pk == nuevo.pk for u in usuarios):
+                form.add_error('nuevo', 'Debe ser alguien distinto de los usuarios seleccionados.')
+            elif 'aplicar' in request.POST:
+                with transaction.atomic():
+                    for usuario in usuarios:
+                        cuentas = traspasar_usuario(usuario, nuevo, incluir_propiedad=propiedad)
+                        self.message_user(request, f"{usuario.username} → {nuevo.username}: " + (', '.join(
+                            f'{n} {ETIQUETAS_TRASPASO[clave]}' for clave, n in cuentas.items() if n
+                        ) or 'nada que traspasar'), messages.SUCCESS)
+                return None
+            else:
+                resumen = [(u, [(ETIQUETAS_TRASPASO[c], n) for c, n in contar_traspaso(u, propiedad).items()]) for u in usuarios]
+        return TemplateResponse(request, 'admin/traspasar_usuario.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Traspasar trabajo',
+            'opts': self.model._meta,
+            'form': form,
+            'usuarios': usuarios,
+            'resumen': resumen,
+            'seleccion': request.POST.getlist(admin.helpers.ACTION_CHECKBOX_NAME),
+            'seleccionar_todo': request.POST.get('select_across', '0'),
+            'media': self.media + form.media,
+        })
+
+class PerfiladoAdmin(admin.ModelAdmin):
+    list_display = ('creado_el', 'metodo', 'ruta', 'usuario', 'estado_http', 'duracion_ms', 'consultas', 'tiempo_sql_ms', 'duplicadas', 'motivo')
+    list_filter = ('motivo', 'metodo')
+    search_fields = ('ruta', 'usuario__username')
+    exclude = ('estadisticas', 'traza_sql')
+    readonly_fields = ('usuario', 'metodo', 'ruta', 'estado_http', 'motivo', 'duracion_ms', 'consultas', 'tiempo_sql_ms',
+                       'duplicadas', 'creado_el', 'descarga', 'funciones', 'sql')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/descargar/', self.admin_site.admin_view(self.descargar), name='tasks_perfilado_descargar'),
+        ] + super().get_urls()
+
+    def descargar(self, request, pk):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        perfilado = get_object_or_404(Perfilado, pk=pk)
+        respuesta = HttpResponse(bytes(perfilado.estadisticas), content_type='application/octet-stream')
+        respuesta['Content-Disposition'] = f'attachment; filename="perfil-{pk}.prof"'
+        return respuesta
+
+    @admin.display(description='Perfil (pstats)')
+    def descarga(self, obj):
+        if not obj.estadisticas:
+            return 'Sin perfil de Python (había otro perfilado en curso).'
+        return format_html('<a href="{}">Descargar perfil-{}.prof</a> (snakeviz, python -m pstats)',
+                           reverse('admin:tasks_perfilado_descargar', args=[obj.pk]), obj.pk)
+
+    @admin.display(description='Funciones más costosas')
+    def funciones(self, obj):
+        if not obj.estadisticas:
+            return '-'
+        return format_html('<pre style="max-height: 500px; overflow: auto;">{}</pre>', resumen_funciones(obj.estadisticas))
+
+    @admin.display(description='Traza SQL')
+    def sql(self, obj):
+        filas = format_html_join('', '<tr{}><td>{}</td><td>{}</td><td>{}</td><td><code>{}</code><br><small>{}</small></td></tr>', (
+            (format_html(' style="background: #fff3cd;"') if c['repeticiones'] > 1 else '',
+             i + 1, c['ms'], f"{c['repeticiones']} / {c['similares']}", c['sql'], c['params'])
+            for i, c in enumerate(obj.traza_sql)
+        ))
+        return format_html(
+            '<table><thead><tr><th>#</th><th>ms</th><th>Iguales / mismo SQL</th><th>Consulta</th></tr></thead>'
+            '<tbody>{}</tbody></table>', filas
+        )
 
 admin.site.register(Tarea, TareaAdmin)
 admin.site.register(Proyecto, ProyectoAdmin)
-admin.site.register(Etiqueta)
-admin.site.register(Perfil)
-admin.site.register(HistorialAvance)
\ No newline at end of file
+admin.site.register(Etiqueta, EtiquetaAdmin)
+admin.site.register(Perfil, PerfilAdmin)
+admin.site.register(HistorialAvance, HistorialAvanceAdmin)
+admin.site.register(PlantillaProyecto, PlantillaProyectoAdmin)
+admin.site.register(ArchivoPendiente, ArchivoPendienteAdmin)
+admin.site.register(ResumenEnviado, ResumenEnviadoAdmin)
+admin.site.register(Actividad, ActividadAdmin)
+admin.site.register(Dependencia, DependenciaAdmin)
+admin.site.register(Recurrencia, RecurrenciaAdmin)
+admin.site.register(EventoTarea, EventoTareaAdmin)
+admin.site.register(InstantaneaDiaria, InstantaneaDiariaAdmin)
+admin.site.register(Perfilado, PerfiladoAdmin)
+admin.site.register(CambioSync, CambioSyncAdmin)
+admin.site.register(Notificacion, NotificacionAdmin)
+admin.site.unregister(User)
+admin.site.register(User, UsuarioAdmin)
\ No newline at end of file
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TasksConfig(AppConfig):
     name = 'tasks'
+
+    def ready(self):
+        from . import calendario, dependencias, eventos, presupuesto, sincronizacion  # noqa: F401  (registran sus señales)
@@ -0,0 +1,225 @@
+import calendar
+import secrets
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_delete, post_init, m2m_changed
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Tarea
+
+# ======================================================
+# CALENDARIO: FEED ICS POR USUARIO + VISTA MENSUAL
+# ======================================================
+# Cada usuario tiene una "versión" de calendario en la caché (el instante de
+# la última invalidación). La versión, junto con la fecha del día, da el ETag y
+# el Last-Modified del feed y forma parte de la clave del ICS cacheado, así que
+# invalidar es solo escribir un número nuevo: lo viejo caduca solo. La fecha
+# entra porque la ventana del feed se corre cada día aunque nadie edite nada.
+#
+# La caché tiene que ser compartida entre los workers (ver CACHES en settings):
+# con una caché por proceso, la invalidación solo llegaría al que atendió el cambio.
+
+DIAS_ATRAS = 90
+DIAS_ADELANTE = 365
+TTL_ICS = 3600
+MAXIMO_ICS_CACHEADO = 2 * 1024 * 1024
+
+
+def _clave_version(usuario_id):
+    return f'calendario:v:{usuario_id}'
+
+
+def obtener_version(usuario_id):
+    clave = _clave_version(usuario_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, time.time(), None)
+        version = cache.get(clave, time.time())
+    return version
+
+
+def firma_feed(usuario_id):
+    """
+    (firma, última modificación) del feed: la versión del usuario y el día de
+    hoy. La última modificación nunca es anterior a la medianoche, así un
+    If-Modified-Since de ayer no recibe 304 con la ventana ya corrida.
+    """
+    version = obtener_version(usuario_id)
+    hoy = timezone.now().date()
+    medianoche = datetime.combine(hoy, datetime.min.time(), tzinfo=dt_timezone.utc).timestamp()
+    return f'{version:.6f}-{hoy:%Y%m%d}', int(max(version, medianoche))
+
+
+def invalidar_calendarios(usuarios_ids):
+    """Marca como modificado el calendario de estos usuarios (al confirmar la transacción)."""
+    ids = {i for i in usuarios_ids if i}
+    if ids:
+        transaction.on_commit(lambda: cache.set_many({_clave_version(i): time.time() for i in ids}, None))
+
+
+def usuarios_de_tareas(tareas_qs):
+    """Ids de quienes ven estas tareas en su calendario (dueño, responsable, compartidos)."""
+    ids = set()
+    for usuario_id, responsable_id in tareas_qs.values_list('usuario_id', 'responsable_id'):
+        ids.update((usuario_id, responsable_id))
+    ids.update(Tarea.compartida_con.through.objects.filter(
+        tarea_id__in=tareas_qs.values('pk')
+    ).values_list('user_id', flat=True))
+    ids.discard(None)
+    return ids
+
+
+def tareas_visibles(usuario_id, desde, hasta):
+    """Única consulta por rango de fechas sobre las tareas que el usuario ve en el tablero."""
+    return Tarea.objects.filter(
+        Q(usuario_id=usuario_id) | Q(compartida_con=usuario_id) | Q(responsable_id=usuario_id),
+        fecha_objetivo__range=(desde, hasta),
+    ).distinct()
+
+
+def token_de(usuario):
+    perfil = usuario.perfil
+    if not perfil.token_calendario:
+        perfil.token_calendario = secrets.token_urlsafe(32)
+        perfil.save(update_fields=['token_calendario'])
+    return perfil.token_calendario
+
+
+def regenerar_token(usuario):
+    """El enlace anterior deja de funcionar (por si se filtró)."""
+    usuario.perfil.token_calendario = secrets.token_urlsafe(32)
+    usuario.perfil.save(update_fields=['token_calendario'])
+    return usuario.perfil.token_calendario
+
+
+# --- Vista mensual ---
+def semanas_del_mes(anio, mes, usuario_id):
+    """Cuadrícula lunes-domingo del mes con las tareas de cada día (una sola consulta)."""
+    semanas = calendar.Calendar(firstweekday=0).monthdatescalendar(anio, mes)
+    por_dia = {}
+    for tarea in tareas_visibles(usuario_id, semanas[0][0], semanas[-1][-1]).select_related('proyecto'):
+        por_dia.setdefault(tarea.fecha_objetivo, []).append(tarea)
+    return [[(dia, por_dia.get(dia, [])) for dia in semana] for semana in semanas]
+
+
+# --- Feed iCalendar (RFC 5545) ---
+def _escapar(texto):
+    return (texto or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _plegar(linea):
+    """Las líneas de contenido no deben superar 75 octetos; se continúan con un espacio."""
+    datos = linea.encode('utf-8')
+    if len(datos) <= 75:
+        return linea + '\r\n'
+    partes, inicio, limite = [], 0, 75
+    while inicio < len(datos):
+        fin = min(inicio + limite, len(datos))
+        while fin < len(datos) and (datos[fin] & 0xC0) == 0x80:  # No cortar un carácter UTF-8
+            fin -= 1
+        partes.append(datos[inicio:fin].decode('utf-8'))
+        inicio, limite = fin, 74
+    return '\r\n '.join(partes) + '\r\n'
+
+
+def generar_ics(usuario, modificado, url_base):
+    """Genera el feed evento por evento, sin armar el documento completo en memoria."""
+    estampa = datetime.fromtimestamp(modificado, dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    estados = dict(Tarea.ESTADOS)
+    yield (
+        'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//UpTask//Calendario de Tareas//ES\r\n'
+        'CALSCALE:GREGORIAN\r\nMETHOD:PUBLISH\r\n'
+        + _plegar(f'X-WR-CALNAME:{_escapar("UpTask - " + usuario.username)}')
+    )
+    hoy = timezone.now().date()
+    filas = tareas_visibles(usuario.id, hoy - timedelta(days=DIAS_ATRAS), hoy + timedelta(days=DIAS_ADELANTE)).values_list(
+        'id', 'titulo', 'descripcion', 'estado', 'fecha_objetivo', 'proyecto__titulo'
+    ).order_by('fecha_objetivo', 'id')
+    for pk, titulo, descripcion, estado, fecha, proyecto in filas.iterator(chunk_size=1000):
+        resumen = f'[{estados.get(estado, estado)}] {titulo}' if estado == 'COMPLETADA' else titulo
+        detalle = f'Estado: {estados.get(estado, estado)}' + (f'\nProyecto: {proyecto}' if proyecto else '')
+        if descripcion:
+            detalle += f'\n\n{descripcion}'
+        yield ''.join([
+            'BEGIN:VEVENT\r\n',
+            f'UID:tarea-{pk}@uptask\r\n',
+            f'DTSTAMP:{estampa}\r\n',
+            f'DTSTART;VALUE=DATE:{fecha:%Y%m%d}\r\n',
+            f'DTEND;VALUE=DATE:{fecha + timedelta(days=1):%Y%m%d}\r\n',
+            _plegar(f'SUMMARY:{_escapar(resumen)}'),
+            _plegar(f'DESCRIPTION:{_escapar(detalle)}'),
+            _plegar(f"URL:{url_base}{reverse('detalle_tarea', args=[pk])}"),
+            'TRANSP:TRANSPARENT\r\n',
+            'END:VEVENT\r\n',
+        ])
+    yield 'END:VCALENDAR\r\n'
+
+
+def ics_cacheado(usuario_id, firma):
+    return cache.get(f'calendario:ics:{usuario_id}:{firma}')
+
+
+def guardando_en_cache(partes, usuario_id, firma):
+    """Pasa las partes al cliente a medida que se generan y al final guarda el ICS completo."""
+    acumulado, tamano = [], 0
+    for parte in partes:
+        if acumulado is not None:
+            acumulado.append(parte)
+            tamano += len(parte)
+            if tamano > MAXIMO_ICS_CACHEADO:
+                acumulado = None  # Feeds enormes no se cachean
+        yield parte
+    if acumulado is not None:
+        cache.set(f'calendario:ics:{usuario_id}:{firma}', ''.join(acumulado), TTL_ICS)
+
+
+# --- Invalidación por señales ---
+# Cubre los cambios hechos con save()/delete() y las altas/bajas de compartidos.
+# Las rutas masivas (importación, plantillas, borrado de proyectos) invalidan
+# explícitamente con invalidar_calendarios().
+
+@receiver(post_init, sender=Tarea)
+def _recordar_responsable(sender, instance, **kwargs):
+    instance._responsable_original = instance.__dict__.get('responsable_id')
+
+
+@receiver(post_save, sender=Tarea)
+def _tarea_guardada(sender, instance, **kwargs):
+    invalidar_calendarios({instance.usuario_id, instance.responsable_id, instance._responsable_original}
+                          | set(instance.compartida_con.values_list('id', flat=True)))
+    instance._responsable_original = instance.responsable_id
+
+
+@receiver(pre_delete, sender=Tarea)
+def _tarea_por_borrar(sender, instance, **kwargs):
+    instance._afectados_calendario = {instance.usuario_id, instance.responsable_id} | set(
+        instance.compartida_con.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tarea)
+def _tarea_borrada(sender, instance, **kwargs):
+    invalidar_calendarios(getattr(instance, '_afectados_calendario', {instance.usuario_id, instance.responsable_id}))
+
+
+@receiver(m2m_changed, sender=Tarea.compartida_con.through)
+def _compartidos_cambiados(sender, instance, action, pk_set, **kwargs):
+    inverso = kwargs['reverse']  # instance es un User: cambian las tareas compartidas con él
+    if action == 'pre_clear':
+        if inverso:
+            instance._afectados_calendario = {instance.pk}
+        else:
+            instance._afectados_calendario = set(instance.compartida_con.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if inverso:
+        invalidar_calendarios({instance.pk})
+    else:
+        invalidar_calendarios(set(pk_set or ()) | getattr(instance, '_afectados_calendario', set()))
@@ -0,0 +1,134 @@
+"""
+Generador de carga para `manage.py prueba_carga`.
+
+Este módulo solo usa la biblioteca estándar (sin Django) para que los
+procesos trabajadores no necesiten inicializar el ORM: únicamente hablan
+HTTP contra el servidor levantado en loopback.
+"""
+import http.cookiejar
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+_CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class Sesion:
+    """Un usuario virtual: su propia cookie de sesión y sus métricas."""
+
+    def __init__(self, base, metricas):
+        self.base = base
+        self.metricas = metricas
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def pedir(self, nombre, ruta, datos=None):
+        cuerpo = urllib.parse.urlencode(datos, doseq=True).encode() if datos is not None else None
+        inicio = time.perf_counter()
+        try:
+            with self.opener.open(self.base + ruta, data=cuerpo, timeout=30) as r:
+                contenido = r.read()
+                ok = r.status < 400
+        except urllib.error.HTTPError as e:
+            contenido, ok = b'', False
+            e.close()
+        except (urllib.error.URLError, OSError):
+            contenido, ok = b'', False
+        self.metricas[nombre].append((time.perf_counter() - inicio, ok))
+        return contenido.decode('utf-8', 'replace')
+
+    def csrf(self, html):
+        m = _CSRF_INPUT.search(html)
+        return m.group(1) if m else ''
+
+    def login(self, username, password):
+        html = self.pedir('login', '/accounts/login/')
+        self.pedir('login', '/accounts/login/', {
+            'username': username, 'password': password, 'csrfmiddlewaretoken': self.csrf(html),
+        })
+
+
+def recorrido_usuario(sesion, tareas, terminos):
+    """Journey guionado: tablero -> detalle -> reportar avance -> dashboard -> autocompletar."""
+    sesion.pedir('home', '/tablero/')
+    if tareas:
+        tarea = random.choice(tareas)
+        sesion.pedir('detalle_tarea', f'/tarea/{tarea}/detalle/')
+        html = sesion.pedir('reportar_avance', f'/reportar-avance/{tarea}/')
+        sesion.pedir('reportar_avance', f'/reportar-avance/{tarea}/', {
+            'comentario': 'Reporte de prueba de carga', 'monto': '0', 'nuevo_estado': '',
+            'csrfmiddlewaretoken': sesion.csrf(html),
+        })
+    sesion.pedir('dashboard', '/dashboard/')
+    for termino in random.sample(terminos, min(3, len(terminos))):
+        sesion.pedir('buscar_usuarios', '/api/buscar-usuarios/?' + urllib.parse.urlencode({'q': termino}))
+
+
+def _hilo(base, cuenta, duracion, iteraciones, terminos, resultado):
+    metricas = defaultdict(list)
+    sesion = Sesion(base, metricas)
+    sesion.login(cuenta['username'], cuenta['password'])
+    fin = time.monotonic() + duracion if duracion else None
+    n = 0
+    while (fin is None or time.monotonic() < fin) and (not iteraciones or n < iteraciones):
+        recorrido_usuario(sesion, cuenta['tareas'], terminos)
+        n += 1
+    resultado.append(metricas)
+
+
+def trabajador(base, cuentas, duracion, iteraciones, terminos):
+    """Punto de entrada de cada proceso: un hilo por cuenta asignada."""
+    resultados = []
+    hilos = [
+        threading.Thread(target=_hilo, args=(base, c, duracion, iteraciones, terminos, resultados))
+        for c in cuentas
+    ]
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+
+    combinadas = defaultdict(list)
+    for metricas in resultados:
+        for nombre, muestras in metricas.items():
+            combinadas[nombre].extend(muestras)
+    return dict(combinadas)
+
+
+def percentil(ordenadas, p):
+    if not ordenadas:
+        return None
+    indice = max(0, min(len(ordenadas) - 1, int(round(p / 100 * len(ordenadas) + 0.5)) - 1))
+    return ordenadas[indice]
+
+
+def resumir(muestras_por_url, segundos):
+    por_url = {}
+    total = errores = 0
+    for nombre, muestras in sorted(muestras_por_url.items()):
+        tiempos = sorted(t for t, _ in muestras)
+        fallidas = sum(1 for _, ok in muestras if not ok)
+        total += len(muestras)
+        errores += fallidas
+        por_url[nombre] = {
+            'peticiones': len(muestras),
+            'errores': fallidas,
+            'tasa_error': round(fallidas / len(muestras), 4) if muestras else 0,
+            'rps': round(len(muestras) / segundos, 2) if segundos else 0,
+            'p50_ms': round(percentil(tiempos, 50) * 1000, 2),
+            'p95_ms': round(percentil(tiempos, 95) * 1000, 2),
+            'p99_ms': round(percentil(tiempos, 99) * 1000, 2),
+            'media_ms': round(sum(tiempos) / len(tiempos) * 1000, 2),
+        }
+    return {
+        'peticiones': total,
+        'errores': errores,
+        'tasa_error': round(errores / total, 4) if total else 0,
+        'rps': round(total / segundos, 2) if segundos else 0,
+        'segundos': round(segundos, 2),
+        'por_url': por_url,
+    }
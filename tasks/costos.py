@@ -0,0 +1,135 @@
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import Tarea, HistorialAvance
+from .permisos import proyectos_visibles_para
+
+# ======================================================
+# REPORTE DE DESVÍO DE COSTOS (ESTIMADO VS. GASTADO)
+# ======================================================
+# Costo estimado (Tarea.costo) contra lo gastado (suma de HistorialAvance.monto)
+# por proyecto > responsable > mes de vencimiento > tarea, con subtotales en
+# cada nivel y el total general al final.
+#
+# En PostgreSQL todo sale de una sola consulta con GROUP BY ROLLUP sobre la
+# consulta base por tarea (lo gastado se suma en una subconsulta por tarea, así
+# el costo no se multiplica por la cantidad de reportes). En otros motores la
+# misma consulta base, ordenada, se lee una vez y los subtotales se acumulan al
+# pasar (corte de control). En ambos casos las filas se leen por lotes con un
+# cursor del lado del servidor y se entregan a medida que llegan.
+
+NIVELES = ('total', 'proyecto', 'responsable', 'mes', 'tarea')
+DIMENSIONES = ('id_proyecto', 'id_responsable', 'mes', 'id_tarea')
+TAMANO_LOTE = 2000
+_DINERO = DecimalField(max_digits=14, decimal_places=2)
+
+
+def consulta_base(usuario_id, desde=None, hasta=None, proyectos=None):
+    """Una fila por tarea de los proyectos visibles, con lo estimado y lo gastado."""
+    gastado = HistorialAvance.objects.filter(tarea=OuterRef('pk')).order_by().values('tarea').annotate(
+        total=Sum('monto')
+    ).values('total')
+    tareas = Tarea.objects.filter(proyecto_id__in=proyectos_visibles_para(usuario_id).values('id'))
+    if proyectos:
+        tareas = tareas.filter(proyecto__in=proyectos)
+    if desde:
+        tareas = tareas.filter(fecha_objetivo__gte=desde)
+    if hasta:
+        tareas = tareas.filter(fecha_objetivo__lte=hasta)
+    # Todo con alias propios: la consulta se reutiliza como subconsulta del ROLLUP
+    return tareas.annotate(
+        id_proyecto=F('proyecto_id'), id_responsable=F('responsable_id'), id_tarea=F('id'),
+        mes=TruncMonth('fecha_objetivo'),
+        proyecto_titulo=F('proyecto__titulo'), responsable_nombre=F('responsable__username'), tarea_titulo=F('titulo'),
+        estimado=F('costo'),
+        gastado=Coalesce(Subquery(gastado, output_field=_DINERO), Value(Decimal('0')), output_field=_DINERO),
+    ).values(*DIMENSIONES, 'proyecto_titulo', 'responsable_nombre', 'tarea_titulo', 'estimado', 'gastado').order_by()
+
+
+def _fila(nivel, clave, nombres, estimado, gastado, tareas):
+    profundidad = NIVELES.index(nivel)
+    clave = tuple(clave[:profundidad]) + (None,) * (4 - profundidad)
+    desvio = gastado - estimado
+    return {
+        'nivel': nivel,
+        'proyecto_id': clave[0], 'proyecto': nombres[0] if profundidad >= 1 else None,
+        'responsable_id': clave[1], 'responsable': nombres[1] if profundidad >= 2 else None,
+        'mes': clave[2], 'tarea_id': clave[3], 'tarea': nombres[2] if profundidad >= 4 else None,
+        'tareas': tareas, 'estimado': estimado, 'gastado': gastado, 'desvio': desvio,
+        'porcentaje': round(desvio * 100 / estimado, 1) if estimado else None,
+    }
+
+
+def _leer_por_lotes(sql, params, using):
+    # chunked_cursor: cursor con nombre (del lado del servidor) en PostgreSQL
+    with connections[using].chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            lote = cursor.fetchmany(TAMANO_LOTE)
+            if not lote:
+                return
+            yield from lote
+
+
+def _con_rollup(base, dimensiones):
+    """Una sola consulta GROUP BY ROLLUP (PostgreSQL). Las filas ya vienen en orden de lectura."""
+    sql, params = base.query.sql_with_params()
+    columnas = ', '.join(f'b.{d}' for d in dimensiones)
+    orden = ', '.join(f'GROUPING(b.{d}), b.{d}' for d in dimensiones)
+    consulta = f"""
+        SELECT GROUPING({columnas}), {columnas},
+               MAX(b.proyecto_titulo), MAX(b.responsable_nombre), MAX(b.tarea_titulo),
+               SUM(b.estimado), SUM(b.gastado), COUNT(*)
+        FROM ({sql}) b
+        GROUP BY ROLLUP ({columnas})
+        ORDER BY {orden}
+    """
+    k = len(dimensiones)
+    for fila in _leer_por_lotes(consulta, params, base.db):
+        if not fila[-1]:
+            continue  # Sin tareas, el ROLLUP igual devuelve la fila del total (vacía)
+        # Cada dimensión plegada pone un bit en 1: los bits en 1 dicen el nivel
+        profundidad = k - bin(fila[0]).count('1')
+        clave = fila[1:k + 1]
+        nombres, (estimado, gastado, tareas) = fila[k + 1:k + 4], fila[k + 4:]
+        yield _fila(NIVELES[profundidad], clave, nombres, estimado, gastado, tareas)
+
+
+def _con_corte_de_control(base, dimensiones):
+    """Misma salida que el ROLLUP: una lectura ordenada y subtotales acumulados al vuelo."""
+    k = len(dimensiones)
+    cero = Decimal('0')
+    acumulados = [[cero, cero, 0] for _ in range(k + 1)]
+    anterior = nombres = None
+    filas = base.order_by(*dimensiones)
+    for fila in filas.iterator(chunk_size=TAMANO_LOTE):
+        clave = tuple(fila[d] for d in dimensiones)
+        if anterior is not None:
+            cambio = next((i for i in range(k) if clave[i] != anterior[i]), k)
+            for j in range(k, cambio, -1):
+                yield _fila(NIVELES[j], anterior, nombres, *acumulados[j])
+                acumulados[j] = [cero, cero, 0]
+        for acumulado in acumulados:
+            acumulado[0] += fila['estimado']
+            acumulado[1] += fila['gastado']
+            acumulado[2] += 1
+        anterior, nombres = clave, (fila['proyecto_titulo'], fila['responsable_nombre'], fila['tarea_titulo'])
+    if anterior is not None:
+        for j in range(k, -1, -1):
+            yield _fila(NIVELES[j], anterior, nombres, *acumulados[j])
+
+
+def filas_reporte(usuario_id, desde=None, hasta=None, proyectos=None, con_tareas=False):
+    """
+    Genera las filas del reporte en orden de lectura: el detalle de cada grupo
+    y luego su subtotal; la última fila es el total general. Sin `con_tareas`
+    el nivel más fino es el mes.
+    """
+    base = consulta_base(usuario_id, desde, hasta, proyectos)
+    dimensiones = DIMENSIONES if con_tareas else DIMENSIONES[:-1]
+    if connections[base.db].vendor == 'postgresql':
+        return _con_rollup(base, dimensiones)
+    return _con_corte_de_control(base, dimensiones)
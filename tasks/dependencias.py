@@ -0,0 +1,268 @@
+from collections import defaultdict, deque
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import Tarea, Proyecto, Dependencia
+
+# ======================================================
+# DEPENDENCIAS Y RUTA CRÍTICA INCREMENTAL
+# ======================================================
+# Las tareas no tienen duración, solo fecha objetivo; por eso la "ruta" se
+# mide en fechas: una tarea no puede terminar antes que sus bloqueantes.
+#
+#   fin_proyectado(t) = max(fecha propia de t, fin_proyectado de cada requisito)
+#
+# (una tarea completada vale su fecha de cierre). El valor se guarda en la tabla
+# y solo se recalcula para la tarea que cambió y las que dependen de ella (en
+# orden topológico y por lotes). El detalle del proyecto solo lee lo ya
+# calculado: la ruta crítica se reconstruye hacia atrás desde la tarea que
+# termina último, siguiendo en cada paso al requisito que fija su fecha, sobre
+# las aristas del proyecto leídas de una vez.
+
+TAMANO_LOTE = 1000
+MAXIMO_UPDATES_POR_FECHA = 50
+
+
+def fin_propio(estado, fecha_objetivo, fecha_cierre):
+    if estado == 'COMPLETADA' and fecha_cierre:
+        return fecha_cierre
+    return fecha_objetivo
+
+
+def _en_lotes(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), TAMANO_LOTE):
+        yield ids[i:i + TAMANO_LOTE]
+
+
+def _descendientes(ids):
+    """Las tareas dadas y todas las que dependen de ellas (BFS, una consulta por nivel)."""
+    todos = set(ids)
+    frontera = set(ids)
+    while frontera:
+        nuevos = set()
+        for lote in _en_lotes(frontera):
+            nuevos.update(Dependencia.objects.filter(requisito_id__in=lote).values_list('tarea_id', flat=True))
+        frontera = nuevos - todos
+        todos |= frontera
+    return todos
+
+
+def recalcular(ids):
+    """
+    Recalcula fin_proyectado de `ids` y sus descendientes.
+    Devuelve cuántas tareas cambiaron.
+    """
+    afectadas = _descendientes({i for i in ids if i})
+    if not afectadas:
+        return 0
+
+    requisitos = defaultdict(list)
+    for lote in _en_lotes(afectadas):
+        for tarea_id, requisito_id in Dependencia.objects.filter(tarea_id__in=lote).values_list('tarea_id', 'requisito_id'):
+            requisitos[tarea_id].append(requisito_id)
+
+    necesarias = set(afectadas)
+    for lista in requisitos.values():
+        necesarias.update(lista)
+    datos = {}
+    for lote in _en_lotes(necesarias):
+        for pk, estado, objetivo, cierre, fin in Tarea.objects.filter(id__in=lote).values_list(
+            'id', 'estado', 'fecha_objetivo', 'fecha_cierre', 'fin_proyectado'
+        ):
+            datos[pk] = [fin_propio(estado, objetivo, cierre), fin, estado == 'COMPLETADA']
+
+    # Orden topológico (Kahn) restringido al subgrafo afectado
+    pendientes = {t: sum(1 for r in requisitos[t] if r in afectadas) for t in afectadas}
+    siguientes = defaultdict(list)
+    for t in afectadas:
+        for r in requisitos[t]:
+            if r in afectadas:
+                siguientes[r].append(t)
+    cola = deque(sorted(t for t, n in pendientes.items() if n == 0))
+    orden = []
+    while cola:
+        t = cola.popleft()
+        orden.append(t)
+        for s in siguientes[t]:
+            pendientes[s] -= 1
+            if pendientes[s] == 0:
+                cola.append(s)
+
+    cambios = defaultdict(list)  # fecha nueva -> tareas
+    for t in orden:
+        if t not in datos:
+            continue
+        propio, fin_actual, completada = datos[t]
+        fin = propio
+        if not completada:  # Lo ya cerrado terminó cuando terminó, sin importar sus bloqueantes
+            for r in requisitos[t]:
+                fin_r = datos[r][1] if r in datos else None
+                if fin_r and fin_r > fin:
+                    fin = fin_r
+        if fin != fin_actual:
+            datos[t][1] = fin
+            cambios[fin].append(t)
+
+    # Un atraso suele arrastrar a muchas tareas a la misma fecha: un UPDATE por fecha
+    if len(cambios) <= MAXIMO_UPDATES_POR_FECHA:
+        for fin, ids_fin in cambios.items():
+            for lote in _en_lotes(ids_fin):
+                Tarea.objects.filter(id__in=lote).update(fin_proyectado=fin)
+    else:
+        Tarea.objects.bulk_update(
+            [Tarea(id=t, fin_proyectado=fin) for fin, ids_fin in cambios.items() for t in ids_fin],
+            ['fin_proyectado'], batch_size=TAMANO_LOTE,
+        )
+    return sum(len(v) for v in cambios.values())
+
+
+def crea_ciclo(tarea_id, requisito_id):
+    """¿Agregar "tarea depende de requisito" cierra un ciclo? (¿requisito ya depende de tarea?)"""
+    if tarea_id == requisito_id:
+        return True
+    visitados = {tarea_id}
+    frontera = {tarea_id}
+    while frontera:
+        nuevos = set()
+        for lote in _en_lotes(frontera):
+            nuevos.update(Dependencia.objects.filter(requisito_id__in=lote).values_list('tarea_id', flat=True))
+        if requisito_id in nuevos:
+            return True
+        frontera = nuevos - visitados
+        visitados |= frontera
+    return False
+
+
+@transaction.atomic
+def agregar_dependencia(tarea, requisito):
+    if tarea.proyecto_id is None or tarea.proyecto_id != requisito.proyecto_id:
+        raise ValidationError('Solo se pueden encadenar tareas del mismo proyecto.')
+    # Serializa los cambios de dependencias del proyecto: dos altas simultáneas
+    # no pueden cerrar un ciclo entre ambas
+    Proyecto.objects.select_for_update().filter(pk=tarea.proyecto_id).first()
+    if Dependencia.objects.filter(tarea=tarea, requisito=requisito).exists():
+        raise ValidationError('Esa dependencia ya existe.')
+    if crea_ciclo(tarea.id, requisito.id):
+        raise ValidationError(f'"{requisito.titulo}" ya depende (directa o indirectamente) de esta tarea: se formaría un ciclo.')
+    Dependencia.objects.create(tarea=tarea, requisito=requisito)
+    recalcular([tarea.id])
+
+
+@transaction.atomic
+def quitar_dependencia(tarea, requisito_id):
+    borradas, _ = Dependencia.objects.filter(tarea=tarea, requisito_id=requisito_id).delete()
+    if borradas:
+        recalcular([tarea.id])
+    return bool(borradas)
+
+
+def soltar_cruzadas(ids):
+    """
+    Borra las dependencias de estas tareas cuyo otro extremo quedó en otro
+    proyecto (o sin proyecto) y recalcula a las que perdieron un requisito.
+    Para cuando una tarea cambia de proyecto: las rutas solo se encadenan
+    dentro de uno. Devuelve cuántas dependencias borró.
+    """
+    cruzadas = Dependencia.objects.filter(Q(tarea_id__in=ids) | Q(requisito_id__in=ids)).exclude(
+        tarea__proyecto_id=F('requisito__proyecto_id')
+    )
+    filas = list(cruzadas.values_list('id', 'tarea_id'))
+    if not filas:
+        return 0
+    Dependencia.objects.filter(id__in=[pk for pk, _ in filas]).delete()
+    recalcular({tarea_id for _, tarea_id in filas})
+    return len(filas)
+
+
+def ruta_critica(proyecto):
+    """
+    Fin proyectado del proyecto (por índice), la ruta crítica que lo fija y el
+    desvío en días respecto de `fecha_fin` (positivo = atraso).
+    """
+    fin = proyecto.tareas.exclude(fin_proyectado=None).order_by('-fin_proyectado').values_list(
+        'fin_proyectado', flat=True
+    ).first()
+    if fin is None:
+        return {'fin_proyectado': None, 'tareas': [], 'desvio': None}
+
+    # Se arranca por la tarea final que tiene bloqueantes (si la hay): su cadena
+    # explica la fecha; una tarea suelta con la misma fecha no aporta ruta.
+    final = proyecto.tareas.filter(fin_proyectado=fin).order_by('-id').values_list(
+        'id', 'estado', 'fecha_objetivo', 'fecha_cierre'
+    )
+    con_requisitos = final.filter(dependencias__isnull=False).first()
+    actual = con_requisitos or final.first()
+
+    # Las aristas del proyecto con los datos de cada requisito, en una sola
+    # consulta (las dependencias nunca cruzan proyectos); el camino se arma en memoria
+    requisitos = defaultdict(list)
+    if con_requisitos:
+        for tarea_id, *requisito in Dependencia.objects.filter(tarea__proyecto=proyecto).values_list(
+            'tarea_id', 'requisito_id', 'requisito__estado', 'requisito__fecha_objetivo',
+            'requisito__fecha_cierre', 'requisito__fin_proyectado',
+        ):
+            requisitos[tarea_id].append(requisito)
+
+    # Hacia atrás: en cada paso, el requisito que fija la fecha (el de fin más tardío)
+    camino = [actual[0]]
+    while True:
+        pk, estado, objetivo, cierre = actual[:4]
+        fecha = fin_propio(estado, objetivo, cierre)
+        if estado == 'COMPLETADA':
+            break
+        candidatos = [r for r in requisitos[pk] if r[4] is not None and r[4] > fecha]
+        if not candidatos:
+            break
+        siguiente = max(candidatos, key=lambda r: (r[4], r[0]))
+        if siguiente[0] in camino:
+            break
+        actual = siguiente
+        camino.append(actual[0])
+    camino.reverse()
+
+    por_id = Tarea.objects.in_bulk(camino)
+    desvio = (fin - proyecto.fecha_fin).days if proyecto.fecha_fin else None
+    return {'fin_proyectado': fin, 'tareas': [por_id[i] for i in camino if i in por_id], 'desvio': desvio}
+
+
+# --- Recalculo por señales ---
+# save()/delete() de una tarea: solo se recalcula si cambió algo que influye
+# en su fecha (estado, fecha objetivo o de cierre). Si cambió de proyecto se
+# sueltan las dependencias que quedaron cruzando proyectos.
+
+@receiver(post_init, sender=Tarea)
+def _recordar_fechas(sender, instance, **kwargs):
+    d = instance.__dict__
+    instance._fechas_originales = (d.get('estado'), d.get('fecha_objetivo'), d.get('fecha_cierre'))
+    instance._proyecto_original = d.get('proyecto_id')
+
+
+@receiver(post_save, sender=Tarea)
+def _tarea_guardada(sender, instance, created, **kwargs):
+    actuales = (instance.estado, instance.fecha_objetivo, instance.fecha_cierre)
+    if created:
+        instance.fin_proyectado = fin_propio(*actuales)
+        Tarea.objects.filter(pk=instance.pk).update(fin_proyectado=instance.fin_proyectado)
+    else:
+        if instance.proyecto_id != instance._proyecto_original:
+            soltar_cruzadas([instance.pk])
+        if actuales != instance._fechas_originales:
+            recalcular([instance.pk])
+    instance._fechas_originales = actuales
+    instance._proyecto_original = instance.proyecto_id
+
+
+@receiver(pre_delete, sender=Tarea)
+def _tarea_por_borrar(sender, instance, **kwargs):
+    instance._dependientes = list(Dependencia.objects.filter(requisito=instance).values_list('tarea_id', flat=True))
+
+
+@receiver(post_delete, sender=Tarea)
+def _tarea_borrada(sender, instance, **kwargs):
+    if getattr(instance, '_dependientes', None):
+        recalcular(instance._dependientes)
@@ -0,0 +1,114 @@
+"""
+Borrado de proyectos por conjuntos de SQL.
+
+_borrar_en_cascada() reemplaza a QuerySet.delete() para no cargar en memoria
+miles de tareas e historiales. A cambio NO dispara señales pre/post_delete ni
+llama a delete() de los modelos: quien lo use debe hacer a mano lo que harían
+los receptores. Hoy borrar_proyecto() se encarga de:
+
+- adjuntos del historial: encolar_adjuntos() (el worker los borra del disco);
+- calendarios: invalidar_calendarios() de todos los involucrados;
+- sincronización offline: registrar_borrado_proyecto() (la baja del proyecto
+  arrastra sus tareas e historial en los clientes).
+
+Lo demás que escuchan las señales de Tarea/HistorialAvance no hace falta al
+borrarse el proyecto entero: la bitácora de eventos, las dependencias y el
+gastado acumulado del proyecto desaparecen con él. Un receptor nuevo sobre
+estos modelos tiene que revisarse contra esta lista.
+
+Reglas on_delete: CASCADE, SET_NULL, SET_DEFAULT y DO_NOTHING se resuelven con
+SQL. Si una relación con otra regla (PROTECT, RESTRICT, SET(...)) tiene filas
+dependientes, ese nivel se delega en QuerySet.delete() (Collector de Django),
+que aplica la regla como corresponde: ProtectedError, valores calculados, etc.
+"""
+from django.db import connections, models, transaction
+
+from .models import Tarea, HistorialAvance, Proyecto, ArchivoPendiente
+from .calendario import invalidar_calendarios, usuarios_de_tareas
+from .sincronizacion import registrar_borrado_proyecto
+
+_REGLAS_SQL = (models.CASCADE, models.SET_NULL, models.SET_DEFAULT, models.DO_NOTHING)
+
+
+def _relaciones(modelo):
+    """Relaciones inversas (FK/OneToOne que apuntan al modelo), como las recorre el Collector."""
+    return [
+        f for f in modelo._meta.get_fields(include_hidden=True)
+        if f.auto_created and not f.concrete and (f.one_to_one or f.one_to_many)
+    ]
+
+
+def _delete_por_subconsulta(qs):
+    """DELETE ... WHERE pk IN (SELECT ...) sin cargar filas ni disparar señales."""
+    conexion = connections[qs.db]
+    qn = conexion.ops.quote_name
+    meta = qs.model._meta
+    sql, params = qs.values('pk').query.sql_with_params()
+    with conexion.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {qn(meta.db_table)} WHERE {qn(meta.pk.column)} IN ({sql})", params)
+        return cursor.rowcount
+
+
+def _borrar_en_cascada(qs):
+    """
+    Equivalente a qs.delete() pero con SQL por conjuntos: primero se borran (o
+    se ponen en NULL / en su default) las filas dependientes usando subconsultas
+    y al final se ejecuta un único DELETE sobre qs. No se cargan objetos en
+    Python ni se disparan señales pre/post_delete (ver el docstring del módulo).
+    """
+    relaciones = []
+    for relacion in _relaciones(qs.model):
+        dependientes = relacion.related_model._base_manager.filter(
+            **{f"{relacion.field.name}__in": qs.values('pk')}
+        )
+        if relacion.on_delete not in _REGLAS_SQL and dependientes.exists():
+            # Regla que no se traduce a SQL: el Collector la aplica (y lanza ProtectedError si toca)
+            return qs.delete()[0]
+        relaciones.append((relacion, dependientes))
+
+    total = 0
+    for relacion, dependientes in relaciones:
+        regla = relacion.on_delete
+        if regla is models.CASCADE:
+            total += _borrar_en_cascada(dependientes)
+        elif regla is models.SET_NULL:
+            dependientes.update(**{relacion.field.name: None})
+        elif regla is models.SET_DEFAULT:
+            dependientes.update(**{relacion.field.name: relacion.field.get_default()})
+    return total + _delete_por_subconsulta(qs)
+
+
+def encolar_adjuntos(historial_qs):
+    """Registra los archivos del historial para que el worker los borre del disco."""
+    rutas = historial_qs.exclude(archivo='').exclude(archivo__isnull=True).values_list('archivo', flat=True)
+    ArchivoPendiente.objects.bulk_create([ArchivoPendiente(ruta=r) for r in rutas])
+
+
+@transaction.atomic
+def borrar_proyecto(proyecto, tamano_lote=5000, progreso=None):
+    """
+    Borra un proyecto con todas sus tareas, historial y filas M2M en una sola
+    transacción. Las tareas se procesan por lotes de ids; `progreso(hechas, total)`
+    se invoca tras cada lote para informar el avance en proyectos muy grandes.
+    """
+    total = proyecto.tareas.count()
+    hechas = 0
+    ultimo_id = 0
+    afectados = {proyecto.usuario_id} | set(proyecto.equipo.values_list('id', flat=True))
+    while True:
+        ids = list(Tarea.objects.filter(proyecto=proyecto, id__gt=ultimo_id).order_by('id').values_list('id', flat=True)[:tamano_lote])
+        if not ids:
+            break
+        encolar_adjuntos(HistorialAvance.objects.filter(tarea_id__in=ids))
+        usuarios = usuarios_de_tareas(Tarea.objects.filter(id__in=ids))
+        invalidar_calendarios(usuarios)
+        afectados |= usuarios
+        _borrar_en_cascada(Tarea.objects.filter(id__in=ids))
+        hechas += len(ids)
+        ultimo_id = ids[-1]
+        if progreso: progreso(hechas, total)
+
+    # Sin señales: los clientes offline reciben la baja del proyecto, que arrastra sus tareas
+    registrar_borrado_proyecto(proyecto.id, afectados)
+    _borrar_en_cascada(Proyecto.objects.filter(id=proyecto.id))
+    return hechas
@@ -0,0 +1,114 @@
+import gzip
+import mimetypes
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # Brotli es opcional: sin él solo se genera .gz
+    brotli = None
+
+# ======================================================
+# ESTÁTICOS: hash en el nombre + precompresión
+# ======================================================
+# collectstatic copia los archivos con el hash del contenido en el nombre
+# (bootstrap.min.3f2a9c1b7d4e.css) y deja al lado sus versiones .gz/.br.
+# El middleware los entrega con la codificación que acepte el navegador y,
+# como el nombre cambia con el contenido, con caché de un año.
+
+COMPRIMIBLES = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.ttf', '.eot', '.ico')
+TAMANO_MINIMO = 256
+UN_ANIO = 365 * 24 * 3600
+_CON_HASH = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+class AlmacenEstaticosComprimidos(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        hasheados = set()
+        for nombre, hasheado, procesado in super().post_process(paths, dry_run, **options):
+            if hasheado and not isinstance(procesado, Exception):
+                hasheados.add(hasheado)
+            yield nombre, hasheado, procesado
+        if dry_run:
+            return
+        # zlib y brotli liberan el GIL: comprimir en hilos acelera collectstatic
+        with ThreadPoolExecutor() as pool:
+            list(pool.map(self._comprimir, (n for n in hasheados if n.endswith(COMPRIMIBLES))))
+
+    def _comprimir(self, nombre):
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        if len(datos) < TAMANO_MINIMO:
+            return
+        variantes = [('.gz', gzip.compress(datos, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variantes.append(('.br', brotli.compress(datos)))
+        for extension, comprimido in variantes:
+            if len(comprimido) < len(datos) * 0.95:  # No vale la pena si casi no reduce
+                with open(ruta + extension, 'wb') as f:
+                    f.write(comprimido)
+
+
+class EstaticosComprimidosMiddleware:
+    """
+    Sirve STATIC_ROOT antes que el resto de middlewares (sin sesión ni auth).
+    Elige .br o .gz según Accept-Encoding y responde 304 a las revalidaciones.
+    Si el archivo no existe deja pasar la petición (en desarrollo lo atiende
+    runserver desde las carpetas static/ de cada app).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefijo = '/' + settings.STATIC_URL.lstrip('/')
+        self.raiz = str(settings.STATIC_ROOT) if settings.STATIC_ROOT else None
+
+    def __call__(self, request):
+        if self.raiz and request.method in ('GET', 'HEAD') and request.path.startswith(self.prefijo):
+            respuesta = self.servir(request, request.path[len(self.prefijo):])
+            if respuesta is not None:
+                return respuesta
+        return self.get_response(request)
+
+    def servir(self, request, relativa):
+        try:
+            ruta = safe_join(self.raiz, relativa)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(ruta):
+            return None
+
+        estado = os.stat(ruta)
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), estado.st_mtime):
+            respuesta = HttpResponseNotModified()
+        else:
+            aceptadas = request.META.get('HTTP_ACCEPT_ENCODING', '')
+            codificacion, archivo = None, ruta
+            for nombre, extension in (('br', '.br'), ('gzip', '.gz')):
+                if nombre in aceptadas and os.path.isfile(ruta + extension):
+                    codificacion, archivo = nombre, ruta + extension
+                    break
+            tipo, _ = mimetypes.guess_type(ruta)
+            respuesta = FileResponse(
+                open(archivo, 'rb'), content_type=tipo or 'application/octet-stream', filename=os.path.basename(ruta)
+            )
+            if codificacion:
+                respuesta.headers['Content-Encoding'] = codificacion
+            respuesta.headers['Last-Modified'] = http_date(estado.st_mtime)
+
+        respuesta.headers['Vary'] = 'Accept-Encoding'
+        if _CON_HASH.search(relativa):
+            respuesta.headers['Cache-Control'] = f'public, max-age={UN_ANIO}, immutable'
+        else:
+            respuesta.headers['Cache-Control'] = 'public, max-age=60'
+        return respuesta
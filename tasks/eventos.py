@@ -0,0 +1,202 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Tarea, Proyecto, EventoTarea, InstantaneaDiaria
+
+# ======================================================
+# BITÁCORA DE EVENTOS + INSTANTÁNEAS DIARIAS
+# ======================================================
+# Cada cambio de estado, responsable o fecha objetivo agrega filas a
+# EventoTarea (nunca se modifican). Los cambios de un mismo save() van en un
+# solo INSERT y las rutas masivas (importación, plantillas, recurrencias)
+# registran sus altas con un bulk_create.
+#
+# `actualizar_instantaneas` (cron) aplica los eventos nuevos de cada proyecto
+# sobre su última instantánea y deja una fila por día con cuántas tareas había
+# en cada estado. Los gráficos del proyecto solo leen esas filas.
+
+TAMANO_LOTE = 1000
+DIAS_GRAFICO = 120
+# Eventos más nuevos que esto esperan a la próxima pasada: una transacción
+# larga puede confirmar un id menor después de que el cursor lo haya pasado.
+MARGEN = timedelta(minutes=5)
+CAMPOS_CONTEO = ('ALTA', 'BAJA', 'ESTADO')
+_SEGUIDOS = ('estado', 'responsable_id', 'fecha_objetivo', 'proyecto_id')
+_NO_CARGADO = object()
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor)
+
+
+def eventos_de_alta(tareas, fecha=None):
+    fecha = fecha or timezone.now()
+    return [
+        EventoTarea(tarea_id=t.id, proyecto_id=t.proyecto_id, campo='ALTA', nuevo=t.estado, fecha=fecha)
+        for t in tareas
+    ]
+
+
+def registrar_altas(tareas):
+    """Para las rutas con bulk_create, que no disparan post_save."""
+    EventoTarea.objects.bulk_create(eventos_de_alta(tareas), batch_size=TAMANO_LOTE)
+
+
+# --- Registro por señales ---
+# Solo se compara lo que estaba cargado en la instancia: un objeto traído con
+# only()/defer() no dispara consultas extra al guardarse.
+
+@receiver(post_init, sender=Tarea)
+def _recordar_seguidos(sender, instance, **kwargs):
+    d = instance.__dict__
+    instance._seguidos = tuple(d.get(campo, _NO_CARGADO) for campo in _SEGUIDOS)
+
+
+@receiver(post_save, sender=Tarea)
+def _tarea_guardada(sender, instance, created, **kwargs):
+    d = instance.__dict__
+    actuales = tuple(d.get(campo, _NO_CARGADO) for campo in _SEGUIDOS)
+    if created:
+        eventos = eventos_de_alta([instance])
+    else:
+        estado, responsable, fecha, proyecto = instance._seguidos
+        ahora = timezone.now()
+        base = {'tarea_id': instance.pk, 'fecha': ahora}
+        eventos = []
+        if estado is not _NO_CARGADO and estado != instance.estado:
+            # Se registra en el proyecto anterior: si también cambió de proyecto,
+            # la BAJA de abajo ya descuenta el estado nuevo
+            destino = proyecto if proyecto is not _NO_CARGADO else instance.proyecto_id
+            eventos.append(EventoTarea(proyecto_id=destino, campo='ESTADO', anterior=estado, nuevo=instance.estado, **base))
+        if responsable is not _NO_CARGADO and responsable != instance.responsable_id:
+            eventos.append(EventoTarea(proyecto_id=instance.proyecto_id, campo='RESPONSABLE',
+                                       anterior=_texto(responsable), nuevo=_texto(instance.responsable_id), **base))
+        if fecha is not _NO_CARGADO and fecha != instance.fecha_objetivo:
+            eventos.append(EventoTarea(proyecto_id=instance.proyecto_id, campo='FECHA',
+                                       anterior=_texto(fecha), nuevo=_texto(instance.fecha_objetivo), **base))
+        if proyecto is not _NO_CARGADO and proyecto != instance.proyecto_id:
+            eventos.append(EventoTarea(proyecto_id=proyecto, campo='BAJA', anterior=instance.estado, **base))
+            eventos.append(EventoTarea(proyecto_id=instance.proyecto_id, campo='ALTA', nuevo=instance.estado, **base))
+    if eventos:
+        EventoTarea.objects.bulk_create(eventos)
+    instance._seguidos = actuales
+
+
+def _proyecto_sobrevive(origen, proyecto_id):
+    """¿El proyecto de la tarea sigue existiendo después de esta cascada? (`origin` de la señal)"""
+    if isinstance(origen, Proyecto) or getattr(origen, 'model', None) is Proyecto:
+        return False
+    if isinstance(origen, User) or getattr(origen, 'model', None) is User:
+        # Los proyectos de los usuarios borrados se van con ellos (el Collector puede haberlos borrado ya)
+        usuarios = {origen.pk} if isinstance(origen, User) else getattr(origen, '_usuarios_borrados', set())
+        return Proyecto.objects.filter(pk=proyecto_id).exclude(usuario_id__in=usuarios).exists()
+    return True
+
+
+@receiver(pre_delete, sender=User)
+def _usuario_por_borrar(sender, instance, origin=None, **kwargs):
+    # Borrado por queryset: para cuando llegan las bajas de sus tareas, las filas
+    # del queryset ya pueden no existir, así que se anotan los ids en el origen
+    if origin is not None and not isinstance(origin, User):
+        origin.__dict__.setdefault('_usuarios_borrados', set()).add(instance.pk)
+
+
+@receiver(post_delete, sender=Tarea)
+def _tarea_borrada(sender, instance, origin=None, **kwargs):
+    # Si el proyecto se va en la misma cascada, el Collector ya juntó sus eventos
+    # para borrarlos: una BAJA nueva quedaría apuntando a un proyecto inexistente
+    if instance.proyecto_id and not _proyecto_sobrevive(origin, instance.proyecto_id):
+        return
+    EventoTarea.objects.create(tarea_id=instance.pk, proyecto_id=instance.proyecto_id, campo='BAJA', anterior=instance.estado)
+
+
+# --- Instantáneas diarias ---
+def _dias(desde, hasta):
+    while desde <= hasta:
+        yield desde
+        desde += timedelta(days=1)
+
+
+def actualizar_instantaneas(proyecto_id):
+    """
+    Aplica los eventos posteriores a la última instantánea del proyecto y
+    completa un día por fila hasta hoy. Devuelve cuántas filas escribió.
+    """
+    hoy = timezone.localdate()
+    limite = timezone.now() - MARGEN
+    ultima = InstantaneaDiaria.objects.filter(proyecto_id=proyecto_id).order_by('-fecha').first()
+    conteos = Counter(ultima.conteos) if ultima else Counter()
+    cursor = ultima.ultimo_evento if ultima else 0
+    dia = ultima.fecha if ultima else None
+
+    filas = {}
+
+    def cerrar(desde, hasta):
+        foto = {estado: n for estado, n in conteos.items() if n}
+        for d in _dias(desde, hasta):
+            filas[d] = InstantaneaDiaria(proyecto_id=proyecto_id, fecha=d, conteos=foto, ultimo_evento=cursor)
+
+    eventos = EventoTarea.objects.filter(
+        proyecto_id=proyecto_id, id__gt=cursor, campo__in=CAMPOS_CONTEO
+    ).order_by('id').values_list('id', 'fecha', 'campo', 'anterior', 'nuevo')
+    for pk, fecha, campo, anterior, nuevo in eventos.iterator(chunk_size=TAMANO_LOTE):
+        if fecha >= limite:
+            break
+        d = timezone.localtime(fecha).date()
+        if dia is None:
+            dia = d
+        elif d > dia:
+            cerrar(dia, d - timedelta(days=1))
+            dia = d
+        if campo != 'ALTA':
+            conteos[anterior] -= 1
+        if campo != 'BAJA':
+            conteos[nuevo] += 1
+        cursor = pk
+
+    if dia is None:
+        return 0  # Proyecto sin eventos
+    cerrar(dia, max(dia, hoy))
+    if ultima and ultima.fecha in filas and filas[ultima.fecha].conteos == ultima.conteos \
+            and filas[ultima.fecha].ultimo_evento == ultima.ultimo_evento:
+        del filas[ultima.fecha]  # Nada nuevo ese día
+    InstantaneaDiaria.objects.bulk_create(
+        filas.values(), batch_size=TAMANO_LOTE,
+        update_conflicts=True, unique_fields=['proyecto', 'fecha'], update_fields=['conteos', 'ultimo_evento'],
+    )
+    return len(filas)
+
+
+def datos_graficos(proyecto, dias=DIAS_GRAFICO):
+    """
+    Series del flujo acumulado (tareas por estado) y del burndown (abiertas
+    contra la recta ideal hasta `fecha_fin`). Una consulta acotada a `dias` filas.
+    """
+    fotos = list(InstantaneaDiaria.objects.filter(proyecto=proyecto).order_by('-fecha').values_list('fecha', 'conteos')[:dias])
+    fotos.reverse()
+    if not fotos:
+        return None
+    fechas = [f for f, _ in fotos]
+    series = [
+        {'estado': nombre, 'datos': [c.get(clave, 0) for _, c in fotos]}
+        for clave, nombre in Tarea.ESTADOS
+    ]
+    abiertas = [sum(c.values()) - c.get('COMPLETADA', 0) for _, c in fotos]
+
+    ideal = None
+    fin = proyecto.fecha_fin
+    if fin and fin > fechas[0]:
+        total_dias = (fin - fechas[0]).days
+        ideal = [round(max(0, abiertas[0] * (1 - (f - fechas[0]).days / total_dias)), 2) for f in fechas]
+    return {
+        'fechas': [f.strftime('%d/%m') for f in fechas],
+        'series': series,
+        'abiertas': abiertas,
+        'ideal': ideal,
+        'actualizado': fechas[-1].isoformat(),
+    }
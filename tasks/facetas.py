@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Tarea
+from .calendario import obtener_version
+
+# ======================================================
+# FACETAS DEL LISTADO DE TAREAS (CONTEOS POR FILTRO)
+# ======================================================
+# Cuántas tareas hay detrás de cada botón de filtro de `home`: una sola
+# consulta con COUNT(...) FILTER (WHERE ...) por estado y por franja de fecha
+# sobre las tareas del usuario.
+#
+# El resultado se guarda en la caché con la versión del calendario del
+# usuario en la clave: esa versión ya cambia con cada escritura sobre sus
+# tareas (señales y rutas masivas llaman a invalidar_calendarios). La fecha de
+# hoy también va en la clave para que las franjas se corran a medianoche.
+#
+# Versión y conteos viven en la caché compartida de settings.CACHES: con una
+# caché por proceso, los demás workers no verían la nueva versión y seguirían
+# mostrando conteos viejos hasta TTL_FACETAS.
+
+FILTROS = ('status', 'time', 'ownership', 'search')
+TTL_FACETAS = 24 * 3600
+
+
+def tareas_de(usuario_id):
+    """Las tareas del listado `home` (dueño, responsable o compartidas), sin JOIN ni DISTINCT."""
+    return Tarea.objects.filter(
+        Q(usuario_id=usuario_id) | Q(responsable_id=usuario_id)
+        | Q(id__in=Tarea.compartida_con.through.objects.filter(user_id=usuario_id).values('tarea_id'))
+    )
+
+
+def _contar(usuario_id, hoy):
+    conteos = {f'estado_{clave}': Count('id', filter=Q(estado=clave)) for clave, _ in Tarea.ESTADOS}
+    conteos.update(
+        total=Count('id'),
+        retrasadas=Count('id', filter=Q(fecha_objetivo__lt=hoy) & ~Q(estado='COMPLETADA')),
+        hoy=Count('id', filter=Q(fecha_objetivo=hoy)),
+        proximas=Count('id', filter=Q(fecha_objetivo__gt=hoy)),
+    )
+    fila = tareas_de(usuario_id).aggregate(**conteos)
+    return {
+        'total': fila['total'],
+        'status': {clave: fila[f'estado_{clave}'] for clave, _ in Tarea.ESTADOS},
+        'time': {franja: fila[franja] for franja in ('retrasadas', 'hoy', 'proximas')},
+    }
+
+
+def facetas(usuario_id, hoy):
+    clave = f'facetas:{usuario_id}:{obtener_version(usuario_id)}:{hoy.isoformat()}'
+    conteos = cache.get(clave)
+    if conteos is None:
+        conteos = _contar(usuario_id, hoy)
+        cache.set(clave, conteos, TTL_FACETAS)
+    return conteos
+
+
+def filtros_de(datos):
+    """Los filtros no vacíos de un QueryDict (o dict), en el orden de FILTROS."""
+    return {f: datos.get(f) for f in FILTROS if datos.get(f)}
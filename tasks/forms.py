@@ -1,22 +1,61 @@
 from django import forms
 from django.db.models import Q 
 from django.contrib.auth.models import User
-from .models import Tarea, HistorialAvance, Perfil, Etiqueta, Proyecto
+from .models import Tarea, HistorialAvance, Perfil, Etiqueta, Proyecto, Recurrencia, VistaGuardada
+
+# ======================================================
+# 0. WIDGET DE USUARIOS (SOLO LOS SELECCIONADOS)
+# ======================================================
+class SelectUsuariosRemotos(forms.SelectMultiple):
+    """
+    Renderiza como <option> únicamente los usuarios ya seleccionados (una
+    consulta id__in). Los candidatos llegan por /api/buscar-usuarios/ y la
+    validación del campo sigue siendo un único filtro id__in.
+    """
+    def optgroups(self, name, value, attrs=None):
+        ids = [v for v in value if str(v).isdigit()]
+        self.choices = [
+            (str(u.id), u.username) for u in User.objects.filter(id__in=ids).only('id', 'username')
+        ] if ids else []
+        return super().optgroups(name, value, attrs)
 
 # ======================================================
 # 1. FORMULARIO DE PROYECTOS
 # ======================================================
+class UmbralesField(forms.CharField):
+    """Porcentajes separados por coma ("80, 100") <-> lista ordenada de enteros."""
+    def prepare_value(self, value):
+        if isinstance(value, (list, tuple)):
+            return ', '.join(str(u) for u in value)
+        return value
+
+    def to_python(self, value):
+        umbrales = set()
+        for parte in super().to_python(value).split(','):
+            parte = parte.strip().rstrip('%').strip()
+            if not parte:
+                continue
+            if not parte.isdigit() or not 1 <= int(parte) <= 1000:
+                raise forms.ValidationError(f'"{parte}" no es un porcentaje válido (entero de 1 a 1000).')
+            umbrales.add(int(parte))
+        return sorted(umbrales)
+
 class ProyectoForm(forms.ModelForm):
+    umbrales_alerta = UmbralesField(
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '80, 100'}),
+    )
+
     class Meta:
         model = Proyecto
-        fields = ['titulo', 'descripcion', 'presupuesto', 'fecha_inicio', 'fecha_fin', 'equipo', 'estado']
+        fields = ['titulo', 'descripcion', 'presupuesto', 'umbrales_alerta', 'fecha_inicio', 'fecha_fin', 'equipo', 'estado']
         widgets = {
             'titulo': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Nombre del Proyecto'}),
             'descripcion': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'presupuesto': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': '0.00'}),
             'fecha_inicio': forms.DateInput(format='%Y-%m-%d', attrs={'class': 'form-control', 'type': 'date'}),
             'fecha_fin': forms.DateInput(format='%Y-%m-%d', attrs={'class': 'form-control', 'type': 'date'}),
-            'equipo': forms.SelectMultiple(attrs={'style': 'display:none;'}),
+            'equipo': SelectUsuariosRemotos(attrs={'style': 'display:none;'}),
             'estado': forms.Select(attrs={'class': 'form-select'}),
         }
 
@@ -45,14 +84,13 @@ class TareaForm(forms.ModelForm):
             'avance': forms.TextInput(attrs={'class': 'form-control'}),
             'observaciones': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
             'etiquetas': forms.CheckboxSelectMultiple(),
-            'compartida_con': forms.SelectMultiple(attrs={'style': 'display:none;'}),
+            'compartida_con': SelectUsuariosRemotos(attrs={'style': 'display:none;'}),
         }
 
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
         self.proyecto_vinculado = kwargs.pop('proyecto_vinculado', None) 
         super(TareaForm, self).__init__(*args, **kwargs)
-        self.fields['responsable'].queryset = User.objects.all()
 
         if self.user:
             self.fields['proyecto'].queryset = Proyecto.objects.filter(
@@ -61,13 +99,23 @@ class TareaForm(forms.ModelForm):
 
         if self.proyecto_vinculado:
             equipo_autorizado = User.objects.filter(
-                Q(id=self.proyecto_vinculado.usuario.id) | 
+                Q(id=self.proyecto_vinculado.usuario_id) | 
                 Q(proyectos_asignados=self.proyecto_vinculado)
             ).distinct()
             self.fields['responsable'].queryset = equipo_autorizado
             self.fields['compartida_con'].queryset = equipo_autorizado
             self.fields['proyecto'].initial = self.proyecto_vinculado
 
+    def clean(self):
+        datos = super().clean()
+        # recurrencia no está en el formulario: ocurrencia_unica_por_fecha se valida a mano
+        fecha = datos.get('fecha_objetivo')
+        if fecha and self.instance.recurrencia_id and Tarea.objects.filter(
+            recurrencia_id=self.instance.recurrencia_id, fecha_objetivo=fecha
+        ).exclude(pk=self.instance.pk).exists():
+            self.add_error('fecha_objetivo', 'Ya hay otra ocurrencia de esta repetición en esa fecha.')
+        return datos
+
 # ======================================================
 # 3. FORMULARIO DE HISTORIAL (MEJORADO)
 # ======================================================
@@ -116,4 +164,124 @@ class UserUpdateForm(forms.ModelForm):
         widgets = {
             'first_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Nombre'}),
             'last_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Apellido'}),
-        }
\ No newline at end of file
+        }
+# ======================================================
+# 4. IMPORTACIÓN MASIVA DE TAREAS
+# ======================================================
+class ImportarTareasForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo CSV / JSONL",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.ndjson'})
+    )
+    proyecto = forms.ModelChoiceField(
+        queryset=Proyecto.objects.none(),
+        required=False,
+        label="Importar dentro del proyecto",
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        if user:
+            self.fields['proyecto'].queryset = Proyecto.objects.filter(
+                Q(usuario=user) | Q(equipo=user)
+            ).distinct()
+
+# ======================================================
+# 5. PLANTILLAS / DUPLICAR PROYECTO
+# ======================================================
+class InstanciarProyectoForm(forms.Form):
+    titulo = forms.CharField(
+        max_length=100,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Nombre del nuevo Proyecto'})
+    )
+    fecha_inicio = forms.DateField(
+        widget=forms.DateInput(format='%Y-%m-%d', attrs={'class': 'form-control', 'type': 'date'})
+    )
+
+# ======================================================
+# 6. DEPENDENCIAS ENTRE TAREAS
+# ======================================================
+class DependenciaForm(forms.Form):
+    # Un número y no un <select>: un proyecto puede tener miles de tareas
+    requisito = forms.ModelChoiceField(
+        queryset=Tarea.objects.none(),
+        label="Bloqueada por la tarea #",
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'N° de tarea'}),
+        error_messages={'invalid_choice': 'Esa tarea no existe en este proyecto.'},
+    )
+
+    def __init__(self, *args, **kwargs):
+        tarea = kwargs.pop('tarea')
+        super().__init__(*args, **kwargs)
+        if tarea.proyecto_id:
+            self.fields['requisito'].queryset = Tarea.objects.filter(proyecto_id=tarea.proyecto_id).exclude(pk=tarea.pk)
+
+# ======================================================
+# 7. REPETICIÓN DE TAREAS
+# ======================================================
+class RecurrenciaForm(forms.ModelForm):
+    # Vacío = la tarea no se repite
+    frecuencia = forms.ChoiceField(
+        choices=[('', 'No se repite')] + Recurrencia.FRECUENCIAS,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    class Meta:
+        model = Recurrencia
+        fields = ['frecuencia', 'intervalo', 'fecha_fin']
+        widgets = {
+            'intervalo': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'fecha_fin': forms.DateInput(format='%Y-%m-%d', attrs={'class': 'form-control', 'type': 'date'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['intervalo'].required = False
+
+    def clean_intervalo(self):
+        return self.cleaned_data.get('intervalo') or 1
+
+# ======================================================
+# 8. REPORTE DE DESVÍO DE COSTOS
+# ======================================================
+class ReporteCostosForm(forms.Form):
+    desde = forms.DateField(
+        required=False, label="Vencimiento desde",
+        widget=forms.DateInput(format='%Y-%m-%d', attrs={'class': 'form-control', 'type': 'date'})
+    )
+    hasta = forms.DateField(
+        required=False, label="Vencimiento hasta",
+        widget=forms.DateInput(format='%Y-%m-%d', attrs={'class': 'form-control', 'type': 'date'})
+    )
+    proyectos = forms.ModelMultipleChoiceField(
+        queryset=Proyecto.objects.none(), required=False, label="Proyectos (vacío = todos)",
+        widget=forms.SelectMultiple(attrs={'class': 'form-select', 'size': 6})
+    )
+    tareas = forms.BooleanField(
+        required=False, label="Detalle por tarea", widget=forms.CheckboxInput(attrs={"class": "form-check-input"})
+    )
+
+    def __init__(self, *args, **kwargs):
+        proyectos = kwargs.pop('proyectos')
+        super().__init__(*args, **kwargs)
+        self.fields['proyectos'].queryset = proyectos.order_by('titulo')
+
+    def clean(self):
+        datos = super().clean()
+        if datos.get('desde') and datos.get('hasta') and datos['desde'] > datos['hasta']:
+            raise forms.ValidationError("La fecha 'desde' no puede ser posterior a 'hasta'.")
+        return datos
+
+# ======================================================
+# 9. VISTAS GUARDADAS
+# ======================================================
+class VistaGuardadaForm(forms.ModelForm):
+    class Meta:
+        model = VistaGuardada
+        fields = ['nombre']
+        widgets = {
+            'nombre': forms.TextInput(attrs={'class': 'form-control form-control-sm', 'placeholder': 'Nombre de la vista'}),
+        }
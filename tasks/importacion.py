@@ -0,0 +1,302 @@
+import csv
+import json
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .forms import TareaForm
+from .models import Tarea, Etiqueta, Proyecto
+from .calendario import invalidar_calendarios
+from .dependencias import fin_propio
+from .eventos import registrar_altas
+
+# ======================================================
+# 1. FORMATO DE COLUMNAS (COMPARTIDO CON exportar_csv)
+# ======================================================
+# Las cuatro primeras columnas son las históricas del reporte CSV;
+# el resto permite que un archivo exportado se pueda volver a importar.
+COLUMNAS = [
+    ('ID', 'id'),
+    ('Título', 'titulo'),
+    ('Estado', 'estado'),
+    ('Proyecto', 'proyecto'),
+    ('Fecha Objetivo', 'fecha_objetivo'),
+    ('Responsable', 'responsable'),
+    ('Etiquetas', 'etiquetas'),
+    ('Compartida Con', 'compartida_con'),
+    ('Costo', 'costo'),
+    ('Descripción', 'descripcion'),
+    ('Avance', 'avance'),
+    ('Observaciones', 'observaciones'),
+]
+ENCABEZADOS = [encabezado for encabezado, _ in COLUMNAS]
+SEPARADOR_LISTAS = ';'
+
+# Aceptamos tanto el encabezado del reporte como el nombre del campo
+_CAMPO_POR_COLUMNA = {}
+for _encabezado, _campo in COLUMNAS:
+    _CAMPO_POR_COLUMNA[_encabezado.lower()] = _campo
+    _CAMPO_POR_COLUMNA[_campo] = _campo
+
+_ESTADO_POR_TEXTO = {}
+for _codigo, _etiqueta in Tarea.ESTADOS:
+    _ESTADO_POR_TEXTO[_codigo.lower()] = _codigo
+    _ESTADO_POR_TEXTO[_etiqueta.lower()] = _codigo
+
+
+def fila_exportacion(tarea):
+    """Fila CSV de una tarea (requiere proyecto/responsable y M2M precargados)."""
+    return [
+        tarea.id,
+        tarea.titulo,
+        tarea.get_estado_display(),
+        tarea.proyecto or '',
+        tarea.fecha_objetivo.isoformat(),
+        tarea.responsable.username if tarea.responsable else '',
+        SEPARADOR_LISTAS.join(e.nombre for e in tarea.etiquetas.all()),
+        SEPARADOR_LISTAS.join(u.username for u in tarea.compartida_con.all()),
+        tarea.costo,
+        tarea.descripcion,
+        tarea.avance,
+        tarea.observaciones,
+    ]
+
+
+def detectar_formato(nombre_archivo):
+    nombre = (nombre_archivo or '').lower()
+    if nombre.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+# ======================================================
+# 2. LECTURA EN STREAMING (UNA FILA A LA VEZ)
+# ======================================================
+def _normalizar(registro):
+    fila = {}
+    for clave, valor in registro.items():
+        campo = _CAMPO_POR_COLUMNA.get(str(clave or '').strip().lower())
+        if campo:
+            fila[campo] = '' if valor is None else valor
+    return fila
+
+
+def leer_csv(flujo):
+    """Genera (numero_de_linea, fila) sin cargar el archivo completo."""
+    lector = csv.DictReader(flujo)
+    for registro in lector:
+        yield lector.line_num, _normalizar(registro), None
+
+
+def leer_jsonl(flujo):
+    for numero, linea in enumerate(flujo, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            registro = json.loads(linea)
+        except ValueError as e:
+            yield numero, None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(registro, dict):
+            yield numero, None, "Cada línea debe ser un objeto JSON."
+            continue
+        yield numero, _normalizar(registro), None
+
+
+def _lista(valor):
+    if isinstance(valor, (list, tuple)):
+        return [str(v).strip() for v in valor if str(v).strip()]
+    return [v.strip() for v in str(valor or '').split(SEPARADOR_LISTAS) if v.strip()]
+
+# ======================================================
+# 3. VALIDACIÓN (MISMAS REGLAS QUE TareaForm)
+# ======================================================
+class FilaImportacionForm(TareaForm):
+    """TareaForm sin campos relacionales: esos se resuelven por lotes."""
+
+    class Meta(TareaForm.Meta):
+        fields = ['titulo', 'descripcion', 'costo', 'fecha_objetivo', 'estado', 'avance', 'observaciones']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields.pop('responsable')
+
+# ======================================================
+# 4. IMPORTADOR POR LOTES
+# ======================================================
+class ImportadorTareas:
+    """
+    Importa tareas por lotes: valida cada fila con las reglas de TareaForm,
+    resuelve proyectos/usuarios/etiquetas con una consulta por lote y escribe
+    con bulk_create (tareas y tablas intermedias M2M).
+    La memoria depende del tamaño del lote, no del archivo.
+    """
+
+    def __init__(self, usuario, proyecto=None, tamano_lote=500, reporte=None, limite_errores=100):
+        self.usuario = usuario
+        self.proyecto = proyecto
+        self.tamano_lote = tamano_lote
+        self.reporte = reporte          # Opcional: csv.writer donde se vuelcan TODOS los errores
+        self.limite_errores = limite_errores
+        self.creadas = 0
+        self.rechazadas = 0
+        self.errores = []               # Solo los primeros `limite_errores` (para mostrar en pantalla)
+        self.hoy = timezone.now().date()
+
+    def importar(self, flujo, formato='csv'):
+        filas = leer_jsonl(flujo) if formato == 'jsonl' else leer_csv(flujo)
+        lote = []
+        for numero, fila, error in filas:
+            if error:
+                self._rechazar(numero, [error])
+                continue
+            lote.append((numero, fila))
+            if len(lote) >= self.tamano_lote:
+                self._procesar_lote(lote)
+                lote = []
+        if lote:
+            self._procesar_lote(lote)
+        return self
+
+    def _rechazar(self, numero, errores):
+        self.rechazadas += 1
+        if len(self.errores) < self.limite_errores:
+            self.errores.append((numero, errores))
+        if self.reporte is not None:
+            self.reporte.writerow([numero, ' | '.join(errores)])
+
+    # --- Resolución por lotes ---
+    def _resolver_proyectos(self, lote):
+        if self.proyecto:
+            return {}
+        titulos = {str(fila.get('proyecto') or '').strip() for _, fila in lote} - {''}
+        if not titulos:
+            return {}
+        proyectos = {}
+        visibles = Proyecto.objects.filter(
+            Q(usuario=self.usuario) | Q(equipo=self.usuario), titulo__in=titulos
+        ).distinct().order_by('id').values_list('titulo', 'id', 'usuario_id')
+        for titulo, pid, dueno_id in visibles:
+            proyectos.setdefault(titulo, (pid, dueno_id))
+        return proyectos
+
+    def _resolver_equipos(self, proyectos):
+        """Usuarios autorizados por proyecto: dueño + equipo (igual que TareaForm)."""
+        equipos = {pid: {dueno_id} for pid, dueno_id in proyectos}
+        if equipos:
+            miembros = Proyecto.equipo.through.objects.filter(
+                proyecto_id__in=list(equipos)
+            ).values_list('proyecto_id', 'user_id')
+            for pid, uid in miembros:
+                equipos[pid].add(uid)
+        return equipos
+
+    def _procesar_lote(self, lote):
+        proyectos = self._resolver_proyectos(lote)
+        if self.proyecto:
+            equipos = self._resolver_equipos([(self.proyecto.id, self.proyecto.usuario_id)])
+        else:
+            equipos = self._resolver_equipos(proyectos.values())
+
+        nombres_usuarios = set()
+        nombres_etiquetas = set()
+        for _, fila in lote:
+            nombres_usuarios.update(_lista(fila.get('responsable')))
+            nombres_usuarios.update(_lista(fila.get('compartida_con')))
+            nombres_etiquetas.update(_lista(fila.get('etiquetas')))
+
+        usuarios = dict(User.objects.filter(username__in=nombres_usuarios).values_list('username', 'id'))
+        etiquetas = {}
+        for nombre, eid in Etiqueta.objects.filter(
+            usuario=self.usuario, nombre__in=nombres_etiquetas
+        ).order_by('id').values_list('nombre', 'id'):
+            etiquetas.setdefault(nombre, eid)
+
+        validas = []  # (tarea, [nombres_etiquetas], [ids_compartida])
+        for numero, fila in lote:
+            resultado = self._validar_fila(fila, proyectos, equipos, usuarios)
+            if isinstance(resultado, list):
+                self._rechazar(numero, resultado)
+            else:
+                validas.append(resultado)
+
+        if not validas:
+            return
+
+        with transaction.atomic():
+            # Etiquetas nuevas del usuario (una sola inserción por lote)
+            faltantes = {n for _, nombres, _ in validas for n in nombres} - set(etiquetas)
+            if faltantes:
+                nuevas = Etiqueta.objects.bulk_create(
+                    [Etiqueta(usuario=self.usuario, nombre=n) for n in sorted(faltantes)]
+                )
+                etiquetas.update({e.nombre: e.id for e in nuevas})
+
+            tareas = Tarea.objects.bulk_create([t for t, _, _ in validas], batch_size=self.tamano_lote)
+
+            EtiquetaTarea = Tarea.etiquetas.through
+            Compartida = Tarea.compartida_con.through
+            EtiquetaTarea.objects.bulk_create([
+                EtiquetaTarea(tarea_id=t.id, etiqueta_id=etiquetas[n])
+                for t, (_, nombres, _) in zip(tareas, validas) for n in nombres
+            ], batch_size=self.tamano_lote)
+            Compartida.objects.bulk_create([
+                Compartida(tarea_id=t.id, user_id=uid)
+                for t, (_, _, ids) in zip(tareas, validas) for uid in ids
+            ], batch_size=self.tamano_lote)
+            registrar_altas(tareas)
+            invalidar_calendarios({self.usuario.id} | {t.responsable_id for t in tareas} | {u for _, _, ids in validas for u in ids})
+
+        self.creadas += len(tareas)
+
+    def _validar_fila(self, fila, proyectos, equipos, usuarios):
+        datos = dict(fila)
+        estado = str(datos.get('estado') or '').strip()
+        datos['estado'] = _ESTADO_POR_TEXTO.get(estado.lower(), estado) if estado else 'PENDIENTE'
+        if not str(datos.get('costo') or '').strip():
+            datos['costo'] = '0'
+
+        form = FilaImportacionForm(data=datos)
+        errores = [f"{campo}: {' '.join(msgs)}" for campo, msgs in form.errors.items()]
+
+        # Proyecto
+        proyecto_id = self.proyecto.id if self.proyecto else None
+        if not self.proyecto:
+            titulo = str(datos.get('proyecto') or '').strip()
+            if titulo:
+                if titulo in proyectos:
+                    proyecto_id = proyectos[titulo][0]
+                else:
+                    errores.append(f"proyecto: '{titulo}' no existe o no tiene acceso.")
+        autorizados = equipos.get(proyecto_id) if proyecto_id else None
+
+        # Responsable y colaboradores
+        def resolver_usuario(nombre, campo):
+            uid = usuarios.get(nombre)
+            if uid is None:
+                errores.append(f"{campo}: usuario '{nombre}' no existe.")
+            elif autorizados is not None and uid not in autorizados:
+                errores.append(f"{campo}: '{nombre}' no pertenece al equipo del proyecto.")
+            return uid
+
+        responsable_id = None
+        responsables = _lista(datos.get('responsable'))
+        if len(responsables) > 1:
+            errores.append("responsable: solo se admite un responsable.")
+        elif responsables:
+            responsable_id = resolver_usuario(responsables[0], 'responsable')
+        compartida_ids = {resolver_usuario(n, 'compartida_con') for n in _lista(datos.get('compartida_con'))}
+
+        if errores:
+            return errores
+
+        tarea = form.save(commit=False)
+        tarea.usuario = self.usuario
+        tarea.proyecto_id = proyecto_id
+        tarea.responsable_id = responsable_id
+        if tarea.estado == 'COMPLETADA':
+            tarea.fecha_cierre = self.hoy
+        tarea.fin_proyectado = fin_propio(tarea.estado, tarea.fecha_objetivo, tarea.fecha_cierre)  # Sin dependencias aún
+        return tarea, sorted(set(_lista(datos.get('etiquetas')))), sorted(compartida_ids)
@@ -0,0 +1,138 @@
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import Length
+
+from .models import Tarea
+
+# ======================================================
+# KANBAN: ORDEN MANUAL CON CLAVES FRACCIONARIAS
+# ======================================================
+# Cada tarjeta guarda en `Tarea.rango` una cadena en base 36 que se lee como
+# la parte fraccionaria de un número (0.<rango>). Para poner una tarjeta
+# entre otras dos basta con calcular una clave entre las de sus vecinas:
+# mover escribe una sola fila, nunca se renumera la columna.
+#
+# Solo se usan dígitos y minúsculas para que el orden de la cadena sea el
+# mismo con cualquier collation de la base de datos. Las claves nunca
+# terminan en '0' (así siempre hay lugar entre dos claves distintas).
+#
+# Insertar una y otra vez en el mismo hueco alarga la clave un carácter cada
+# ~5 movimientos. `rebalancear_kanban` (cron) reparte de nuevo las columnas
+# con claves largas; si una clave llegara al máximo del campo, la columna se
+# reparte en el momento.
+
+DIGITOS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITOS)
+_VALOR = {d: i for i, d in enumerate(DIGITOS)}
+
+LARGO_REBALANCEO = 24   # A partir de aquí la columna queda para el rebalanceo en segundo plano
+LARGO_MAXIMO = Tarea._meta.get_field('rango').max_length
+TAMANO_LOTE = 1000
+
+# Mismo orden en el tablero y al repartir: las tarjetas sin rango van arriba
+ORDEN_COLUMNA = ('rango', 'fecha_objetivo', 'id')
+
+
+def rango_entre(antes='', despues=''):
+    """
+    Clave estrictamente entre `antes` y `despues` ('' = sin límite).
+    Es la más corta posible: un carácter más que el prefijo común.
+    """
+    if despues and antes >= despues:
+        raise ValueError(f'Rangos fuera de orden: {antes!r} >= {despues!r}')
+    prefijo, i, acotado = '', 0, bool(despues)
+    while True:
+        a = _VALOR[antes[i]] if i < len(antes) else 0
+        b = _VALOR[despues[i]] if acotado and i < len(despues) else BASE
+        if b - a > 1:
+            return prefijo + DIGITOS[(a + b) // 2]
+        # Mismo dígito, o dígitos consecutivos: se baja un nivel. En el
+        # segundo caso `despues` ya no limita lo que sigue.
+        acotado = acotado and a == b
+        prefijo += DIGITOS[a]
+        i += 1
+
+
+def rangos_repartidos(cantidad):
+    """`cantidad` claves crecientes, equiespaciadas y con margen para insertar entre ellas."""
+    largo = 1
+    while BASE ** largo < (cantidad + 1) * BASE:
+        largo += 1
+    total = BASE ** largo
+    claves = []
+    for i in range(1, cantidad + 1):
+        valor = i * total // (cantidad + 1)
+        digitos = []
+        for _ in range(largo):
+            valor, resto = divmod(valor, BASE)
+            digitos.append(DIGITOS[resto])
+        claves.append(''.join(reversed(digitos)).rstrip('0'))
+    return claves
+
+
+def columna(proyecto_id, estado):
+    return Tarea.objects.filter(proyecto_id=proyecto_id, estado=estado)
+
+
+@transaction.atomic
+def rebalancear_columna(proyecto_id, estado):
+    """Reasigna claves cortas a toda la columna conservando su orden. Devuelve cuántas filas cambió."""
+    filas = list(columna(proyecto_id, estado).select_for_update().order_by(*ORDEN_COLUMNA).values_list('id', 'rango'))
+    cambios = [
+        Tarea(id=pk, rango=nuevo)
+        for (pk, actual), nuevo in zip(filas, rangos_repartidos(len(filas)))
+        if actual != nuevo
+    ]
+    # bulk_update no dispara señales: el rango no afecta calendario ni ruta crítica
+    Tarea.objects.bulk_update(cambios, ['rango'], batch_size=TAMANO_LOTE)
+    return len(cambios)
+
+
+def columnas_a_rebalancear(largo=LARGO_REBALANCEO, proyecto_id=None):
+    """(proyecto_id, estado) de las columnas cuya clave más larga supera `largo`."""
+    qs = Tarea.objects.exclude(proyecto=None)
+    if proyecto_id:
+        qs = qs.filter(proyecto_id=proyecto_id)
+    return qs.values('proyecto_id', 'estado').annotate(largo=Max(Length('rango'))).filter(
+        largo__gt=largo
+    ).values_list('proyecto_id', 'estado').order_by()
+
+
+def _rango_de(proyecto_id, estado, tarea_id, excluir):
+    if not tarea_id:
+        return None
+    return columna(proyecto_id, estado).exclude(pk=excluir).filter(pk=tarea_id).values_list('rango', flat=True).first()
+
+
+def calcular_rango(tarea, estado, antes_id=None, despues_id=None, _repartida=False):
+    """
+    Clave para dejar `tarea` en la columna `estado` debajo de `antes_id` y
+    encima de `despues_id` (vecinas tal como las ve el tablero; None = borde).
+    Lanza ValueError si alguna vecina ya no está en esa columna.
+    """
+    antes = _rango_de(tarea.proyecto_id, estado, antes_id, tarea.pk)
+    despues = _rango_de(tarea.proyecto_id, estado, despues_id, tarea.pk)
+    if (antes_id and antes is None) or (despues_id and despues is None):
+        raise ValueError('El tablero cambió: recargue la página.')
+
+    rango = None
+    if not antes_id and not despues_id:
+        rango = rango_entre()
+    elif not antes_id:
+        # Al tope de la columna. Nada va "antes" de una clave vacía: si la
+        # primera no tiene rango, se reparte la columna.
+        if despues:
+            rango = rango_entre('', despues)
+    elif not despues_id:
+        rango = rango_entre(antes, '')
+    elif antes < despues:
+        rango = rango_entre(antes, despues)
+
+    if rango is not None and len(rango) <= LARGO_MAXIMO:
+        return rango
+    # Vecinas sin rango o empatadas (tareas nuevas, importadas) o clave
+    # agotada: la columna recibe claves nuevas y se vuelve a calcular.
+    if _repartida:
+        raise ValueError('El tablero cambió: recargue la página.')
+    rebalancear_columna(tarea.proyecto_id, estado)
+    return calcular_rango(tarea, estado, antes_id, despues_id, _repartida=True)
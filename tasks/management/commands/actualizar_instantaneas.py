@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from tasks.eventos import actualizar_instantaneas
+from tasks.models import Proyecto
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica los eventos nuevos de la bitácora de tareas a las instantáneas diarias de cada "
+        "proyecto (flujo acumulado y burndown). Incremental e idempotente: apto para cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--proyecto', type=int, help="Limitar a un proyecto")
+
+    def handle(self, *args, **opts):
+        proyectos = Proyecto.objects.order_by('id').values_list('id', flat=True)
+        if opts['proyecto']:
+            proyectos = proyectos.filter(id=opts['proyecto'])
+        filas = 0
+        for proyecto_id in proyectos.iterator():
+            filas += actualizar_instantaneas(proyecto_id)
+        self.stdout.write(self.style.SUCCESS(f"Instantáneas actualizadas: {filas} filas escritas."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from tasks.presupuesto import conciliar, desviados
+
+
+class Command(BaseCommand):
+    help = ("Red de seguridad: corrige el gastado acumulado de los proyectos que no coincide con la suma de "
+            "su historial (cambios hechos sin señales, p. ej. SQL directo) y avisa los umbrales que recién quedan alcanzados.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--proyecto', type=int, action='append', help="Solo este proyecto (se puede repetir)")
+        parser.add_argument('--sin-avisos', action='store_true', help="Marca los umbrales alcanzados sin notificar")
+        parser.add_argument('--simular', action='store_true', help="Solo lista los proyectos desviados")
+
+    def handle(self, *args, **opts):
+        if opts['simular']:
+            ids = desviados(opts['proyecto'])
+            self.stdout.write(f"Proyectos desviados: {len(ids)}" + (f" ({', '.join(map(str, ids))})" if ids else ''))
+            return
+        corregidos = conciliar(opts['proyecto'], avisar=not opts['sin_avisos'])
+        for proyecto_id, anterior, real in corregidos:
+            self.stdout.write(f"  Proyecto {proyecto_id}: ${anterior} -> ${real}")
+        self.stdout.write(self.style.SUCCESS(f"Presupuestos conciliados: {len(corregidos)} proyectos corregidos."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.eliminacion import borrar_proyecto
+from tasks.models import Proyecto
+
+
+class Command(BaseCommand):
+    help = "Elimina un proyecto completo con SQL por conjuntos, informando el avance (para proyectos muy grandes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('proyecto_id', type=int)
+        parser.add_argument('--lote', type=int, default=5000, help="Tareas por lote (default: 5000)")
+
+    def handle(self, *args, **opts):
+        try:
+            proyecto = Proyecto.objects.get(id=opts['proyecto_id'])
+        except Proyecto.DoesNotExist:
+            raise CommandError(f"El proyecto {opts['proyecto_id']} no existe.")
+
+        def progreso(hechas, total):
+            self.stdout.write(f"  {hechas}/{total} tareas eliminadas")
+
+        titulo = proyecto.titulo
+        total = borrar_proyecto(proyecto, tamano_lote=opts['lote'], progreso=progreso)
+        self.stdout.write(self.style.SUCCESS(f"Proyecto '{titulo}' eliminado ({total} tareas)."))
@@ -0,0 +1,92 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import Tarea, ResumenEnviado
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía un resumen diario por usuario con sus tareas vencidas o por vencer "
+        "(creador, responsable y colaboradores). Idempotente: pensado para cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=3, help="Ventana de 'por vencer' en días (default: 3)")
+        parser.add_argument('--simular', action='store_true', help="No envía correos, solo informa")
+        parser.add_argument('--lote', type=int, default=100, help="Correos registrados por lote (default: 100)")
+
+    def handle(self, *args, **opts):
+        hoy = timezone.localdate()
+        limite = hoy + timedelta(days=opts['dias'])
+
+        # 1. Una sola pasada por el índice (fecha_objetivo, estado)
+        abiertas = Tarea.objects.filter(fecha_objetivo__lte=limite).exclude(estado='COMPLETADA')
+        tareas = {}
+        por_usuario = defaultdict(set)
+        for t in abiertas.values('id', 'titulo', 'fecha_objetivo', 'usuario_id', 'responsable_id', 'proyecto__titulo').iterator(chunk_size=2000):
+            tareas[t['id']] = t
+            por_usuario[t['usuario_id']].add(t['id'])
+            if t['responsable_id']:
+                por_usuario[t['responsable_id']].add(t['id'])
+        for tarea_id, user_id in Tarea.compartida_con.through.objects.filter(
+            tarea__in=abiertas
+        ).values_list('tarea_id', 'user_id').iterator(chunk_size=2000):
+            por_usuario[user_id].add(tarea_id)
+
+        # 2. Quitamos a quienes ya recibieron el resumen hoy
+        ya_enviados = set(ResumenEnviado.objects.filter(fecha=hoy, usuario_id__in=por_usuario).values_list('usuario_id', flat=True))
+        destinatarios = User.objects.filter(
+            id__in=set(por_usuario) - ya_enviados, is_active=True
+        ).exclude(email='').values_list('id', 'username', 'email')
+
+        if opts['simular']:
+            for uid, username, email in destinatarios:
+                self.stdout.write(f"  @{username} <{email}>: {len(por_usuario[uid])} tareas")
+            return
+
+        # 3. Un único canal SMTP para todos los correos
+        enviados = 0
+        registros = []
+        conexion = get_connection()
+        conexion.open()
+        try:
+            for uid, username, email in destinatarios:
+                mensaje = EmailMessage(
+                    f"UpTask: {len(por_usuario[uid])} tareas requieren atención",
+                    self._cuerpo(username, [tareas[i] for i in por_usuario[uid]], hoy),
+                    settings.EMAIL_HOST_USER,
+                    [email],
+                    connection=conexion,
+                )
+                if conexion.send_messages([mensaje]):
+                    enviados += 1
+                    registros.append(ResumenEnviado(usuario_id=uid, fecha=hoy))
+                if len(registros) >= opts['lote']:
+                    ResumenEnviado.objects.bulk_create(registros, ignore_conflicts=True)
+                    registros = []
+        finally:
+            ResumenEnviado.objects.bulk_create(registros, ignore_conflicts=True)
+            conexion.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Resúmenes enviados: {enviados} (omitidos por ya enviados hoy: {len(ya_enviados)})."))
+
+    def _cuerpo(self, username, tareas, hoy):
+        tareas.sort(key=lambda t: t['fecha_objetivo'])
+        vencidas = [t for t in tareas if t['fecha_objetivo'] < hoy]
+        proximas = [t for t in tareas if t['fecha_objetivo'] >= hoy]
+        lineas = [f"Hola @{username}, este es su radar de vencimientos.", ""]
+        for titulo, grupo in (("VENCIDAS", vencidas), ("POR VENCER", proximas)):
+            if grupo:
+                lineas.append(f"{titulo}:")
+                for t in grupo:
+                    proyecto = f" [{t['proyecto__titulo']}]" if t['proyecto__titulo'] else ""
+                    lineas.append(f"  - {t['fecha_objetivo']:%d/%m/%Y}  {t['titulo']}{proyecto}")
+                lineas.append("")
+        lineas.append("Ver en UpTask.")
+        return "\n".join(lineas)
@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.models import Proyecto
+from tasks.respaldo import exportar
+
+
+class Command(BaseCommand):
+    help = "Escribe en disco el respaldo ZIP de un proyecto o de todo lo que ve un usuario, sin armarlo en memoria."
+
+    def add_arguments(self, parser):
+        alcance = parser.add_mutually_exclusive_group(required=True)
+        alcance.add_argument('--usuario', help="Username: su espacio de trabajo completo")
+        alcance.add_argument('--proyecto', type=int, help="ID del proyecto")
+        parser.add_argument('salida', help="Ruta del .zip a crear")
+
+    def handle(self, *args, **opts):
+        proyecto = usuario = None
+        try:
+            if opts['proyecto']:
+                proyecto = Proyecto.objects.get(id=opts['proyecto'])
+            else:
+                usuario = User.objects.get(username=opts['usuario'])
+        except (Proyecto.DoesNotExist, User.DoesNotExist):
+            raise CommandError("No existe el proyecto o usuario indicado.")
+
+        escritos = 0
+        with open(opts['salida'], 'wb') as destino:
+            for trozo in exportar(proyecto=proyecto, usuario=usuario):
+                destino.write(trozo)
+                escritos += len(trozo)
+        self.stdout.write(self.style.SUCCESS(f"Respaldo escrito en {opts['salida']} ({escritos / 1024 / 1024:.1f} MB)."))
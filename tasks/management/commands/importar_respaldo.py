@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.respaldo import RespaldoInvalido, importar
+
+
+class Command(BaseCommand):
+    help = ("Restaura un respaldo ZIP (exportar_respaldo) como objetos nuevos. Los usuarios se buscan por "
+            "username; lo de usuarios que no existen queda a nombre de --usuario.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del .zip")
+        parser.add_argument('--usuario', required=True, help="Username que recibe lo que no tenga dueño en destino")
+
+    def handle(self, *args, **opts):
+        try:
+            usuario = User.objects.get(username=opts['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"El usuario '{opts['usuario']}' no existe.")
+        try:
+            creados = importar(opts['archivo'], usuario)
+        except (RespaldoInvalido, OSError) as e:
+            raise CommandError(str(e))
+
+        for nombre, n in creados.items():
+            self.stdout.write(f"  {nombre}: {n}")
+        self.stdout.write(self.style.SUCCESS("Respaldo importado."))
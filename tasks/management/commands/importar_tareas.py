@@ -0,0 +1,52 @@
+import csv
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.importacion import ImportadorTareas, detectar_formato
+from tasks.models import Proyecto
+
+
+class Command(BaseCommand):
+    help = "Importa tareas desde un archivo CSV/JSONL (mismo formato que exportar_csv) por lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo .csv o .jsonl")
+        parser.add_argument('--usuario', required=True, help="Username del creador de las tareas")
+        parser.add_argument('--proyecto', type=int, help="ID del proyecto destino (ignora la columna Proyecto)")
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help="Por defecto se deduce de la extensión")
+        parser.add_argument('--lote', type=int, default=500, help="Filas por lote (default: 500)")
+        parser.add_argument('--reporte', help="Ruta del CSV de errores por fila (default: stderr)")
+
+    def handle(self, *args, **opts):
+        try:
+            usuario = User.objects.get(username=opts['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"El usuario '{opts['usuario']}' no existe.")
+
+        proyecto = None
+        if opts['proyecto']:
+            try:
+                proyecto = Proyecto.objects.get(id=opts['proyecto'])
+            except Proyecto.DoesNotExist:
+                raise CommandError(f"El proyecto {opts['proyecto']} no existe.")
+            if proyecto.usuario_id != usuario.id and not proyecto.equipo.filter(id=usuario.id).exists():
+                raise CommandError("El usuario no pertenece al proyecto indicado.")
+
+        formato = opts['formato'] or detectar_formato(opts['archivo'])
+        salida_reporte = open(opts['reporte'], 'w', newline='', encoding='utf-8') if opts['reporte'] else sys.stderr
+        try:
+            reporte = csv.writer(salida_reporte)
+            reporte.writerow(['Fila', 'Errores'])
+            with open(opts['archivo'], newline='', encoding='utf-8-sig') as flujo:
+                resultado = ImportadorTareas(
+                    usuario, proyecto=proyecto, tamano_lote=opts['lote'], reporte=reporte
+                ).importar(flujo, formato=formato)
+        finally:
+            if opts['reporte']:
+                salida_reporte.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Importación terminada: {resultado.creadas} creadas, {resultado.rechazadas} rechazadas."
+        ))
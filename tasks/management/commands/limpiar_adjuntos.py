@@ -0,0 +1,31 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from tasks.models import ArchivoPendiente, HistorialAvance
+
+
+class Command(BaseCommand):
+    help = "Worker de limpieza: borra del disco los adjuntos encolados al eliminar proyectos (apto para cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Archivos por lote (default: 500)")
+
+    def handle(self, *args, **opts):
+        borrados = 0
+        while True:
+            pendientes = list(ArchivoPendiente.objects.order_by('id')[:opts['lote']])
+            if not pendientes:
+                break
+            rutas = {p.ruta for p in pendientes}
+            # Por seguridad no borramos archivos que algún registro siga usando
+            en_uso = set(HistorialAvance.objects.filter(archivo__in=rutas).values_list('archivo', flat=True))
+            for ruta in rutas - en_uso:
+                try:
+                    if default_storage.exists(ruta):
+                        default_storage.delete(ruta)
+                        borrados += 1
+                except OSError as e:
+                    self.stderr.write(f"No se pudo borrar {ruta}: {e}")
+            ArchivoPendiente.objects.filter(id__in=[p.id for p in pendientes]).delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Limpieza terminada: {borrados} archivos borrados."))
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.recurrencia import TAMANO_LOTE, VENTANA_DIAS, materializar, reglas_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea las ocurrencias de tareas recurrentes que entran en la ventana móvil "
+        "(hoy + N días). Idempotente: pensado para cron diario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=VENTANA_DIAS, help=f"Días hacia adelante (default: {VENTANA_DIAS})")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f"Reglas por transacción (default: {TAMANO_LOTE})")
+
+    def handle(self, *args, **opts):
+        hasta = timezone.now().date() + timedelta(days=opts['dias'])
+        reglas = creadas = 0
+        ultimo_id = 0
+        while True:
+            # Por id creciente: cada lote es una transacción corta y no se vuelve a leer lo ya hecho
+            lote = list(reglas_pendientes(hasta).filter(id__gt=ultimo_id)[:opts['lote']])
+            if not lote:
+                break
+            creadas += materializar(lote, hasta)
+            reglas += len(lote)
+            ultimo_id = lote[-1].id
+        self.stdout.write(self.style.SUCCESS(
+            f"Recurrencias al {hasta}: {reglas} reglas revisadas, {creadas} ocurrencias creadas."
+        ))
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from tasks.models import Actividad
+
+
+class Command(BaseCommand):
+    help = "Política de retención del feed: borra movimientos viejos y recorta cada feed a un máximo de filas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=180, help="Borra movimientos más antiguos que esto (default: 180)")
+        parser.add_argument('--maximo', type=int, default=1000, help="Máximo de movimientos por usuario (default: 1000)")
+        parser.add_argument('--lote', type=int, default=5000, help="Filas borradas por sentencia (default: 5000)")
+
+    def _borrar_por_lotes(self, qs, lote):
+        total = 0
+        while True:
+            ids = list(qs.values_list('id', flat=True)[:lote])
+            if not ids:
+                return total
+            total += Actividad.objects.filter(id__in=ids).delete()[0]
+
+    def handle(self, *args, **opts):
+        limite = timezone.now() - timedelta(days=opts['dias'])
+        viejos = self._borrar_por_lotes(Actividad.objects.filter(fecha__lt=limite).order_by(), opts['lote'])
+
+        recortados = 0
+        excedidos = Actividad.objects.values('usuario_id').annotate(n=Count('id')).filter(n__gt=opts['maximo'])
+        for fila in excedidos.iterator():
+            corte = Actividad.objects.filter(usuario_id=fila['usuario_id']).values_list('fecha', 'id')[opts['maximo']]
+            sobrantes = Actividad.objects.filter(
+                Q(fecha__lt=corte[0]) | Q(fecha=corte[0], id__lte=corte[1]), usuario_id=fila['usuario_id']
+            ).order_by()
+            recortados += self._borrar_por_lotes(sobrantes, opts['lote'])
+
+        self.stdout.write(self.style.SUCCESS(f"Feed podado: {viejos} por antigüedad, {recortados} por exceso."))
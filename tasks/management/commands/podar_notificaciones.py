@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import Notificacion
+
+
+class Command(BaseCommand):
+    help = "Borra por lotes las notificaciones ya leídas más antiguas que N días. Las no leídas nunca se borran."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30, help="Antigüedad mínima de las leídas a borrar (default: 30)")
+        parser.add_argument('--lote', type=int, default=5000, help="Filas borradas por sentencia (default: 5000)")
+
+    def handle(self, *args, **opts):
+        limite = timezone.now() - timedelta(days=opts['dias'])
+        viejas = Notificacion.objects.filter(leida=True, fecha__lt=limite).order_by()
+        total = 0
+        while True:
+            # Sentencias cortas: no bloquean la tabla mientras la bandeja se sigue usando
+            ids = list(viejas.values_list('id', flat=True)[:opts['lote']])
+            if not ids:
+                break
+            total += Notificacion.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Notificaciones podadas: {total} leídas anteriores a {limite:%d/%m/%Y}."))
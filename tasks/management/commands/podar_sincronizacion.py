@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import CambioSync
+from tasks.sincronizacion import RETENCION_DIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las marcas de sincronización (borrados y cambios de acceso) más viejas que la retención. "
+        "Los clientes con un cursor anterior reciben 'reinicio' y descargan todo de nuevo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help="Filas borradas por sentencia (default: 5000)")
+
+    def handle(self, *args, **opts):
+        # La retención es la misma que usa la API para decidir el reinicio: no es configurable aquí
+        limite = timezone.now() - timedelta(days=RETENCION_DIAS)
+        total = 0
+        while True:
+            ids = list(CambioSync.objects.filter(fecha__lt=limite).order_by('fecha', 'id').values_list('id', flat=True)[:opts['lote']])
+            if not ids:
+                break
+            total += CambioSync.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Sincronización podada: {total} marcas anteriores a {limite:%d/%m/%Y}."))
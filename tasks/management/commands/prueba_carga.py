@@ -0,0 +1,163 @@
+import json
+import multiprocessing
+import socket
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tasks import carga
+from tasks.eventos import registrar_altas
+from tasks.models import Proyecto, Tarea
+
+PREFIJO = 'carga_'
+
+
+class _ServidorWSGI(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _ManejadorSilencioso(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de punta a punta: levanta la app en loopback (WSGI o ASGI) y ejecuta "
+        "recorridos de usuario concurrentes. Genera un reporte JSON con rps, p50/p95/p99 y errores por URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servidor', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--procesos', type=int, default=2, help="Procesos generadores de carga (default: 2)")
+        parser.add_argument('--hilos', type=int, default=5, help="Usuarios virtuales por proceso (default: 5)")
+        parser.add_argument('--duracion', type=float, default=30, help="Segundos de carga (default: 30)")
+        parser.add_argument('--iteraciones', type=int, default=0, help="Recorridos por usuario (0 = usar --duracion)")
+        parser.add_argument('--sembrar', type=int, default=0,
+                            help=f"Crea N usuarios '{PREFIJO}*' con proyecto y tareas antes de empezar")
+        parser.add_argument('--tareas-por-usuario', type=int, default=20)
+        parser.add_argument('--password', default='carga-uptask', help="Contraseña de los usuarios sembrados")
+        parser.add_argument('--salida', help="Ruta del reporte JSON (por defecto se imprime)")
+
+    # --- Datos de prueba ---
+    def _sembrar(self, cantidad, por_usuario, password):
+        existentes = set(User.objects.filter(username__startswith=PREFIJO).values_list('username', flat=True))
+        clave = make_password(password)  # Un solo hash para todos: sembrar miles de usuarios es instantáneo
+        nuevos = [
+            User(username=f'{PREFIJO}{i}', email=f'{PREFIJO}{i}@example.com', password=clave)
+            for i in range(cantidad) if f'{PREFIJO}{i}' not in existentes
+        ]
+        for u in nuevos:
+            u.save()  # save() individual: dispara la señal que crea el Perfil
+        # Por id: el dueño del proyecto (y su perfil de latencia) es el mismo en cada corrida
+        usuarios = list(User.objects.filter(username__startswith=PREFIJO).order_by('id'))
+        proyecto, _ = Proyecto.objects.get_or_create(titulo='Proyecto de Carga', usuario=usuarios[0])
+        proyecto.equipo.add(*usuarios)
+        hoy = timezone.now().date()
+        tareas = Tarea.objects.bulk_create([
+            Tarea(titulo=f'Tarea {j} de {u.username}', usuario=usuarios[0], responsable=u, proyecto=proyecto,
+                  fecha_objetivo=hoy + timedelta(days=j % 15), fin_proyectado=hoy + timedelta(days=j % 15))
+            for u in nuevos for j in range(por_usuario)
+        ], batch_size=1000)
+        registrar_altas(tareas)
+        self.stdout.write(f"Sembrados {len(nuevos)} usuarios nuevos ({len(usuarios)} en total).")
+
+    def _cuentas(self, password):
+        tareas = defaultdict(list)
+        for username, tarea_id in Tarea.objects.filter(
+            responsable__username__startswith=PREFIJO
+        ).values_list('responsable__username', 'id'):
+            tareas[username].append(tarea_id)
+        nombres = User.objects.filter(username__startswith=PREFIJO).order_by('id').values_list('username', flat=True)
+        return [{'username': n, 'password': password, 'tareas': tareas[n]} for n in nombres]
+
+    # --- Servidores en loopback ---
+    def _levantar_wsgi(self, puerto):
+        from django.core.wsgi import get_wsgi_application
+        httpd = make_server('127.0.0.1', puerto, get_wsgi_application(),
+                            server_class=_ServidorWSGI, handler_class=_ManejadorSilencioso)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        return httpd.shutdown
+
+    def _levantar_asgi(self, puerto):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError("La variante ASGI requiere uvicorn (pip install uvicorn).")
+        from django.core.asgi import get_asgi_application
+        servidor = uvicorn.Server(uvicorn.Config(
+            get_asgi_application(), host='127.0.0.1', port=puerto, log_level='warning', lifespan='off'
+        ))
+        servidor.install_signal_handlers = lambda: None
+        threading.Thread(target=servidor.run, daemon=True).start()
+        while not servidor.started:
+            time.sleep(0.05)
+
+        def detener():
+            servidor.should_exit = True
+        return detener
+
+    def handle(self, *args, **opts):
+        if opts['sembrar']:
+            self._sembrar(opts['sembrar'], opts['tareas_por_usuario'], opts['password'])
+        cuentas = self._cuentas(opts['password'])
+        if not cuentas:
+            raise CommandError(f"No hay usuarios '{PREFIJO}*'. Use --sembrar N para crearlos.")
+
+        puerto = _puerto_libre()
+        detener = self._levantar_wsgi(puerto) if opts['servidor'] == 'wsgi' else self._levantar_asgi(puerto)
+        base = f'http://127.0.0.1:{puerto}'
+
+        # Reparto de usuarios virtuales: `hilos` cuentas por proceso
+        total = opts['procesos'] * opts['hilos']
+        asignadas = [cuentas[i % len(cuentas)] for i in range(total)]
+        grupos = [asignadas[i::opts['procesos']] for i in range(opts['procesos'])]
+        terminos = ['ca', 'car', 'rga', 'ga_1', 'ex']
+
+        self.stdout.write(f"Carga {opts['servidor'].upper()} en {base}: {opts['procesos']} procesos x {opts['hilos']} hilos...")
+        contexto = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else multiprocessing
+        inicio = time.perf_counter()
+        try:
+            with contexto.Pool(opts['procesos']) as pool:
+                parciales = pool.starmap(carga.trabajador, [
+                    (base, g, opts['duracion'] if not opts['iteraciones'] else 0, opts['iteraciones'], terminos)
+                    for g in grupos
+                ])
+        finally:
+            segundos = time.perf_counter() - inicio
+            detener()
+
+        muestras = defaultdict(list)
+        for parcial in parciales:
+            for nombre, valores in parcial.items():
+                muestras[nombre].extend(valores)
+
+        reporte = carga.resumir(muestras, segundos)
+        reporte['configuracion'] = {
+            'servidor': opts['servidor'], 'procesos': opts['procesos'], 'hilos': opts['hilos'],
+            'duracion': opts['duracion'], 'iteraciones': opts['iteraciones'], 'usuarios': len(cuentas),
+            'fecha': timezone.now().isoformat(),
+        }
+        texto = json.dumps(reporte, indent=2, sort_keys=True)
+        if opts['salida']:
+            with open(opts['salida'], 'w') as f:
+                f.write(texto)
+            self.stdout.write(self.style.SUCCESS(
+                f"Reporte en {opts['salida']}: {reporte['rps']} req/s, tasa de error {reporte['tasa_error']}"
+            ))
+        else:
+            self.stdout.write(texto)
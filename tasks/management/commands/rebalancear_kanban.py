@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from tasks.kanban import LARGO_REBALANCEO, columnas_a_rebalancear, rebalancear_columna
+
+
+class Command(BaseCommand):
+    help = (
+        "Reparte de nuevo las claves de orden del Kanban en las columnas donde se alargaron "
+        "por mover muchas veces al mismo hueco. No cambia el orden visible (apto para cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--largo', type=int, default=LARGO_REBALANCEO,
+                            help=f"Rebalancea columnas con claves más largas que esto (default: {LARGO_REBALANCEO})")
+        parser.add_argument('--proyecto', type=int, help="Limitar a un proyecto")
+
+    def handle(self, *args, **opts):
+        columnas = filas = 0
+        for proyecto_id, estado in list(columnas_a_rebalancear(opts['largo'], opts['proyecto'])):
+            # Una transacción corta por columna: bloquea solo esa columna mientras se reescribe
+            filas += rebalancear_columna(proyecto_id, estado)
+            columnas += 1
+        self.stdout.write(self.style.SUCCESS(f"Kanban rebalanceado: {columnas} columnas, {filas} tarjetas actualizadas."))
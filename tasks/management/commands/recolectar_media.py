@@ -0,0 +1,158 @@
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.models import HistorialAvance, Perfil
+
+_FIN = object()
+
+
+class Recorrido:
+    """
+    Recorre en paralelo (os.scandir, un directorio por hilo) y entrega los
+    archivos por lotes a través de una cola acotada, para no acumular el árbol
+    completo en memoria.
+    """
+
+    def __init__(self, raiz, hilos, tamano_lote, filtro):
+        self.raiz = raiz
+        self.tamano_lote = tamano_lote
+        self.filtro = filtro            # filtro(ruta_relativa) -> bool (partición actual)
+        self.cola = queue.Queue(maxsize=hilos * 4)
+        self.pool = ThreadPoolExecutor(max_workers=hilos)
+        self.pendientes = 0
+        self.candado = threading.Lock()
+
+    def _enviar(self, directorio):
+        with self.candado:
+            self.pendientes += 1
+        self.pool.submit(self._escanear, directorio)
+
+    def _escanear(self, directorio):
+        lote = []
+        try:
+            with os.scandir(directorio) as entradas:
+                for entrada in entradas:
+                    if entrada.name.startswith('.'):
+                        continue
+                    if entrada.is_dir(follow_symlinks=False):
+                        self._enviar(entrada.path)
+                        continue
+                    if not entrada.is_file(follow_symlinks=False):
+                        continue
+                    relativa = os.path.relpath(entrada.path, self.raiz).replace(os.sep, '/')
+                    if not self.filtro(relativa):
+                        continue
+                    lote.append((relativa, entrada.stat(follow_symlinks=False).st_mtime))
+                    if len(lote) >= self.tamano_lote:
+                        self.cola.put(lote)
+                        lote = []
+        except OSError:
+            pass
+        finally:
+            if lote:
+                self.cola.put(lote)
+            with self.candado:
+                self.pendientes -= 1
+                terminado = self.pendientes == 0
+            if terminado:
+                self.cola.put(_FIN)
+
+    def lotes(self, directorios):
+        existentes = [d for d in directorios if os.path.isdir(d)]
+        if not existentes:
+            return
+        # Contamos todos antes de lanzar, para que el primero en terminar no cierre la cola
+        with self.candado:
+            self.pendientes += len(existentes)
+        for d in existentes:
+            self.pool.submit(self._escanear, d)
+        while True:
+            lote = self.cola.get()
+            if lote is _FIN:
+                break
+            yield lote
+        self.pool.shutdown()
+
+
+class Command(BaseCommand):
+    help = (
+        "Recolector de basura de MEDIA_ROOT: detecta (y opcionalmente borra) archivos de "
+        "archivos_adjuntos/ y perfiles_fotos/ que ningún HistorialAvance o Perfil referencia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--borrar', action='store_true', help="Borra los huérfanos (por defecto solo informa)")
+        parser.add_argument('--gracia-horas', type=float, default=24, help="Ignora archivos más nuevos que esto (default: 24)")
+        parser.add_argument('--hilos', type=int, default=8, help="Hilos para recorrer el disco (default: 8)")
+        parser.add_argument('--lote', type=int, default=1000, help="Archivos consultados por lote contra la BD (default: 1000)")
+        parser.add_argument('--particiones', type=int, default=1,
+                            help="Divide los archivos en N particiones por hash del nombre (default: 1)")
+        parser.add_argument('--por-corrida', type=int, default=0,
+                            help="Particiones a procesar en esta corrida; el resto queda para la próxima (0 = todas)")
+        parser.add_argument('--checkpoint', default=os.path.join(settings.BASE_DIR, 'recolector_media.json'),
+                            help="Archivo donde se guarda la próxima partición a procesar")
+
+    def handle(self, *args, **opts):
+        raiz = str(settings.MEDIA_ROOT)
+        particiones = max(1, opts['particiones'])
+        por_corrida = opts['por_corrida'] or particiones
+
+        # --- Checkpoint: qué particiones tocan en esta corrida ---
+        siguiente = 0
+        if particiones > 1 and os.path.exists(opts['checkpoint']):
+            with open(opts['checkpoint']) as f:
+                estado = json.load(f)
+            if estado.get('particiones') == particiones:
+                siguiente = estado.get('siguiente', 0) % particiones
+        activas = {(siguiente + i) % particiones for i in range(min(por_corrida, particiones))}
+
+        def en_particion(ruta):
+            return particiones == 1 or zlib.crc32(ruta.encode()) % particiones in activas
+
+        directorios = [
+            os.path.join(raiz, str(HistorialAvance._meta.get_field('archivo').upload_to)),
+            os.path.join(raiz, str(Perfil._meta.get_field('imagen').upload_to)),
+        ]
+        protegidos = {Perfil._meta.get_field('imagen').default}
+        limite = time.time() - opts['gracia_horas'] * 3600
+
+        revisados = huerfanos = borrados = 0
+        bytes_huerfanos = 0
+        recorrido = Recorrido(raiz, max(1, opts['hilos']), opts['lote'], en_particion)
+        for lote in recorrido.lotes(directorios):
+            revisados += len(lote)
+            candidatos = {ruta for ruta, mtime in lote if mtime < limite and ruta not in protegidos}
+            if not candidatos:
+                continue
+            # Solo consultamos las rutas del lote: la BD nunca se carga entera en memoria
+            referenciados = set(HistorialAvance.objects.filter(archivo__in=candidatos).values_list('archivo', flat=True))
+            referenciados.update(Perfil.objects.filter(imagen__in=candidatos).values_list('imagen', flat=True))
+            for ruta in sorted(candidatos - referenciados):
+                absoluta = os.path.join(raiz, ruta)
+                huerfanos += 1
+                try:
+                    bytes_huerfanos += os.path.getsize(absoluta)
+                    if opts['borrar']:
+                        os.remove(absoluta)
+                        borrados += 1
+                    elif opts['verbosity'] > 1:
+                        self.stdout.write(f"  huérfano: {ruta}")
+                except OSError as e:
+                    self.stderr.write(f"No se pudo procesar {ruta}: {e}")
+
+        if particiones > 1:
+            with open(opts['checkpoint'], 'w') as f:
+                json.dump({'particiones': particiones, 'siguiente': (siguiente + len(activas)) % particiones}, f)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Revisados: {revisados} | Huérfanos: {huerfanos} ({bytes_huerfanos / 1048576:.1f} MB) | "
+            f"Borrados: {borrados} | Particiones: {sorted(activas)} de {particiones}"
+        ))
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from tasks.actividad import destinatarios_por_tarea
+from tasks.models import Actividad, HistorialAvance
+
+
+class Command(BaseCommand):
+    help = "Reparte al feed de actividad los reportes de avance existentes (carga inicial o reparación)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=180, help="Solo historial de los últimos N días (default: 180)")
+        parser.add_argument('--lote', type=int, default=1000, help="Reportes por lote (default: 1000)")
+
+    def handle(self, *args, **opts):
+        desde = timezone.now() - timedelta(days=opts['dias'])
+        # Evitamos duplicar lo que ya fue repartido en escritura
+        pendientes = HistorialAvance.objects.filter(fecha__gte=desde).exclude(
+            id__in=Actividad.objects.filter(historial__isnull=False).values('historial_id')
+        ).select_related('tarea').order_by('id')
+
+        total = 0
+        ultimo_id = 0
+        while True:
+            lote = list(pendientes.filter(id__gt=ultimo_id)[:opts['lote']])
+            if not lote:
+                break
+            destinatarios = destinatarios_por_tarea({h.tarea for h in lote})
+            with transaction.atomic():
+                Actividad.objects.bulk_create([
+                    Actividad(usuario_id=uid, autor_id=h.usuario_id, tarea_id=h.tarea_id, historial=h,
+                              tipo='AVANCE', texto=h.comentario, monto=h.monto, fecha=h.fecha)
+                    for h in lote for uid in destinatarios[h.tarea_id]
+                ], batch_size=opts['lote'])
+            total += len(lote)
+            ultimo_id = lote[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"Feed reconstruido: {total} reportes repartidos."))
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.masivo import ETIQUETAS_TRASPASO, contar_traspaso, traspasar_usuario
+
+
+class Command(BaseCommand):
+    help = ("Pasa a otro usuario las tareas de las que alguien es responsable, las compartidas y sus equipos "
+            "de proyecto (con --propiedad, también lo que es suyo). Todo en una transacción.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('anterior', help="Usuario que se va")
+        parser.add_argument('nuevo', help="Usuario que recibe el trabajo")
+        parser.add_argument('--propiedad', action='store_true', help="Traspasar también las tareas y proyectos de los que es dueño")
+        parser.add_argument('--simular', action='store_true', help="Solo informar qué se movería")
+
+    def _usuario(self, nombre):
+        try:
+            return User.objects.get(username=nombre)
+        except User.DoesNotExist:
+            raise CommandError(f"El usuario '{nombre}' no existe.")
+
+    def handle(self, *args, **opts):
+        anterior, nuevo = self._usuario(opts['anterior']), self._usuario(opts['nuevo'])
+        if anterior.pk == nuevo.pk:
+            raise CommandError("El usuario de destino debe ser otro.")
+
+        if opts['simular']:
+            cuentas = contar_traspaso(anterior, opts['propiedad'])
+        else:
+            cuentas = traspasar_usuario(anterior, nuevo, incluir_propiedad=opts['propiedad'])
+        for clave, n in cuentas.items():
+            self.stdout.write(f"  {ETIQUETAS_TRASPASO[clave]}: {n}")
+        if opts['simular']:
+            self.stdout.write("Simulación: no se modificó nada.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Trabajo de {anterior.username} traspasado a {nuevo.username}."))
@@ -0,0 +1,159 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Tarea, Proyecto, EventoTarea, CambioSync
+from .calendario import invalidar_calendarios, usuarios_de_tareas
+from .dependencias import recalcular
+from .notificaciones import notificar
+from .sincronizacion import tocar
+
+# ======================================================
+# OPERACIONES MASIVAS POR CONJUNTOS
+# ======================================================
+# Un UPDATE por lote de ids en vez de un save() por tarea. Como UPDATE no
+# dispara señales, aquí se hace lo que harían: bitácora de eventos, fin
+# proyectado de las dependientes, calendarios de los afectados y marcas para
+# la sincronización de los clientes offline.
+
+TAMANO_LOTE = 1000
+
+
+def _en_lotes(ids):
+    for i in range(0, len(ids), TAMANO_LOTE):
+        yield ids[i:i + TAMANO_LOTE]
+
+
+@transaction.atomic
+def cerrar_tareas(tareas_qs):
+    """Marca como completadas las tareas abiertas del queryset. Devuelve cuántas cerró."""
+    hoy = timezone.localdate()
+    filas = list(tareas_qs.exclude(estado='COMPLETADA').order_by().values_list('id', 'proyecto_id', 'estado'))
+    ids = [pk for pk, _, _ in filas]
+    afectados = set()
+    for lote in _en_lotes(ids):
+        afectados |= usuarios_de_tareas(Tarea.objects.filter(id__in=lote))
+        Tarea.objects.filter(id__in=lote).update(estado='COMPLETADA', fecha_cierre=hoy, modificado=timezone.now())
+
+    ahora = timezone.now()
+    EventoTarea.objects.bulk_create([
+        EventoTarea(tarea_id=pk, proyecto_id=proyecto_id, campo='ESTADO', anterior=estado, nuevo='COMPLETADA', fecha=ahora)
+        for pk, proyecto_id, estado in filas
+    ], batch_size=TAMANO_LOTE)
+    recalcular(ids)
+    invalidar_calendarios(afectados)
+    return len(ids)
+
+
+@transaction.atomic
+def reasignar_responsable(tareas_qs, nuevo):
+    """Pone a `nuevo` (User o None) como responsable de las tareas. Devuelve cuántas cambiaron."""
+    nuevo_id = nuevo.pk if nuevo else None
+    filas = list(tareas_qs.exclude(responsable_id=nuevo_id).order_by().values_list('id', 'proyecto_id', 'responsable_id'))
+    ids = [pk for pk, _, _ in filas]
+    afectados = {nuevo_id}
+    for lote in _en_lotes(ids):
+        afectados |= usuarios_de_tareas(Tarea.objects.filter(id__in=lote))
+        Tarea.objects.filter(id__in=lote).update(responsable_id=nuevo_id, modificado=timezone.now())
+
+    ahora = timezone.now()
+    EventoTarea.objects.bulk_create([
+        EventoTarea(tarea_id=pk, proyecto_id=proyecto_id, campo='RESPONSABLE',
+                    anterior=str(anterior or ''), nuevo=str(nuevo_id or ''), fecha=ahora)
+        for pk, proyecto_id, anterior in filas
+    ], batch_size=TAMANO_LOTE)
+    # El responsable anterior puede dejar de ver la tarea y el nuevo recibe también su historial
+    CambioSync.objects.bulk_create([
+        marca for pk, _, anterior in filas for marca in (
+            [CambioSync(modelo='TAREA', objeto_id=pk, tipo='PERDIDO', usuario_id=anterior)] if anterior else []
+        ) + ([CambioSync(modelo='TAREA', objeto_id=pk, tipo='GANADO', usuario_id=nuevo_id)] if nuevo_id else [])
+    ], batch_size=TAMANO_LOTE)
+    invalidar_calendarios(afectados)
+    return len(ids)
+
+
+# --- Traspaso de todo lo de un usuario a otro (cuando alguien deja el equipo) ---
+ETIQUETAS_TRASPASO = {
+    'responsable': 'tareas como responsable',
+    'compartidas': 'tareas compartidas',
+    'equipos': 'equipos de proyecto',
+    'tareas_propias': 'tareas propias',
+    'proyectos_propios': 'proyectos propios',
+}
+
+
+def contar_traspaso(anterior, incluir_propiedad=False):
+    """Lo que movería traspasar_usuario, sin tocar nada."""
+    cuentas = {
+        'responsable': Tarea.objects.filter(responsable=anterior).count(),
+        'compartidas': Tarea.compartida_con.through.objects.filter(user=anterior).count(),
+        'equipos': Proyecto.equipo.through.objects.filter(user=anterior).count(),
+    }
+    if incluir_propiedad:
+        cuentas['tareas_propias'] = Tarea.objects.filter(usuario=anterior).count()
+        cuentas['proyectos_propios'] = Proyecto.objects.filter(usuario=anterior).count()
+    return cuentas
+
+
+def _traspasar_m2m(relacion, columna, anterior, nuevo):
+    """
+    Pasa a `nuevo` las filas de `anterior` en la tabla intermedia con un UPDATE;
+    donde `nuevo` ya estaba solo se borra la de `anterior`.
+    Devuelve (ids de todos los objetos, ids de los que `nuevo` no tenía).
+    """
+    intermedia = relacion.through.objects
+    suyas = intermedia.filter(user_id=anterior.pk)
+    objetos = list(suyas.values_list(columna, flat=True))
+    ganados = list(suyas.exclude(**{f'{columna}__in': intermedia.filter(user_id=nuevo.pk).values(columna)})
+                   .values_list(columna, flat=True))
+    intermedia.filter(user_id=anterior.pk, **{f'{columna}__in': ganados}).update(user_id=nuevo.pk)
+    intermedia.filter(user_id=anterior.pk).delete()
+    return objetos, ganados
+
+
+def _marcas_acceso(codigo, perdidos, ganados, anterior, nuevo):
+    return [CambioSync(modelo=codigo, objeto_id=o, tipo='PERDIDO', usuario_id=anterior.pk) for o in perdidos] + [
+        CambioSync(modelo=codigo, objeto_id=o, tipo='GANADO', usuario_id=nuevo.pk) for o in ganados
+    ]
+
+
+@transaction.atomic
+def traspasar_usuario(anterior, nuevo, incluir_propiedad=False):
+    """
+    Pasa a `nuevo` las tareas de las que `anterior` es responsable, las que le
+    compartieron y su lugar en los equipos de proyecto; con `incluir_propiedad`
+    también las tareas y proyectos de los que es dueño. Todo por conjuntos y en
+    una transacción, y `nuevo` recibe un solo aviso con el resumen. Devuelve
+    las cantidades con las mismas claves que contar_traspaso.
+    """
+    if anterior.pk == nuevo.pk:
+        raise ValueError("El usuario de destino debe ser otro.")
+    cuentas = {'responsable': reasignar_responsable(Tarea.objects.filter(responsable=anterior), nuevo)}
+
+    # Las tablas intermedias y los UPDATE no disparan m2m_changed ni post_save:
+    # las marcas de sincronización y el `modificado` se ponen aquí
+    tareas, ganadas = _traspasar_m2m(Tarea.compartida_con, 'tarea_id', anterior, nuevo)
+    proyectos, ganados = _traspasar_m2m(Proyecto.equipo, 'proyecto_id', anterior, nuevo)
+    marcas = _marcas_acceso('TAREA', tareas, ganadas, anterior, nuevo) + _marcas_acceso('PROYECTO', proyectos, ganados, anterior, nuevo)
+    tocar(Tarea, tareas)
+    tocar(Proyecto, proyectos)
+    cuentas.update(compartidas=len(tareas), equipos=len(proyectos))
+
+    if incluir_propiedad:
+        ahora = timezone.now()
+        propias = list(Tarea.objects.filter(usuario=anterior).values_list('id', flat=True))
+        for lote in _en_lotes(propias):
+            Tarea.objects.filter(id__in=lote).update(usuario_id=nuevo.pk, modificado=ahora)
+        propios = list(Proyecto.objects.filter(usuario=anterior).values_list('id', flat=True))
+        Proyecto.objects.filter(id__in=propios).update(usuario_id=nuevo.pk, modificado=ahora)
+        marcas += _marcas_acceso('TAREA', propias, propias, anterior, nuevo)
+        marcas += _marcas_acceso('PROYECTO', propios, propios, anterior, nuevo)
+        cuentas.update(tareas_propias=len(propias), proyectos_propios=len(propios))
+
+    CambioSync.objects.bulk_create(marcas, batch_size=TAMANO_LOTE)
+    # Los participantes de las tareas reasignadas ya los invalidó reasignar_responsable
+    invalidar_calendarios({anterior.pk, nuevo.pk})
+
+    if any(cuentas.values()):
+        detalle = ', '.join(f'{n} {ETIQUETAS_TRASPASO[clave]}' for clave, n in cuentas.items() if n)
+        notificar([nuevo.pk], anterior, None, 'TRASPASO', f"Recibió el trabajo de {anterior.username}: {detalle}.")
+    return cuentas
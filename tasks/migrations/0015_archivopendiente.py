@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0014_plantillaproyecto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruta', models.CharField(max_length=255)),
+                ('encolado_el', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0015_archivopendiente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenEnviado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('enviado_el', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tarea',
+            index=models.Index(fields=['fecha_objetivo', 'estado'], name='tarea_vencimiento_idx'),
+        ),
+        migrations.AddField(
+            model_name='resumenenviado',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_enviados', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='resumenenviado',
+            constraint=models.UniqueConstraint(fields=('usuario', 'fecha'), name='resumen_unico_por_dia'),
+        ),
+    ]
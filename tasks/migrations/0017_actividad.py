@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0016_resumenenviado_tarea_vencimiento_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Actividad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('AVANCE', 'Reporte de Avance'), ('ESTADO', 'Cambio de Estado')], default='AVANCE', max_length=10)),
+                ('texto', models.TextField(blank=True)),
+                ('monto', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('autor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('historial', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tasks.historialavance')),
+                ('tarea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tasks.tarea')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actividades', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['usuario', '-fecha', '-id'], name='actividad_feed_idx')],
+            },
+        ),
+    ]
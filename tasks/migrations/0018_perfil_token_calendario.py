@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0017_actividad'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfil',
+            name='token_calendario',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
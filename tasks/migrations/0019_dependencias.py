@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def inicializar_fin_proyectado(apps, schema_editor):
+    # Aún no hay dependencias: cada tarea termina en su propia fecha
+    Tarea = apps.get_model('tasks', 'Tarea')
+    Tarea.objects.filter(estado='COMPLETADA').exclude(fecha_cierre=None).update(fin_proyectado=F('fecha_cierre'))
+    Tarea.objects.filter(fin_proyectado=None).update(fin_proyectado=F('fecha_objetivo'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0018_perfil_token_calendario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='fin_proyectado',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='Dependencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creada_el', models.DateTimeField(auto_now_add=True)),
+                ('requisito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependientes', to='tasks.tarea')),
+                ('tarea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependencias', to='tasks.tarea')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='tarea',
+            name='depende_de',
+            field=models.ManyToManyField(blank=True, related_name='bloquea', through='tasks.Dependencia', to='tasks.tarea'),
+        ),
+        migrations.AddIndex(
+            model_name='tarea',
+            index=models.Index(fields=['proyecto', '-fin_proyectado'], name='tarea_fin_proyectado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dependencia',
+            index=models.Index(fields=['requisito', 'tarea'], name='dependencia_inversa_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dependencia',
+            constraint=models.UniqueConstraint(fields=('tarea', 'requisito'), name='dependencia_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='dependencia',
+            constraint=models.CheckConstraint(condition=models.Q(('tarea', models.F('requisito')), _negated=True), name='dependencia_no_reflexiva'),
+        ),
+        migrations.RunPython(inicializar_fin_proyectado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0019_dependencias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='rango',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='tarea',
+            index=models.Index(fields=['proyecto', 'estado', 'rango'], name='tarea_kanban_idx'),
+        ),
+    ]
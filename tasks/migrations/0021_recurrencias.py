@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0020_tarea_rango'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recurrencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frecuencia', models.CharField(choices=[('DIARIA', 'Diaria'), ('SEMANAL', 'Semanal'), ('MENSUAL', 'Mensual')], max_length=10)),
+                ('intervalo', models.PositiveSmallIntegerField(default=1)),
+                ('fecha_fin', models.DateField(blank=True, null=True)),
+                ('generada_hasta', models.DateField(editable=False)),
+                ('origen', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='regla', to='tasks.tarea')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='tarea',
+            name='recurrencia',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ocurrencias', to='tasks.recurrencia'),
+        ),
+        migrations.AddConstraint(
+            model_name='tarea',
+            constraint=models.UniqueConstraint(fields=('recurrencia', 'fecha_objetivo'), name='ocurrencia_unica_por_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='recurrencia',
+            index=models.Index(fields=['generada_hasta'], name='recurrencia_pendiente_idx'),
+        ),
+    ]
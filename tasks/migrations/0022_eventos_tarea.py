@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from datetime import datetime, time
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def reconstruir_eventos(apps, schema_editor):
+    # Historia aproximada de lo existente: alta como PENDIENTE al crearse y el
+    # estado actual al cerrarse (las completadas) o desde hoy (el resto)
+    Tarea = apps.get_model('tasks', 'Tarea')
+    EventoTarea = apps.get_model('tasks', 'EventoTarea')
+    ahora = timezone.now()
+    eventos = []
+    for pk, proyecto_id, estado, creada, cierre in Tarea.objects.values_list(
+        'id', 'proyecto_id', 'estado', 'fecha_creacion', 'fecha_cierre'
+    ).iterator(chunk_size=2000):
+        eventos.append(EventoTarea(tarea_id=pk, proyecto_id=proyecto_id, campo='ALTA', nuevo='PENDIENTE', fecha=creada))
+        if estado != 'PENDIENTE':
+            cuando = ahora
+            if estado == 'COMPLETADA' and cierre:
+                cuando = max(creada, timezone.make_aware(datetime.combine(cierre, time(12))))
+            eventos.append(EventoTarea(tarea_id=pk, proyecto_id=proyecto_id, campo='ESTADO', anterior='PENDIENTE', nuevo=estado, fecha=cuando))
+    # En orden cronológico: el cursor de las instantáneas avanza por id
+    eventos.sort(key=lambda e: e.fecha)
+    EventoTarea.objects.bulk_create(eventos, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0021_recurrencias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoTarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(choices=[('ALTA', 'Alta en el proyecto'), ('BAJA', 'Baja del proyecto'), ('ESTADO', 'Estado'), ('RESPONSABLE', 'Responsable'), ('FECHA', 'Fecha objetivo')], max_length=12)),
+                ('anterior', models.CharField(blank=True, max_length=20)),
+                ('nuevo', models.CharField(blank=True, max_length=20)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('proyecto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='tasks.proyecto')),
+                ('tarea', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='eventos', to='tasks.tarea')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['proyecto', 'id'], name='evento_proyecto_idx'), models.Index(fields=['tarea', 'fecha'], name='evento_tarea_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InstantaneaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('conteos', models.JSONField(default=dict)),
+                ('ultimo_evento', models.BigIntegerField(default=0)),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='instantaneas', to='tasks.proyecto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('proyecto', 'fecha'), name='instantanea_unica_por_dia')],
+            },
+        ),
+        migrations.RunPython(reconstruir_eventos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0022_eventos_tarea'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Perfilado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metodo', models.CharField(max_length=10)),
+                ('ruta', models.CharField(max_length=500)),
+                ('estado_http', models.PositiveSmallIntegerField()),
+                ('motivo', models.CharField(choices=[('CABECERA', 'Cabecera X-Perfilar'), ('PARAMETRO', 'Parámetro ?perfilar'), ('MUESTREO', 'Muestreo')], max_length=10)),
+                ('duracion_ms', models.FloatField()),
+                ('consultas', models.PositiveIntegerField(default=0)),
+                ('tiempo_sql_ms', models.FloatField(default=0)),
+                ('duplicadas', models.PositiveIntegerField(default=0)),
+                ('traza_sql', models.JSONField(default=list)),
+                ('estadisticas', models.BinaryField()),
+                ('creado_el', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'perfilados',
+                'ordering': ['-creado_el'],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0023_perfilado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historialavance',
+            index=models.Index(fields=['fecha'], name='historial_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0024_historial_fecha_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('PROYECTO', 'Proyecto'), ('ETIQUETA', 'Etiqueta'), ('TAREA', 'Tarea'), ('HISTORIAL', 'Historial')], max_length=10)),
+                ('objeto_id', models.BigIntegerField()),
+                ('tipo', models.CharField(choices=[('BORRADO', 'Borrado'), ('PERDIDO', 'Acceso perdido'), ('GANADO', 'Acceso ganado')], max_length=8)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='etiqueta',
+            name='modificado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='historialavance',
+            name='id_cliente',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='historialavance',
+            name='modificado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='proyecto',
+            name='modificado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='tarea',
+            name='modificado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='etiqueta',
+            index=models.Index(fields=['modificado', 'id'], name='etiqueta_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialavance',
+            index=models.Index(fields=['modificado', 'id'], name='historial_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(fields=['modificado', 'id'], name='proyecto_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tarea',
+            index=models.Index(fields=['modificado', 'id'], name='tarea_sync_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='historialavance',
+            constraint=models.UniqueConstraint(fields=('usuario', 'id_cliente'), name='avance_cliente_unico'),
+        ),
+        migrations.AddField(
+            model_name='cambiosync',
+            name='proyecto',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='tasks.proyecto'),
+        ),
+        migrations.AddField(
+            model_name='cambiosync',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='cambiosync',
+            index=models.Index(fields=['fecha', 'id'], name='cambiosync_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0025_sincronizacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('ASIGNACION', 'Tarea asignada'), ('AVANCE', 'Reporte de avance')], max_length=10)),
+                ('texto', models.CharField(max_length=255)),
+                ('leida', models.BooleanField(default=False)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('autor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('tarea', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tasks.tarea')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['usuario', '-fecha', '-id'], name='notificacion_bandeja_idx'), models.Index(condition=models.Q(('leida', False)), fields=['usuario'], name='notificacion_no_leida_idx')],
+            },
+        ),
+    ]
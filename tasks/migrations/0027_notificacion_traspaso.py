@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0026_notificaciones'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificacion',
+            name='tipo',
+            field=models.CharField(choices=[('ASIGNACION', 'Tarea asignada'), ('AVANCE', 'Reporte de avance'), ('TRASPASO', 'Traspaso de trabajo')], max_length=10),
+        ),
+    ]
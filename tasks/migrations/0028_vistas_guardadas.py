@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0027_notificacion_traspaso'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VistaGuardada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=60)),
+                ('filtros', models.JSONField(default=dict)),
+                ('creada_el', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vistas_guardadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['nombre'],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'nombre'), name='vista_nombre_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:58
+
+import tasks.models
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_acumulados(apps, schema_editor):
+    # Total inicial en un solo UPDATE; los umbrales ya superados quedan como
+    # avisados para no mandar alertas por sobregastos anteriores a la migración
+    Proyecto = apps.get_model('tasks', 'Proyecto')
+    HistorialAvance = apps.get_model('tasks', 'HistorialAvance')
+    dinero = models.DecimalField(max_digits=14, decimal_places=2)
+    total = HistorialAvance.objects.filter(tarea__proyecto=OuterRef('pk')).order_by().values(
+        'tarea__proyecto'
+    ).annotate(total=Sum('monto')).values('total')
+    Proyecto.objects.update(gastado_acumulado=Coalesce(Subquery(total, output_field=dinero), Value(Decimal('0')), output_field=dinero))
+    for proyecto in Proyecto.objects.filter(presupuesto__gt=0, gastado_acumulado__gt=0).only(
+        'presupuesto', 'gastado_acumulado', 'umbrales_alerta'
+    ).iterator(chunk_size=2000):
+        avisados = sorted(u for u in proyecto.umbrales_alerta if proyecto.gastado_acumulado * 100 >= proyecto.presupuesto * u)
+        if avisados:
+            Proyecto.objects.filter(pk=proyecto.pk).update(umbrales_avisados=avisados)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0028_vistas_guardadas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proyecto',
+            name='gastado_acumulado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='proyecto',
+            name='umbrales_alerta',
+            field=models.JSONField(blank=True, default=tasks.models.umbrales_por_defecto),
+        ),
+        migrations.AddField(
+            model_name='proyecto',
+            name='umbrales_avisados',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='notificacion',
+            name='tipo',
+            field=models.CharField(choices=[('ASIGNACION', 'Tarea asignada'), ('AVANCE', 'Reporte de avance'), ('TRASPASO', 'Traspaso de trabajo'), ('PRESUPUESTO', 'Alerta de presupuesto')], max_length=12),
+        ),
+        migrations.RunPython(calcular_acumulados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:40
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def crear_tabla_cache(apps, schema_editor):
+    # Tabla de CACHES (DatabaseCache); no hace nada si la caché es Redis o ya existe
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0029_alertas_presupuesto'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_tabla_cache, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:20
+
+from django.db import migrations
+
+
+def desmarcar_originales(apps, schema_editor):
+    # La tarea original queda solo con su regla; recurrencia es para las ocurrencias generadas
+    Tarea = apps.get_model('tasks', 'Tarea')
+    Tarea.objects.filter(regla__isnull=False).update(recurrencia=None)
+
+
+def marcar_originales(apps, schema_editor):
+    Recurrencia = apps.get_model('tasks', 'Recurrencia')
+    Tarea = apps.get_model('tasks', 'Tarea')
+    for regla_id, origen_id in Recurrencia.objects.values_list('id', 'origen_id'):
+        Tarea.objects.filter(pk=origen_id).update(recurrencia_id=regla_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0030_tabla_cache'),
+    ]
+
+    operations = [
+        migrations.RunPython(desmarcar_originales, marcar_originales),
+    ]
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
+from django.utils.http import urlencode
 
 # ======================================================
 # 1. MODELO ETIQUETA
@@ -19,13 +20,22 @@ class Etiqueta(models.Model):
         ('bg-info text-dark', 'Celeste'),
         ('bg-dark', 'Negro'),
     ])
+    modificado = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.nombre
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['modificado', 'id'], name='etiqueta_sync_idx'),
+        ]
+
 # ======================================================
 # 2. MODELO: PROYECTO
 # ======================================================
+def umbrales_por_defecto():
+    return [80, 100]
+
 class Proyecto(models.Model):
     titulo = models.CharField(max_length=100)
     descripcion = models.TextField(blank=True)
@@ -34,9 +44,15 @@ class Proyecto(models.Model):
     
     # FINANZAS
     presupuesto = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    # Suma de los montos reportados en sus tareas, ajustada en cada alta, cambio o baja (ver presupuesto.py)
+    gastado_acumulado = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    # % del presupuesto que avisan al dueño la primera vez que se alcanzan
+    umbrales_alerta = models.JSONField(default=umbrales_por_defecto, blank=True)
+    umbrales_avisados = models.JSONField(default=list, blank=True, editable=False)
     fecha_inicio = models.DateField(default=timezone.now)
     fecha_fin = models.DateField(null=True, blank=True)
     creado_el = models.DateTimeField(auto_now_add=True)
+    modificado = models.DateTimeField(auto_now=True)
 
     # --- AGREGUE ESTO DE NUEVO ---
     ESTADOS = [
@@ -52,9 +68,8 @@ class Proyecto(models.Model):
         return self.titulo
 
     def presupuesto_gastado(self):
-        # Sumamos los montos reportados en el historial
-        gastado = HistorialAvance.objects.filter(tarea__proyecto=self).aggregate(total=models.Sum('monto'))['total']
-        return gastado or 0
+        # Total acumulado por las señales de presupuesto.py, sin sumar el historial
+        return self.gastado_acumulado
 
     def presupuesto_restante(self):
         return self.presupuesto - self.presupuesto_gastado()
@@ -65,6 +80,11 @@ class Proyecto(models.Model):
         completadas = self.tareas.filter(estado='COMPLETADA').count()
         return int((completadas / total_tareas) * 100)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['modificado', 'id'], name='proyecto_sync_idx'),
+        ]
+
 # ======================================================
 # 3. MODELO TAREA (CORREGIDO)
 # ======================================================
@@ -99,11 +119,38 @@ class Tarea(models.Model):
     # Agregamos related_name='tareas' para que la etiqueta sepa contar sus tareas
     etiquetas = models.ManyToManyField(Etiqueta, blank=True, related_name='tareas')
 
+    # DEPENDENCIAS ("bloqueada por"), solo entre tareas del mismo proyecto
+    depende_de = models.ManyToManyField('self', through='Dependencia', symmetrical=False, blank=True, related_name='bloquea')
+    # Calculado de forma incremental por tasks/dependencias.py: la fecha en que la
+    # tarea puede terminar según sus bloqueantes
+    fin_proyectado = models.DateField(null=True, blank=True, editable=False)
+    # Posición manual en la columna del tablero Kanban (clave fraccionaria, ver tasks/kanban.py)
+    rango = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # Regla de repetición que la generó (solo las ocurrencias; la original la tiene en `regla`)
+    recurrencia = models.ForeignKey('Recurrencia', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='ocurrencias')
+    # Última escritura: los clientes offline piden lo modificado desde su cursor
+    # (tasks/sincronizacion.py). Los UPDATE masivos lo ponen a mano.
+    modificado = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return f"{self.titulo}"
 
     class Meta:
         ordering = ['fecha_objetivo']
+        indexes = [
+            # Radar de vencimientos / resumen diario: tareas abiertas por fecha límite
+            models.Index(fields=['fecha_objetivo', 'estado'], name='tarea_vencimiento_idx'),
+            # Fin proyectado del proyecto: MAX por índice, sin recorrer las tareas
+            models.Index(fields=['proyecto', '-fin_proyectado'], name='tarea_fin_proyectado_idx'),
+            # Columnas del Kanban: tareas de un proyecto por estado, ya en orden
+            models.Index(fields=['proyecto', 'estado', 'rango'], name='tarea_kanban_idx'),
+            # Sincronización incremental: recorrido por (modificado, id) desde el cursor del cliente
+            models.Index(fields=['modificado', 'id'], name='tarea_sync_idx'),
+        ]
+        constraints = [
+            # Una ocurrencia por fecha: materializar dos veces la misma regla no duplica filas
+            models.UniqueConstraint(fields=['recurrencia', 'fecha_objetivo'], name='ocurrencia_unica_por_fecha'),
+        ]
 
 # ======================================================
 # 4. HISTORIAL
@@ -115,16 +162,31 @@ class HistorialAvance(models.Model):
     archivo = models.FileField(upload_to='archivos_adjuntos', blank=True, null=True)
     monto = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     fecha = models.DateTimeField(auto_now_add=True)
+    modificado = models.DateTimeField(auto_now=True)
+    # Clave que genera el cliente offline para su reporte: reenviar la cola no lo duplica
+    id_cliente = models.CharField(max_length=64, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.usuario.username} - {self.fecha.strftime('%d/%m %H:%M')}"
 
+    class Meta:
+        indexes = [
+            # Navegación por fechas (date_hierarchy) del admin
+            models.Index(fields=['fecha'], name='historial_fecha_idx'),
+            models.Index(fields=['modificado', 'id'], name='historial_sync_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'id_cliente'], name='avance_cliente_unico'),
+        ]
+
 # ======================================================
 # 5. PERFIL
 # ======================================================
 class Perfil(models.Model):
     usuario = models.OneToOneField(User, on_delete=models.CASCADE)
     imagen = models.ImageField(upload_to='perfiles_fotos', default='default.jpg')
+    # Token secreto del feed ICS (/calendario/<token>.ics); se crea al pedirlo por primera vez
+    token_calendario = models.CharField(max_length=64, unique=True, null=True, blank=True)
     
     def __str__(self):
         return f'Perfil de {self.usuario.username}'
@@ -135,4 +197,307 @@ def crear_perfil(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def guardar_perfil(sender, instance, **kwargs):
-    instance.perfil.save()
\ No newline at end of file
+    instance.perfil.save()
+
+# ======================================================
+# 6. PLANTILLAS DE PROYECTO
+# ======================================================
+class PlantillaProyecto(models.Model):
+    nombre = models.CharField(max_length=100)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='plantillas')
+    origen = models.ForeignKey(Proyecto, on_delete=models.SET_NULL, null=True, blank=True, related_name='plantillas')
+    # Instantánea del proyecto: equipo, tareas (con desfase en días desde fecha_inicio), etiquetas y compartidos
+    datos = models.JSONField(default=dict)
+    creado_el = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.nombre
+
+    def total_tareas(self):
+        return len(self.datos.get('tareas', []))
+
+
+# ======================================================
+# 7. COLA DE ARCHIVOS A ELIMINAR (LIMPIEZA DIFERIDA)
+# ======================================================
+class ArchivoPendiente(models.Model):
+    # Ruta relativa a MEDIA_ROOT; la borra el comando `limpiar_adjuntos`
+    ruta = models.CharField(max_length=255)
+    encolado_el = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.ruta
+
+
+
+# ======================================================
+# 8. RESÚMENES DE VENCIMIENTOS ENVIADOS
+# ======================================================
+class ResumenEnviado(models.Model):
+    # Un registro por usuario y día: hace idempotente al comando de resúmenes
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='resumenes_enviados')
+    fecha = models.DateField()
+    enviado_el = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'fecha'], name='resumen_unico_por_dia'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} - {self.fecha}"
+
+
+# ======================================================
+# 9. FEED DE ACTIVIDAD (FAN-OUT EN ESCRITURA)
+# ======================================================
+class Actividad(models.Model):
+    TIPOS = [
+        ('AVANCE', 'Reporte de Avance'),
+        ('ESTADO', 'Cambio de Estado'),
+    ]
+
+    # Destinatario: una fila por cada usuario que debe ver el movimiento
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='actividades')
+    autor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    tarea = models.ForeignKey(Tarea, on_delete=models.CASCADE, related_name='+')
+    historial = models.ForeignKey(HistorialAvance, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    tipo = models.CharField(max_length=10, choices=TIPOS, default='AVANCE')
+    texto = models.TextField(blank=True)
+    monto = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-fecha', '-id']
+        indexes = [
+            # "Últimos N" del usuario: recorrido por rango sobre este índice
+            models.Index(fields=['usuario', '-fecha', '-id'], name='actividad_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.autor_id} -> {self.usuario_id}: {self.get_tipo_display()}"
+
+
+# ======================================================
+# 10. DEPENDENCIAS ENTRE TAREAS
+# ======================================================
+class Dependencia(models.Model):
+    # `tarea` no puede terminar antes que `requisito`
+    tarea = models.ForeignKey(Tarea, on_delete=models.CASCADE, related_name='dependencias')
+    requisito = models.ForeignKey(Tarea, on_delete=models.CASCADE, related_name='dependientes')
+    creada_el = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tarea', 'requisito'], name='dependencia_unica'),
+            models.CheckConstraint(condition=~models.Q(tarea=models.F('requisito')), name='dependencia_no_reflexiva'),
+        ]
+        indexes = [
+            # Recorrido hacia adelante (quién depende de mí) al propagar cambios
+            models.Index(fields=['requisito', 'tarea'], name='dependencia_inversa_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tarea_id} <- {self.requisito_id}"
+
+
+# ======================================================
+# 11. TAREAS RECURRENTES
+# ======================================================
+class Recurrencia(models.Model):
+    FRECUENCIAS = [
+        ('DIARIA', 'Diaria'),
+        ('SEMANAL', 'Semanal'),
+        ('MENSUAL', 'Mensual'),
+    ]
+
+    # La tarea original: sus datos se copian a cada ocurrencia y su fecha objetivo es el ancla
+    origen = models.OneToOneField(Tarea, on_delete=models.CASCADE, related_name='regla')
+    frecuencia = models.CharField(max_length=10, choices=FRECUENCIAS)
+    intervalo = models.PositiveSmallIntegerField(default=1)
+    fecha_fin = models.DateField(null=True, blank=True)
+    # Última fecha ya materializada; el comando `materializar_recurrencias` sigue desde aquí
+    generada_hasta = models.DateField(editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['generada_hasta'], name='recurrencia_pendiente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.origen_id}: {self.get_frecuencia_display()} cada {self.intervalo}"
+
+
+# ======================================================
+# 12. BITÁCORA DE EVENTOS DE TAREAS (SOLO INSERCIÓN)
+# ======================================================
+class EventoTarea(models.Model):
+    CAMPOS = [
+        ('ALTA', 'Alta en el proyecto'),
+        ('BAJA', 'Baja del proyecto'),
+        ('ESTADO', 'Estado'),
+        ('RESPONSABLE', 'Responsable'),
+        ('FECHA', 'Fecha objetivo'),
+    ]
+
+    # Sin FK real a la tarea: el evento sobrevive a su borrado (queda su BAJA)
+    tarea = models.ForeignKey(Tarea, on_delete=models.DO_NOTHING, db_constraint=False, related_name='eventos')
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.CASCADE, null=True, blank=True, related_name='eventos')
+    campo = models.CharField(max_length=12, choices=CAMPOS)
+    # Códigos de estado, ids de usuario o fechas ISO: texto corto en ambos casos
+    anterior = models.CharField(max_length=20, blank=True)
+    nuevo = models.CharField(max_length=20, blank=True)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Reconstrucción incremental de las instantáneas diarias: eventos del proyecto desde un id
+            models.Index(fields=['proyecto', 'id'], name='evento_proyecto_idx'),
+            models.Index(fields=['tarea', 'fecha'], name='evento_tarea_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tarea_id} {self.campo}: {self.anterior} -> {self.nuevo}"
+
+
+class InstantaneaDiaria(models.Model):
+    # Cuántas tareas había en cada estado al cierre del día (ver tasks/eventos.py)
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.CASCADE, related_name='instantaneas')
+    fecha = models.DateField()
+    conteos = models.JSONField(default=dict)
+    # Último evento aplicado: la próxima pasada sigue desde aquí
+    ultimo_evento = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['proyecto', 'fecha'], name='instantanea_unica_por_dia'),
+        ]
+
+    def __str__(self):
+        return f"{self.proyecto_id} @ {self.fecha}"
+
+
+# ======================================================
+# 13. PERFILADO DE PETICIONES (SOLO STAFF)
+# ======================================================
+class Perfilado(models.Model):
+    MOTIVOS = [
+        ('CABECERA', 'Cabecera X-Perfilar'),
+        ('PARAMETRO', 'Parámetro ?perfilar'),
+        ('MUESTREO', 'Muestreo'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    metodo = models.CharField(max_length=10)
+    ruta = models.CharField(max_length=500)
+    estado_http = models.PositiveSmallIntegerField()
+    motivo = models.CharField(max_length=10, choices=MOTIVOS)
+    duracion_ms = models.FloatField()
+    consultas = models.PositiveIntegerField(default=0)
+    tiempo_sql_ms = models.FloatField(default=0)
+    # Consultas repetidas con el mismo SQL y los mismos parámetros
+    duplicadas = models.PositiveIntegerField(default=0)
+    # [{'sql', 'params', 'ms', 'repeticiones'}] en el orden en que se ejecutaron
+    traza_sql = models.JSONField(default=list)
+    # Estadísticas de cProfile serializadas como las escribe pstats.Stats.dump_stats()
+    estadisticas = models.BinaryField()
+    creado_el = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-creado_el']
+        verbose_name_plural = 'perfilados'
+
+    def __str__(self):
+        return f"{self.metodo} {self.ruta} ({self.duracion_ms:.0f} ms)"
+
+
+# ======================================================
+# 14. SINCRONIZACIÓN: BORRADOS Y CAMBIOS DE ACCESO
+# ======================================================
+class CambioSync(models.Model):
+    # Lo que no se ve en `modificado`: filas borradas y usuarios que ganaron o
+    # perdieron acceso a un objeto que no cambió (ver tasks/sincronizacion.py)
+    MODELOS = [
+        ('PROYECTO', 'Proyecto'),
+        ('ETIQUETA', 'Etiqueta'),
+        ('TAREA', 'Tarea'),
+        ('HISTORIAL', 'Historial'),
+    ]
+    TIPOS = [
+        ('BORRADO', 'Borrado'),
+        ('PERDIDO', 'Acceso perdido'),
+        ('GANADO', 'Acceso ganado'),
+    ]
+
+    modelo = models.CharField(max_length=10, choices=MODELOS)
+    objeto_id = models.BigIntegerField()
+    tipo = models.CharField(max_length=8, choices=TIPOS)
+    # Destinatario: un usuario puntual o, si es nulo, los miembros del proyecto
+    # (o todos, si tampoco hay proyecto)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha', 'id'], name='cambiosync_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo} {self.objeto_id} {self.tipo}"
+
+
+# ======================================================
+# 15. NOTIFICACIONES EN LA APP
+# ======================================================
+class Notificacion(models.Model):
+    TIPOS = [
+        ('ASIGNACION', 'Tarea asignada'),
+        ('AVANCE', 'Reporte de avance'),
+        ('TRASPASO', 'Traspaso de trabajo'),
+        ('PRESUPUESTO', 'Alerta de presupuesto'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notificaciones')
+    autor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Si la tarea se borra el aviso queda (el título va en el texto) y sigue contando como no leído
+    tarea = models.ForeignKey(Tarea, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    tipo = models.CharField(max_length=12, choices=TIPOS)
+    texto = models.CharField(max_length=255)
+    leida = models.BooleanField(default=False)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['usuario', '-fecha', '-id'], name='notificacion_bandeja_idx'),
+            # Recuento y "marcar todas como leídas": solo recorre las pendientes
+            models.Index(fields=['usuario'], condition=models.Q(leida=False), name='notificacion_no_leida_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id}: {self.texto}"
+
+
+# ======================================================
+# 16. VISTAS GUARDADAS DEL LISTADO DE TAREAS
+# ======================================================
+class VistaGuardada(models.Model):
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='vistas_guardadas')
+    nombre = models.CharField(max_length=60)
+    # Los mismos parámetros GET de `home`: status, time, ownership, search
+    filtros = models.JSONField(default=dict)
+    creada_el = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['nombre']
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'nombre'], name='vista_nombre_unico'),
+        ]
+
+    def __str__(self):
+        return self.nombre
+
+    def consulta(self):
+        """Query string para abrir `home` con estos filtros."""
+        return urlencode(self.filtros)
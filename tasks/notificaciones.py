@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+
+from .models import Tarea, Notificacion
+
+# ======================================================
+# NOTIFICACIONES EN LA APP
+# ======================================================
+# Un evento (asignación, reporte de avance) crea los avisos de todos sus
+# destinatarios con un solo INSERT. La insignia del navbar lee un contador por
+# usuario en la caché: se suma al confirmar la transacción, se pone en cero al
+# marcar todo como leído y, si no está (caché fría o vencida), se cuenta una
+# vez con el índice parcial de no leídas.
+#
+# El contador vive en la caché compartida de settings.CACHES (Redis o la tabla
+# de caché de la base): con una caché por proceso, cada worker tendría su propia
+# cuenta y solo el que atendió el evento la vería cambiar. En DatabaseCache el
+# incr no es atómico; un aviso perdido entre dos workers simultáneos se corrige
+# al vencer TTL_CONTADOR o al marcar todo como leído.
+
+TTL_CONTADOR = 6 * 3600  # Acota cualquier desfase entre el contador y la BD
+LARGO_TEXTO = Notificacion._meta.get_field('texto').max_length
+
+
+def _clave(usuario_id):
+    return f'notificaciones:no_leidas:{usuario_id}'
+
+
+def no_leidas(usuario_id):
+    clave = _clave(usuario_id)
+    n = cache.get(clave)
+    if n is None:
+        n = Notificacion.objects.filter(usuario_id=usuario_id, leida=False).count()
+        cache.set(clave, n, TTL_CONTADOR)
+    return n
+
+
+def _sumar(cuentas):
+    for usuario_id, n in cuentas.items():
+        try:
+            cache.incr(_clave(usuario_id), n)
+        except ValueError:
+            pass  # Sin contador en caché: se contará al mostrarlo
+
+
+def notificar(usuarios_ids, autor, tarea, tipo, texto):
+    """Un aviso por destinatario (sin el autor, si lo hay) en un solo INSERT. Devuelve cuántos creó."""
+    ids = {u for u in usuarios_ids if u and (autor is None or u != autor.id)}
+    if not ids:
+        return 0
+    Notificacion.objects.bulk_create([
+        Notificacion(usuario_id=u, autor=autor, tarea=tarea, tipo=tipo, texto=texto[:LARGO_TEXTO])
+        for u in ids
+    ])
+    transaction.on_commit(lambda: _sumar(dict.fromkeys(ids, 1)))
+    return len(ids)
+
+
+def participantes(tarea):
+    """Dueño, responsable y colaboradores de la tarea."""
+    return {tarea.usuario_id, tarea.responsable_id} | set(
+        Tarea.compartida_con.through.objects.filter(tarea_id=tarea.pk).values_list('user_id', flat=True)
+    )
+
+
+def marcar_todas(usuario_id):
+    """Un solo UPDATE sobre las no leídas del usuario (índice parcial)."""
+    marcadas = Notificacion.objects.filter(usuario_id=usuario_id, leida=False).update(leida=True)
+    transaction.on_commit(lambda: cache.set(_clave(usuario_id), 0, TTL_CONTADOR))
+    return marcadas
+
+
+def marcar_leida(notificacion):
+    if Notificacion.objects.filter(pk=notificacion.pk, leida=False).update(leida=True):
+        transaction.on_commit(lambda: _sumar({notificacion.usuario_id: -1}))
+
+
+def contador(request):
+    """Context processor: la insignia solo toca la caché si la plantilla la muestra."""
+    if not request.user.is_authenticated:
+        return {}
+    return {'notificaciones_no_leidas': SimpleLazyObject(lambda: no_leidas(request.user.id))}
@@ -0,0 +1,177 @@
+import cProfile
+import hashlib
+import io
+import marshal
+import pstats
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import connection
+
+from .models import Perfil, Perfilado
+
+# ======================================================
+# PERFILADO DE PETICIONES A DEMANDA
+# ======================================================
+# Un usuario staff pide el perfil de una petición con la cabecera
+# `X-Perfilar: 1` o con `?perfilar=1`. Además, con PERFILADO_MUESTREO > 0 se
+# perfila esa fracción de las peticiones (opcionalmente solo las de los
+# usuarios de PERFILADO_USUARIOS): así se captura la lentitud de quien la
+# reporta, con sus propios proyectos y equipos.
+#
+# Se guarda el perfil de cProfile (descargable desde el admin en formato
+# pstats, para snakeviz o `python -m pstats`) y la traza SQL completa con
+# tiempos y consultas repetidas. Sin perfilar, el costo es una comparación.
+#
+# Los parámetros de las consultas pueden traer secretos y cualquier staff los
+# lee en el admin: no se guardan en las consultas sobre usuarios, sesiones y
+# perfiles (hashes de contraseña, claves de sesión, token del calendario), ni
+# en ninguna consulta de las peticiones muestreadas, que son de usuarios
+# comunes. Las repeticiones se siguen detectando con un resumen (hash) de ellos.
+
+MAXIMO_CONSULTAS = 2000
+MAXIMO_SQL = 4000
+FILAS_RESUMEN = 40
+TABLAS_SENSIBLES = (User._meta.db_table, Session._meta.db_table, Perfil._meta.db_table)
+OCULTOS = '[parámetros ocultos]'
+
+
+def _ajuste(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+class TrazaSQL:
+    """execute_wrapper que mide cada consulta de la conexión."""
+
+    def __init__(self, con_parametros=True):
+        self.con_parametros = con_parametros
+        self.consultas = []
+        self.total = 0
+        self.tiempo = 0.0
+
+    def _parametros(self, sql, params):
+        """(texto a guardar, clave para contar repeticiones)."""
+        if params is None:
+            return '', ''
+        texto = repr(params)
+        if self.con_parametros and not any(tabla in sql for tabla in TABLAS_SENSIBLES):
+            return texto, texto
+        return OCULTOS, hashlib.blake2b(texto.encode(), digest_size=8).hexdigest()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            self.tiempo += ms
+            self.total += 1
+            if len(self.consultas) < MAXIMO_CONSULTAS:
+                self.consultas.append((sql, *self._parametros(sql, params), ms))
+
+    def resumen(self):
+        """
+        (traza, duplicadas). Cada consulta lleva cuántas veces se repitió igual
+        (mismo SQL y parámetros) y cuántas con el mismo SQL: lo típico de un N+1.
+        """
+        veces = Counter((sql, clave) for sql, _, clave, _ in self.consultas)
+        similares = Counter(sql for sql, _, _, _ in self.consultas)
+        traza = [
+            {'sql': sql[:MAXIMO_SQL], 'params': params[:MAXIMO_SQL], 'ms': round(ms, 3),
+             'repeticiones': veces[(sql, clave)], 'similares': similares[sql]}
+            for sql, params, clave, ms in self.consultas
+        ]
+        return traza, sum(n - 1 for n in veces.values())
+
+
+def motivo_de(request):
+    """Por qué perfilar esta petición (None = no perfilar)."""
+    if request.headers.get('X-Perfilar') == '1':
+        motivo = 'CABECERA'
+    elif request.GET.get('perfilar') == '1':
+        motivo = 'PARAMETRO'
+    else:
+        tasa = _ajuste('PERFILADO_MUESTREO', 0.0)
+        if not tasa or random.random() >= tasa or not request.user.is_authenticated:
+            return None
+        usuarios = _ajuste('PERFILADO_USUARIOS', [])
+        if usuarios and request.user.username not in usuarios:
+            return None
+        return 'MUESTREO'
+    # A pedido solo lo puede activar el staff
+    return motivo if request.user.is_staff else None
+
+
+def estadisticas_serializadas(perfil):
+    perfil.create_stats()
+    return marshal.dumps(perfil.stats)
+
+
+def resumen_funciones(datos, filas=FILAS_RESUMEN, orden='cumulative'):
+    """Texto de pstats con las funciones más costosas de un perfil guardado."""
+    stats = pstats.Stats(_PerfilGuardado(datos), stream=io.StringIO())
+    stats.strip_dirs().sort_stats(orden).print_stats(filas)
+    return stats.stream.getvalue()
+
+
+class _PerfilGuardado:
+    """pstats.Stats acepta cualquier objeto con create_stats() y .stats."""
+
+    def __init__(self, datos):
+        self.stats = marshal.loads(bytes(datos))
+
+    def create_stats(self):
+        pass
+
+
+def podar():
+    """Conserva los PERFILADO_MAXIMO más recientes."""
+    maximo = _ajuste('PERFILADO_MAXIMO', 500)
+    corte = Perfilado.objects.order_by('-id').values_list('id', flat=True)[maximo:maximo + 1].first()
+    if corte:
+        Perfilado.objects.filter(id__lte=corte).delete()
+
+
+class PerfiladoMiddleware:
+    """Va después de AuthenticationMiddleware (necesita request.user)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        motivo = motivo_de(request)
+        if motivo is None:
+            return self.get_response(request)
+
+        traza = TrazaSQL(con_parametros=motivo != 'MUESTREO')
+        perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Desde Python 3.12 solo puede haber un perfilador activo por proceso:
+            # si otro hilo ya está perfilando, esta petición guarda solo la traza SQL
+            perfil = None
+        with connection.execute_wrapper(traza):
+            try:
+                respuesta = self.get_response(request)
+            finally:
+                if perfil: perfil.disable()
+        duracion = (time.perf_counter() - inicio) * 1000
+
+        consultas, duplicadas = traza.resumen()
+        registro = Perfilado.objects.create(
+            usuario=request.user if request.user.is_authenticated else None,
+            metodo=request.method, ruta=request.get_full_path()[:500], estado_http=respuesta.status_code,
+            motivo=motivo, duracion_ms=round(duracion, 3), consultas=traza.total,
+            tiempo_sql_ms=round(traza.tiempo, 3), duplicadas=duplicadas, traza_sql=consultas,
+            estadisticas=estadisticas_serializadas(perfil) if perfil else b'',
+        )
+        podar()
+        if request.user.is_staff:
+            respuesta.headers['X-Perfilado'] = str(registro.pk)
+        return respuesta
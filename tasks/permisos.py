@@ -0,0 +1,75 @@
+from django.db.models import Q
+
+from .models import Tarea, Proyecto
+
+# ======================================================
+# AUTORIZACIÓN CENTRALIZADA
+# ======================================================
+# Cada verificación consulta la BD con un EXISTS (nunca materializa el equipo
+# o la lista de compartidos) y el resultado queda memorizado en el request,
+# así la vista y la plantilla comparten una sola respuesta por objeto.
+
+
+def _memo(request, clave, calcular):
+    cache = request.__dict__.setdefault('_cache_permisos', {})
+    if clave not in cache:
+        cache[clave] = calcular()
+    return cache[clave]
+
+
+def es_dueno(request, objeto):
+    """Dueño (campo `usuario`) de una Tarea o Proyecto. No consulta la BD."""
+    return objeto.usuario_id == request.user.id
+
+
+def es_miembro_proyecto(request, proyecto):
+    """Dueño o integrante del equipo del proyecto."""
+    if es_dueno(request, proyecto):
+        return True
+    return _memo(request, ('proyecto', proyecto.pk), lambda: Proyecto.equipo.through.objects.filter(
+        proyecto_id=proyecto.pk, user_id=request.user.id
+    ).exists())
+
+
+def es_colaborador(request, tarea):
+    """La tarea está compartida con el usuario (compartida_con)."""
+    return _memo(request, ('compartida', tarea.pk), lambda: Tarea.compartida_con.through.objects.filter(
+        tarea_id=tarea.pk, user_id=request.user.id
+    ).exists())
+
+
+def participa_en_tarea(request, tarea):
+    """Dueño, responsable o colaborador: puede cambiar estado y reportar avance."""
+    return es_dueno(request, tarea) or tarea.responsable_id == request.user.id or es_colaborador(request, tarea)
+
+
+def puede_ver_tarea(request, tarea):
+    """Participantes de la tarea o miembros del proyecto al que pertenece."""
+    if participa_en_tarea(request, tarea):
+        return True
+    if tarea.proyecto_id is None:
+        return False
+    return _memo(request, ('proyecto', tarea.proyecto_id), lambda: Proyecto.objects.filter(
+        Q(usuario_id=request.user.id) | Q(equipo=request.user.id), pk=tarea.proyecto_id
+    ).exists())
+
+
+# --- Consultas por conjunto ---
+# El mismo criterio que puede_ver_tarea, pero como queryset (sin DISTINCT:
+# los M2M entran como subconsultas) para listados y sincronización.
+
+def proyectos_visibles_para(usuario_id):
+    """Proyectos de los que el usuario es dueño o integrante del equipo."""
+    return Proyecto.objects.filter(
+        Q(usuario_id=usuario_id)
+        | Q(id__in=Proyecto.equipo.through.objects.filter(user_id=usuario_id).values('proyecto_id'))
+    )
+
+
+def tareas_visibles_para(usuario_id):
+    """Tareas en las que el usuario participa o que pertenecen a uno de sus proyectos."""
+    return Tarea.objects.filter(
+        Q(usuario_id=usuario_id) | Q(responsable_id=usuario_id)
+        | Q(id__in=Tarea.compartida_con.through.objects.filter(user_id=usuario_id).values('tarea_id'))
+        | Q(proyecto_id__in=proyectos_visibles_para(usuario_id).values('id'))
+    )
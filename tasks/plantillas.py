@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import Tarea, Etiqueta, Proyecto, PlantillaProyecto, Dependencia
+from .calendario import invalidar_calendarios
+from .dependencias import recalcular
+from .eventos import registrar_altas
+
+CAMPOS_TAREA = ['titulo', 'descripcion', 'costo', 'observaciones', 'responsable_id']
+
+
+def capturar_proyecto(proyecto):
+    """
+    Instantánea de un proyecto en 5 consultas (equipo, tareas, etiquetas, compartidos,
+    dependencias). Las fechas se guardan como desfase en días respecto de fecha_inicio
+    y las dependencias como posiciones dentro de la lista de tareas.
+    """
+    inicio = proyecto.fecha_inicio
+    tareas = {}
+    for fila in proyecto.tareas.order_by('id').values('id', 'fecha_objetivo', *CAMPOS_TAREA):
+        tarea_id = fila.pop('id')
+        fila['desfase'] = (fila.pop('fecha_objetivo') - inicio).days
+        fila['costo'] = str(fila['costo'])
+        fila['etiquetas'] = []
+        fila['compartida_con'] = []
+        fila['depende_de'] = []
+        tareas[tarea_id] = fila
+
+    for tarea_id, etiqueta_id in Tarea.etiquetas.through.objects.filter(
+        tarea__proyecto=proyecto
+    ).values_list('tarea_id', 'etiqueta_id'):
+        tareas[tarea_id]['etiquetas'].append(etiqueta_id)
+
+    for tarea_id, user_id in Tarea.compartida_con.through.objects.filter(
+        tarea__proyecto=proyecto
+    ).values_list('tarea_id', 'user_id'):
+        tareas[tarea_id]['compartida_con'].append(user_id)
+
+    posicion = {tarea_id: i for i, tarea_id in enumerate(tareas)}
+    for tarea_id, requisito_id in Dependencia.objects.filter(
+        tarea__proyecto=proyecto
+    ).values_list('tarea_id', 'requisito_id'):
+        tareas[tarea_id]['depende_de'].append(posicion[requisito_id])
+
+    return {
+        'descripcion': proyecto.descripcion,
+        'presupuesto': str(proyecto.presupuesto),
+        'duracion': (proyecto.fecha_fin - inicio).days if proyecto.fecha_fin else None,
+        'dueno': proyecto.usuario_id,
+        'equipo': list(proyecto.equipo.values_list('id', flat=True)),
+        'tareas': list(tareas.values()),
+    }
+
+
+def guardar_como_plantilla(proyecto, usuario, nombre=None):
+    return PlantillaProyecto.objects.create(
+        nombre=nombre or proyecto.titulo,
+        usuario=usuario,
+        origen=proyecto,
+        datos=capturar_proyecto(proyecto),
+    )
+
+
+@transaction.atomic
+def instanciar(datos, usuario, titulo, fecha_inicio, tamano_lote=1000):
+    """
+    Crea un proyecto nuevo a partir de una instantánea con inserciones masivas:
+    proyecto, equipo, tareas y las dos tablas intermedias (etiquetas/compartidos).
+    Los vencimientos se desplazan a la nueva fecha de inicio.
+    """
+    tareas = datos.get('tareas', [])
+
+    # Descartamos usuarios/etiquetas que ya no existen (2 consultas en total)
+    equipo = set(datos.get('equipo', []))
+    if datos.get('dueno'): equipo.add(datos['dueno'])  # El dueño original pasa a ser parte del equipo
+    equipo.discard(usuario.id)
+    ids_usuarios = set(equipo)
+    ids_etiquetas = set()
+    for t in tareas:
+        ids_usuarios.update(t['compartida_con'])
+        if t['responsable_id']: ids_usuarios.add(t['responsable_id'])
+        ids_etiquetas.update(t['etiquetas'])
+    usuarios_vivos = set(User.objects.filter(id__in=ids_usuarios).values_list('id', flat=True))
+    etiquetas_vivas = set(Etiqueta.objects.filter(id__in=ids_etiquetas).values_list('id', flat=True))
+
+    duracion = datos.get('duracion')
+    proyecto = Proyecto.objects.create(
+        titulo=titulo,
+        descripcion=datos.get('descripcion', ''),
+        usuario=usuario,
+        presupuesto=datos.get('presupuesto', 0),
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_inicio + timedelta(days=duracion) if duracion is not None else None,
+    )
+
+    Proyecto.equipo.through.objects.bulk_create([
+        Proyecto.equipo.through(proyecto_id=proyecto.id, user_id=uid)
+        for uid in sorted(equipo) if uid in usuarios_vivos
+    ])
+
+    nuevas = Tarea.objects.bulk_create([
+        Tarea(
+            proyecto=proyecto,
+            usuario=usuario,
+            titulo=t['titulo'],
+            descripcion=t['descripcion'],
+            costo=t['costo'],
+            observaciones=t['observaciones'],
+            responsable_id=t['responsable_id'] if t['responsable_id'] in usuarios_vivos else None,
+            fecha_objetivo=fecha_inicio + timedelta(days=t['desfase']),
+        )
+        for t in tareas
+    ], batch_size=tamano_lote)
+
+    EtiquetaTarea = Tarea.etiquetas.through
+    Compartida = Tarea.compartida_con.through
+    EtiquetaTarea.objects.bulk_create([
+        EtiquetaTarea(tarea_id=nueva.id, etiqueta_id=eid)
+        for nueva, t in zip(nuevas, tareas) for eid in t['etiquetas'] if eid in etiquetas_vivas
+    ], batch_size=tamano_lote)
+    Compartida.objects.bulk_create([
+        Compartida(tarea_id=nueva.id, user_id=uid)
+        for nueva, t in zip(nuevas, tareas) for uid in t['compartida_con'] if uid in usuarios_vivos
+    ], batch_size=tamano_lote)
+    # Plantillas guardadas antes de existir las dependencias no traen 'depende_de'
+    Dependencia.objects.bulk_create([
+        Dependencia(tarea_id=nueva.id, requisito_id=nuevas[i].id)
+        for nueva, t in zip(nuevas, tareas) for i in t.get('depende_de', [])
+    ], batch_size=tamano_lote)
+    recalcular([t.id for t in nuevas])
+    registrar_altas(nuevas)
+    invalidar_calendarios({usuario.id} | usuarios_vivos)
+
+    return proyecto
+
+
+def clonar_proyecto(proyecto, usuario, titulo, fecha_inicio):
+    return instanciar(capturar_proyecto(proyecto), usuario, titulo, fecha_inicio)
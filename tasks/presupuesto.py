@@ -0,0 +1,209 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import HistorialAvance, Proyecto, Tarea
+from .notificaciones import notificar
+
+# ======================================================
+# ALERTAS DE PRESUPUESTO (TOTAL ACUMULADO)
+# ======================================================
+# Cada proyecto lleva en gastado_acumulado la suma de los montos reportados en
+# sus tareas. Cada cambio suma su diferencia con la fila del proyecto bloqueada
+# y ahí mismo compara el total nuevo contra los umbrales (% del presupuesto): el
+# que se alcanza por primera vez avisa al dueño y queda en umbrales_avisados. Si
+# un umbral deja de alcanzarse (presupuesto ampliado, gasto corregido) se rearma.
+#
+# Las señales del final ajustan el total en cada save()/delete(): reportes
+# nuevos, montos editados, reportes borrados (también en la cascada de un
+# usuario), tareas borradas (con su historial) y tareas que cambian de proyecto. Las rutas sin señales (restauración de
+# respaldos) llaman a conciliar(); el comando conciliar_presupuestos lo corre
+# como red de seguridad.
+
+_DINERO = DecimalField(max_digits=14, decimal_places=2)
+_CAMPOS = ('titulo', 'usuario_id', 'presupuesto', 'gastado_acumulado', 'umbrales_alerta', 'umbrales_avisados')
+
+
+def alcanzados(proyecto, gastado):
+    """Umbrales del proyecto que el monto gastado alcanza."""
+    if proyecto.presupuesto <= 0:
+        return set()
+    return {u for u in proyecto.umbrales_alerta if gastado * 100 >= proyecto.presupuesto * u}
+
+
+def _fijar(proyecto, gastado, tarea=None, avisar=True):
+    """Guarda el total del proyecto (ya bloqueado) y avisa los umbrales nuevos. Devuelve cuáles."""
+    avisados = set(proyecto.umbrales_avisados)
+    llegados = alcanzados(proyecto, gastado)
+    nuevos = sorted(llegados - avisados)
+    avisados = sorted(avisados & llegados | set(nuevos))
+    if gastado != proyecto.gastado_acumulado or avisados != sorted(proyecto.umbrales_avisados):
+        # update() y no save(): no toca 'modificado' ni dispara las señales del proyecto
+        Proyecto.objects.filter(pk=proyecto.pk).update(gastado_acumulado=gastado, umbrales_avisados=avisados)
+        proyecto.gastado_acumulado, proyecto.umbrales_avisados = gastado, avisados
+    if avisar:
+        for umbral in nuevos:
+            texto = f"{proyecto.titulo}: se alcanzó el {umbral}% del presupuesto (${gastado} de ${proyecto.presupuesto})"
+            notificar([proyecto.usuario_id], None, tarea, 'PRESUPUESTO', texto)
+    return nuevos
+
+
+def _bloquear(proyecto_id):
+    # Dos reportes a la vez no pueden partir del mismo total anterior
+    return Proyecto.objects.select_for_update().only(*_CAMPOS).filter(pk=proyecto_id).first()
+
+
+def sumar_gasto(proyecto_id, monto, tarea=None):
+    """Suma un monto (negativo para restar) al total del proyecto y avisa los umbrales que cruza."""
+    if not proyecto_id or not monto:
+        return []
+    with transaction.atomic():
+        proyecto = _bloquear(proyecto_id)
+        if proyecto is None:
+            return []  # El proyecto se está borrando en la misma cascada
+        return _fijar(proyecto, proyecto.gastado_acumulado + monto, tarea)
+
+
+def reevaluar(proyecto_id):
+    """Tras cambiar el presupuesto o los umbrales: compara el total que ya lleva, sin sumar el historial."""
+    with transaction.atomic():
+        proyecto = _bloquear(proyecto_id)
+        return _fijar(proyecto, proyecto.gastado_acumulado)
+
+
+def _gastado_real(proyecto_id):
+    return HistorialAvance.objects.filter(tarea__proyecto_id=proyecto_id).aggregate(
+        total=Coalesce(Sum('monto'), Value(Decimal('0')), output_field=_DINERO)
+    )['total']
+
+
+def desviados(proyectos=None):
+    """Ids de los proyectos cuyo total acumulado no coincide con la suma del historial (una consulta)."""
+    real = HistorialAvance.objects.filter(tarea__proyecto=OuterRef('pk')).order_by().values(
+        'tarea__proyecto'
+    ).annotate(total=Sum('monto')).values('total')
+    qs = Proyecto.objects.annotate(
+        real=Coalesce(Subquery(real, output_field=_DINERO), Value(Decimal('0')), output_field=_DINERO)
+    ).exclude(real=F('gastado_acumulado'))
+    if proyectos is not None:
+        qs = qs.filter(pk__in=proyectos)
+    return list(qs.order_by('pk').values_list('pk', flat=True))
+
+
+def conciliar(proyectos=None, avisar=True):
+    """
+    Corrige el total de los proyectos desviados, cada uno con su fila bloqueada
+    (un reporte en curso espera y suma sobre el valor corregido). Con `avisar`
+    en falso los umbrales alcanzados quedan marcados sin notificar. Devuelve
+    [(id, total anterior, total real)].
+    """
+    corregidos = []
+    for proyecto_id in desviados(proyectos):
+        with transaction.atomic():
+            proyecto = _bloquear(proyecto_id)
+            if proyecto is None:
+                continue  # Borrado entre la búsqueda y el bloqueo
+            anterior = proyecto.gastado_acumulado
+            real = _gastado_real(proyecto_id)
+            _fijar(proyecto, real, avisar=avisar)
+            if real != anterior:
+                corregidos.append((proyecto_id, anterior, real))
+    return corregidos
+
+
+# --- Ajustes por señales ---
+# Si una tarea se borra sola, resta su historial entero con una sola suma; en
+# la cascada de un proyecto el total se va con él. En cualquier otro borrado
+# (el reporte mismo, un queryset de reportes, la cascada de un usuario) restan
+# los reportes: el Collector envía todos los pre_delete antes de borrar, así que
+# ahí se agrupan por proyecto en el origen del delete() y cada proyecto se
+# ajusta una vez, con el último post_delete de su grupo.
+
+def _origen_es(origin, *modelos):
+    return isinstance(origin, modelos) or getattr(origin, 'model', None) in modelos
+
+
+def _proyecto_de(tarea_id):
+    return Tarea.objects.filter(pk=tarea_id).values_list('proyecto_id', flat=True).first()
+
+
+def _gastado_de_tarea(tarea_id):
+    return HistorialAvance.objects.filter(tarea_id=tarea_id).aggregate(total=Sum('monto'))['total'] or 0
+
+
+@receiver(post_init, sender=HistorialAvance)
+def _recordar_monto(sender, instance, **kwargs):
+    d = instance.__dict__
+    instance._gasto_original = (d.get('tarea_id'), d.get('monto'))
+
+
+@receiver(post_save, sender=HistorialAvance)
+def _avance_guardado(sender, instance, created, **kwargs):
+    tarea_id, monto = instance._gasto_original
+    instance._gasto_original = (instance.tarea_id, instance.monto)
+    if created:
+        sumar_gasto(instance.tarea.proyecto_id, instance.monto, instance.tarea)
+    elif tarea_id != instance.tarea_id:
+        sumar_gasto(_proyecto_de(tarea_id), -(monto or 0))
+        sumar_gasto(_proyecto_de(instance.tarea_id), instance.monto, instance.tarea)
+    elif monto != instance.monto:
+        sumar_gasto(_proyecto_de(instance.tarea_id), instance.monto - (monto or 0), instance.tarea)
+
+
+@receiver(pre_delete, sender=HistorialAvance)
+def _avance_por_borrar(sender, instance, origin=None, **kwargs):
+    instance._grupo_gasto = None
+    if _origen_es(origin, Tarea, Proyecto):
+        return
+    comun = (instance if origin is None else origin).__dict__
+    proyectos = comun.setdefault('_proyecto_de_tarea', {})
+    if instance.tarea_id not in proyectos:
+        proyectos[instance.tarea_id] = _proyecto_de(instance.tarea_id)
+    proyecto_id = proyectos[instance.tarea_id]
+    # [reportes del grupo aún sin borrar, monto a restar]
+    grupo = comun.setdefault('_gasto_por_borrar', {}).setdefault(proyecto_id, [0, 0])
+    grupo[0] += 1
+    grupo[1] += instance.monto
+    instance._grupo_gasto = (proyecto_id, grupo)
+
+
+@receiver(post_delete, sender=HistorialAvance)
+def _avance_borrado(sender, instance, **kwargs):
+    if not getattr(instance, '_grupo_gasto', None):
+        return
+    proyecto_id, grupo = instance._grupo_gasto
+    grupo[0] -= 1
+    if grupo[0] == 0:
+        monto, grupo[1] = grupo[1], 0
+        sumar_gasto(proyecto_id, -monto)
+
+
+@receiver(post_init, sender=Tarea)
+def _recordar_proyecto(sender, instance, **kwargs):
+    instance._proyecto_gasto = instance.__dict__.get('proyecto_id')
+
+
+@receiver(post_save, sender=Tarea)
+def _tarea_guardada(sender, instance, created, **kwargs):
+    anterior = instance._proyecto_gasto
+    instance._proyecto_gasto = instance.proyecto_id
+    if not created and anterior != instance.proyecto_id:
+        total = _gastado_de_tarea(instance.pk)
+        sumar_gasto(anterior, -total)
+        sumar_gasto(instance.proyecto_id, total, instance)
+
+
+@receiver(pre_delete, sender=Tarea)
+def _tarea_por_borrar(sender, instance, origin=None, **kwargs):
+    # Solo si se borra la tarea misma; en otras cascadas restan sus reportes
+    directo = _origen_es(origin, Tarea) and instance.proyecto_id
+    instance._gasto_a_restar = _gastado_de_tarea(instance.pk) if directo else 0
+
+
+@receiver(post_delete, sender=Tarea)
+def _tarea_borrada(sender, instance, **kwargs):
+    sumar_gasto(instance.proyecto_id, -getattr(instance, '_gasto_a_restar', 0))
@@ -0,0 +1,172 @@
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .calendario import invalidar_calendarios
+from .eventos import registrar_altas
+from .models import Tarea, Recurrencia
+
+# ======================================================
+# TAREAS RECURRENTES (MATERIALIZACIÓN PEREZOSA)
+# ======================================================
+# Una Recurrencia cuelga de la tarea original (Tarea.regla). Las ocurrencias
+# generadas llevan Tarea.recurrencia; la original no, así su fecha puede caer
+# sobre la de una ocurrencia sin chocar con ocurrencia_unica_por_fecha. Son tareas
+# normales (el tablero, el radar y el calendario las ven sin cambios), pero
+# solo existen dentro de una ventana móvil: `materializar_recurrencias` (cron
+# diario) crea las que entran en la ventana con un bulk_create por lote y
+# avanza `generada_hasta`. Nunca se guardan años de instancias futuras.
+#
+# La fecha n-ésima siempre se calcula desde el ancla (fecha objetivo de la
+# original), así una regla mensual del 31 cae el 30 o el 28 sin ir corriéndose.
+
+VENTANA_DIAS = 45
+TAMANO_LOTE = 200
+CAMPOS_COPIADOS = ('titulo', 'descripcion', 'proyecto', 'costo', 'responsable', 'etiquetas', 'compartida_con')
+
+
+def _sumar_meses(fecha, meses):
+    total = fecha.month - 1 + meses
+    anio, mes = fecha.year + total // 12, total % 12 + 1
+    return fecha.replace(year=anio, month=mes, day=min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+def fecha_ocurrencia(regla, ancla, n):
+    if regla.frecuencia == 'MENSUAL':
+        return _sumar_meses(ancla, n * regla.intervalo)
+    paso = 7 if regla.frecuencia == 'SEMANAL' else 1
+    return ancla + timedelta(days=n * paso * regla.intervalo)
+
+
+def fechas_entre(regla, ancla, desde, hasta):
+    """Fechas de la regla en (desde, hasta], sin pasar de fecha_fin."""
+    if regla.fecha_fin and regla.fecha_fin < hasta:
+        hasta = regla.fecha_fin
+    # Salto directo cerca de `desde` (sin recorrer años de ocurrencias ya generadas)
+    if regla.frecuencia == 'MENSUAL':
+        n = max(1, ((desde.year - ancla.year) * 12 + desde.month - ancla.month) // regla.intervalo)
+    else:
+        n = max(1, (desde - ancla).days // ((7 if regla.frecuencia == 'SEMANAL' else 1) * regla.intervalo))
+    while n > 1 and fecha_ocurrencia(regla, ancla, n - 1) > desde:
+        n -= 1
+    fechas = []
+    while True:
+        fecha = fecha_ocurrencia(regla, ancla, n)
+        if fecha > hasta:
+            return fechas
+        if fecha > desde:
+            fechas.append(fecha)
+        n += 1
+
+
+@transaction.atomic
+def materializar(reglas, hasta=None):
+    """
+    Crea las ocurrencias faltantes hasta `hasta` (hoy + VENTANA_DIAS) para
+    estas reglas. Un bulk_create para las tareas y uno por cada relación m2m.
+    Devuelve cuántas tareas creó.
+    """
+    hasta = hasta or timezone.now().date() + timedelta(days=VENTANA_DIAS)
+    reglas = [r for r in reglas if r.generada_hasta < hasta]
+    if not reglas:
+        return 0
+    ids_origen = [r.origen_id for r in reglas]
+    origenes = Tarea.objects.in_bulk(ids_origen)
+    etiquetas, compartidos = defaultdict(list), defaultdict(list)
+    for tarea_id, etiqueta_id in Tarea.etiquetas.through.objects.filter(tarea_id__in=ids_origen).values_list('tarea_id', 'etiqueta_id'):
+        etiquetas[tarea_id].append(etiqueta_id)
+    for tarea_id, user_id in Tarea.compartida_con.through.objects.filter(tarea_id__in=ids_origen).values_list('tarea_id', 'user_id'):
+        compartidos[tarea_id].append(user_id)
+
+    # Fechas que ya existen (p. ej. ocurrencias iniciadas que sobrevivieron a una regeneración)
+    existentes = set(Tarea.objects.filter(
+        recurrencia__in=reglas, fecha_objetivo__gt=min(r.generada_hasta for r in reglas)
+    ).values_list('recurrencia_id', 'fecha_objetivo'))
+
+    nuevas = []
+    for regla in reglas:
+        o = origenes[regla.origen_id]
+        for fecha in fechas_entre(regla, o.fecha_objetivo, regla.generada_hasta, hasta):
+            if (regla.id, fecha) in existentes:
+                continue
+            nuevas.append(Tarea(
+                titulo=o.titulo, descripcion=o.descripcion, proyecto_id=o.proyecto_id, costo=o.costo,
+                usuario_id=o.usuario_id, responsable_id=o.responsable_id, recurrencia=regla,
+                fecha_objetivo=fecha, fin_proyectado=fecha,  # Nacen sin dependencias
+            ))
+        regla.generada_hasta = hasta if not regla.fecha_fin else max(regla.generada_hasta, min(hasta, regla.fecha_fin))
+
+    # bulk_create no dispara señales: lo que harían (fin proyectado, bitácora, calendarios) se hace aquí
+    nuevas = Tarea.objects.bulk_create(nuevas, batch_size=1000)
+    registrar_altas(nuevas)
+    origen_de = {r.id: r.origen_id for r in reglas}
+    Tarea.etiquetas.through.objects.bulk_create([
+        Tarea.etiquetas.through(tarea_id=t.id, etiqueta_id=e)
+        for t in nuevas for e in etiquetas[origen_de[t.recurrencia_id]]
+    ], batch_size=1000)
+    Tarea.compartida_con.through.objects.bulk_create([
+        Tarea.compartida_con.through(tarea_id=t.id, user_id=u)
+        for t in nuevas for u in compartidos[origen_de[t.recurrencia_id]]
+    ], batch_size=1000)
+    Recurrencia.objects.bulk_update(reglas, ['generada_hasta'])
+
+    if nuevas:
+        afectados = set()
+        for r in reglas:
+            o = origenes[r.origen_id]
+            afectados.update((o.usuario_id, o.responsable_id), compartidos[o.id])
+        invalidar_calendarios(afectados)
+    return len(nuevas)
+
+
+def reglas_pendientes(hasta):
+    """Reglas con la ventana sin cubrir hasta `hasta` y que no terminaron antes."""
+    return Recurrencia.objects.filter(generada_hasta__lt=hasta).filter(
+        Q(fecha_fin=None) | Q(fecha_fin__gt=F('generada_hasta'))
+    ).order_by('id')
+
+
+def no_iniciadas(regla):
+    """Ocurrencias futuras que nadie tocó: pendientes y sin reportes de avance."""
+    return regla.ocurrencias.filter(
+        estado='PENDIENTE', fecha_objetivo__gte=timezone.now().date(), historial__isnull=True,
+    )
+
+
+def descartar_no_iniciadas(regla):
+    Tarea.objects.filter(pk__in=list(no_iniciadas(regla).values_list('pk', flat=True))).delete()
+
+
+@transaction.atomic
+def regenerar(regla):
+    """
+    Tras editar la regla (o la tarea original): reemplaza solo las ocurrencias
+    no iniciadas. Las que ya tienen avance o cambiaron de estado se conservan.
+    La vista las descarta antes de guardar la fecha nueva de la original.
+    """
+    descartar_no_iniciadas(regla)
+    ayer = timezone.now().date() - timedelta(days=1)
+    regla.generada_hasta = max(regla.origen.fecha_objetivo, ayer)
+    regla.save(update_fields=['generada_hasta'])
+    return materializar([regla])
+
+
+@transaction.atomic
+def crear_regla(tarea, regla):
+    """Asocia la regla (sin guardar) a la tarea original y materializa la primera ventana."""
+    regla.origen = tarea
+    # Una original vencida no genera de golpe todas las ocurrencias atrasadas
+    regla.generada_hasta = max(tarea.fecha_objetivo, timezone.now().date() - timedelta(days=1))
+    regla.save()
+    return materializar([regla])
+
+
+@transaction.atomic
+def quitar_regla(regla):
+    """Deja de repetir: se borran las ocurrencias no iniciadas; el resto queda como tareas sueltas."""
+    descartar_no_iniciadas(regla)
+    regla.delete()
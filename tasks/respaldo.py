@@ -0,0 +1,279 @@
+import json
+import zipfile
+
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+from .models import Tarea, Etiqueta, Proyecto, HistorialAvance, Dependencia
+from .calendario import invalidar_calendarios
+from .dependencias import recalcular
+from .eventos import registrar_altas
+from .presupuesto import conciliar
+from .permisos import proyectos_visibles_para, tareas_visibles_para
+
+# ======================================================
+# RESPALDO COMPLETO (ZIP) DE UN PROYECTO O ESPACIO DE TRABAJO
+# ======================================================
+# Un .zip con un archivo NDJSON (un objeto JSON por línea) por modelo y por
+# tabla intermedia, los adjuntos del historial bajo adjuntos/ y un
+# manifiesto.json al final con las cantidades.
+#
+# La exportación se genera al vuelo: cada consulta se recorre por lotes con
+# iterator() (cursor del lado del servidor en PostgreSQL), los adjuntos se
+# copian por bloques y zipfile escribe sobre un "tubo" que se vacía cada tanto,
+# así nunca está el archivo completo en memoria ni en disco temporal.
+#
+# La importación crea objetos nuevos (los ids se remapean) con bulk_create por
+# lotes; los usuarios se buscan por username y lo que no existe en destino
+# queda a nombre del usuario que importa.
+
+VERSION = 1
+TAMANO_LOTE = 1000
+BLOQUE = 256 * 1024  # Bytes acumulados en el tubo antes de entregarlos
+CARPETA_ADJUNTOS = 'adjuntos/'
+
+CAMPOS = {
+    'proyectos': ('id', 'titulo', 'descripcion', 'usuario_id', 'presupuesto', 'fecha_inicio', 'fecha_fin', 'estado', 'creado_el'),
+    'etiquetas': ('id', 'usuario_id', 'nombre', 'color'),
+    'tareas': ('id', 'titulo', 'descripcion', 'proyecto_id', 'costo', 'fecha_creacion', 'fecha_objetivo', 'fecha_cierre',
+               'estado', 'avance', 'observaciones', 'usuario_id', 'responsable_id', 'rango'),
+    'historial': ('id', 'tarea_id', 'usuario_id', 'comentario', 'archivo', 'monto', 'fecha'),
+    'proyectos_equipo': ('proyecto_id', 'user_id'),
+    'tareas_compartidas': ('tarea_id', 'user_id'),
+    'tareas_etiquetas': ('tarea_id', 'etiqueta_id'),
+    'dependencias': ('tarea_id', 'requisito_id'),
+}
+# Columnas con ids de usuario, para armar usuarios.ndjson con los que aparecen
+_USUARIOS = {'proyectos': ('usuario_id',), 'etiquetas': ('usuario_id',), 'tareas': ('usuario_id', 'responsable_id'),
+             'historial': ('usuario_id',), 'proyectos_equipo': ('user_id',), 'tareas_compartidas': ('user_id',)}
+
+
+class RespaldoInvalido(Exception):
+    pass
+
+
+def _consultas(proyecto=None, usuario=None):
+    """Querysets (en el orden en que se escriben) de un proyecto o de todo lo que ve un usuario."""
+    if proyecto is not None:
+        proyectos = Proyecto.objects.filter(pk=proyecto.pk)
+        tareas = Tarea.objects.filter(proyecto=proyecto)
+        etiquetas = Etiqueta.objects.filter(id__in=Tarea.etiquetas.through.objects.filter(
+            tarea__proyecto=proyecto).values('etiqueta_id'))
+    else:
+        proyectos = proyectos_visibles_para(usuario.id)
+        tareas = tareas_visibles_para(usuario.id)
+        etiquetas = Etiqueta.objects.filter(Q(usuario=usuario) | Q(id__in=Tarea.etiquetas.through.objects.filter(
+            tarea__in=tareas.values('id')).values('etiqueta_id')))
+    ids_tareas = tareas.values('id')
+    return {
+        'proyectos': proyectos,
+        'etiquetas': etiquetas,
+        'tareas': tareas,
+        'historial': HistorialAvance.objects.filter(tarea__in=ids_tareas),
+        'proyectos_equipo': Proyecto.equipo.through.objects.filter(proyecto__in=proyectos.values('id')),
+        'tareas_compartidas': Tarea.compartida_con.through.objects.filter(tarea__in=ids_tareas),
+        'tareas_etiquetas': Tarea.etiquetas.through.objects.filter(tarea__in=ids_tareas, etiqueta__in=etiquetas.values('id')),
+        'dependencias': Dependencia.objects.filter(tarea__in=ids_tareas, requisito__in=ids_tareas),
+    }
+
+
+class _Tubo:
+    """Destino de solo escritura para zipfile: sin seek() escribe el ZIP en secuencia."""
+
+    def __init__(self):
+        self.trozos = []
+        self.pendiente = 0
+        self.posicion = 0
+
+    def write(self, datos):
+        self.trozos.append(bytes(datos))
+        self.pendiente += len(datos)
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.trozos)
+        self.trozos.clear()
+        self.pendiente = 0
+        return datos
+
+
+def exportar(proyecto=None, usuario=None):
+    """Genera el .zip en trozos de bytes (para StreamingHttpResponse o un archivo)."""
+    tubo = _Tubo()
+    cantidades = {}
+    usuarios, adjuntos = set(), []
+    almacen = HistorialAvance.archivo.field.storage
+
+    with zipfile.ZipFile(tubo, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for nombre, qs in _consultas(proyecto, usuario).items():
+            columnas_usuario = _USUARIOS.get(nombre, ())
+            cantidades[nombre] = 0
+            with zf.open(f'{nombre}.ndjson', 'w', force_zip64=True) as destino:
+                for fila in qs.order_by().values(*CAMPOS[nombre]).iterator(chunk_size=TAMANO_LOTE):
+                    destino.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False).encode() + b'\n')
+                    cantidades[nombre] += 1
+                    usuarios.update(fila[c] for c in columnas_usuario)
+                    if nombre == 'historial' and fila['archivo']:
+                        adjuntos.append(fila['archivo'])
+                    if tubo.pendiente >= BLOQUE:
+                        yield tubo.vaciar()
+
+        usuarios.discard(None)
+        ids = sorted(usuarios)
+        with zf.open('usuarios.ndjson', 'w', force_zip64=True) as destino:
+            for i in range(0, len(ids), TAMANO_LOTE):
+                for fila in User.objects.filter(id__in=ids[i:i + TAMANO_LOTE]).values('id', 'username', 'email'):
+                    destino.write(json.dumps(fila, ensure_ascii=False).encode() + b'\n')
+        cantidades['usuarios'] = len(usuarios)
+        yield tubo.vaciar()
+
+        # Los adjuntos ya vienen comprimidos casi siempre (pdf, jpg, mp4): se guardan tal cual
+        cantidades['adjuntos'] = 0
+        for ruta in dict.fromkeys(adjuntos):
+            if not almacen.exists(ruta):
+                continue
+            with almacen.open(ruta, 'rb') as origen, \
+                    zf.open(zipfile.ZipInfo(CARPETA_ADJUNTOS + ruta), 'w', force_zip64=True) as destino:
+                for trozo in iter(lambda: origen.read(BLOQUE), b''):
+                    destino.write(trozo)
+                    yield tubo.vaciar()
+            cantidades['adjuntos'] += 1
+
+        manifiesto = {
+            'version': VERSION, 'generado': timezone.now().isoformat(),
+            'proyecto': proyecto.pk if proyecto is not None else None,
+            'usuario': usuario.username if usuario is not None else None,
+            'cantidades': cantidades,
+        }
+        zf.writestr('manifiesto.json', json.dumps(manifiesto, indent=2, ensure_ascii=False))
+    yield tubo.vaciar()
+
+
+# --- Importación ---
+def _leer(zf, nombre):
+    if nombre + '.ndjson' not in zf.NameToInfo:
+        return
+    with zf.open(nombre + '.ndjson') as origen:
+        for linea in origen:
+            if linea.strip():
+                yield json.loads(linea)
+
+
+def _en_lotes(filas):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= TAMANO_LOTE:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _restaurar_fechas(modelo, campo, valores):
+    """bulk_create pisa los auto_now_add con la hora actual: se vuelven a poner con un UPDATE por lote."""
+    columna = modelo._meta.get_field(campo)
+    casos = [When(id=pk, then=Value(columna.to_python(v), output_field=columna)) for pk, v in valores.items() if v]
+    if casos:
+        modelo.objects.filter(id__in=list(valores)).update(**{campo: Case(*casos, output_field=columna)})
+
+
+@transaction.atomic
+def importar(archivo, usuario):
+    """
+    Restaura un respaldo (ruta o archivo abierto) como objetos nuevos. Devuelve
+    las cantidades creadas y cuántos usuarios del origen no existían en destino.
+    """
+    try:
+        zf = zipfile.ZipFile(archivo)
+    except zipfile.BadZipFile:
+        raise RespaldoInvalido("El archivo no es un .zip válido.")
+    with zf:
+        try:
+            manifiesto = json.loads(zf.read('manifiesto.json'))
+        except KeyError:
+            raise RespaldoInvalido("Falta manifiesto.json: no es un respaldo de UpTask.")
+        if manifiesto.get('version') != VERSION:
+            raise RespaldoInvalido(f"Versión de respaldo no soportada: {manifiesto.get('version')}.")
+
+        origen_usuarios = {f['id']: f['username'] for f in _leer(zf, 'usuarios')}
+        por_nombre = dict(User.objects.filter(username__in=origen_usuarios.values()).values_list('username', 'id'))
+        usuarios = {viejo: por_nombre[nombre] for viejo, nombre in origen_usuarios.items() if nombre in por_nombre}
+        dueno = lambda viejo: usuarios.get(viejo, usuario.id)  # noqa: E731
+        mapas = {'proyectos': {}, 'etiquetas': {}, 'tareas': {}}
+        creados = {}
+
+        def crear(nombre, modelo, armar, fecha_original=None, al_crear=None):
+            creados[nombre] = 0
+            for lote in _en_lotes(_leer(zf, nombre)):
+                objetos = modelo.objects.bulk_create([armar(f) for f in lote], batch_size=TAMANO_LOTE)
+                if nombre in mapas:
+                    mapas[nombre].update((f['id'], o.id) for f, o in zip(lote, objetos))
+                if fecha_original:
+                    _restaurar_fechas(modelo, fecha_original, {o.id: f[fecha_original] for f, o in zip(lote, objetos)})
+                if al_crear:
+                    al_crear(objetos)
+                creados[nombre] += len(objetos)
+
+        def relacionar(nombre, modelo, campos, mapa_a, mapa_b):
+            a, b = campos
+            creados[nombre] = 0
+            for lote in _en_lotes(_leer(zf, nombre)):
+                filas = [modelo(**{a: mapa_a.get(f[a]), b: mapa_b.get(f[b])}) for f in lote]
+                filas = [f for f in filas if getattr(f, a) and getattr(f, b)]
+                modelo.objects.bulk_create(filas, batch_size=TAMANO_LOTE, ignore_conflicts=True)
+                creados[nombre] += len(filas)
+
+        crear('etiquetas', Etiqueta, lambda f: Etiqueta(
+            usuario_id=dueno(f['usuario_id']), nombre=f['nombre'], color=f['color']))
+        crear('proyectos', Proyecto, lambda f: Proyecto(
+            **{c: f[c] for c in CAMPOS['proyectos'] if c not in ('id', 'usuario_id', 'creado_el')},
+            usuario_id=dueno(f['usuario_id'])), fecha_original='creado_el')
+        relacionar('proyectos_equipo', Proyecto.equipo.through, ('proyecto_id', 'user_id'), mapas['proyectos'], usuarios)
+
+        # La bitácora de altas se escribe por lote (bulk_create no dispara post_save)
+        crear('tareas', Tarea, lambda f: Tarea(
+            **{c: f[c] for c in CAMPOS['tareas'] if c not in ('id', 'proyecto_id', 'usuario_id', 'responsable_id', 'fecha_creacion')},
+            proyecto_id=mapas['proyectos'].get(f['proyecto_id']), usuario_id=dueno(f['usuario_id']),
+            responsable_id=usuarios.get(f['responsable_id'])), fecha_original='fecha_creacion', al_crear=registrar_altas)
+        relacionar('tareas_compartidas', Tarea.compartida_con.through, ('tarea_id', 'user_id'), mapas['tareas'], usuarios)
+        relacionar('tareas_etiquetas', Tarea.etiquetas.through, ('tarea_id', 'etiqueta_id'), mapas['tareas'], mapas['etiquetas'])
+        relacionar('dependencias', Dependencia, ('tarea_id', 'requisito_id'), mapas['tareas'], mapas['tareas'])
+
+        # Los adjuntos se copian por bloques al almacenamiento (puede renombrarlos si ya existen)
+        almacen = HistorialAvance.archivo.field.storage
+        archivos = {}
+
+        def adjunto(ruta):
+            if not ruta:
+                return None
+            if ruta not in archivos:
+                try:
+                    with zf.open(CARPETA_ADJUNTOS + ruta) as origen:
+                        archivos[ruta] = almacen.save(ruta, File(origen, name=ruta))
+                except KeyError:
+                    archivos[ruta] = None  # El respaldo no lo traía (ya faltaba en el origen)
+            return archivos[ruta]
+
+        crear('historial', HistorialAvance, lambda f: HistorialAvance(
+            tarea_id=mapas['tareas'][f['tarea_id']], usuario_id=dueno(f['usuario_id']), comentario=f['comentario'],
+            archivo=adjunto(f['archivo']), monto=f['monto']), fecha_original='fecha')
+
+        # Lo demás que harían las señales de save(): fin proyectado y calendarios
+        recalcular(list(mapas['tareas'].values()))
+        # Total gastado de los proyectos restaurados; lo ya gastado en el origen no se avisa de nuevo
+        conciliar(list(mapas['proyectos'].values()), avisar=False)
+        invalidar_calendarios({usuario.id} | set(usuarios.values()))
+        creados['usuarios_sin_equivalente'] = len(set(origen_usuarios) - set(usuarios))
+        return creados
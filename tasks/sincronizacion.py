@@ -0,0 +1,371 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db.models import Q
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .calendario import usuarios_de_tareas
+from .models import Tarea, Proyecto, Etiqueta, HistorialAvance, CambioSync
+from .permisos import proyectos_visibles_para, tareas_visibles_para
+
+# ======================================================
+# SINCRONIZACIÓN INCREMENTAL PARA CLIENTES OFFLINE
+# ======================================================
+# El cliente guarda un cursor opaco y pide lo que cambió desde entonces:
+#
+# 1. Proyectos, etiquetas, tareas e historial con `modificado` dentro de la
+#    ventana del cursor, recorridos por el índice (modificado, id).
+# 2. Las filas de CambioSync de la ventana: borrados y usuarios que ganaron o
+#    perdieron acceso sin que el objeto cambiara (compartidos, equipo,
+#    responsable, cambio de proyecto). Con eso se arman las "bajas" y se
+#    reenvía lo que pasó a ser visible junto con sus hijos.
+#
+# Cada página trae como mucho `limite` filas; `mas` indica que hay que pedir
+# la siguiente con el cursor devuelto. El cliente aplica primero las bajas y
+# después los cambios. La baja de un proyecto arrastra localmente sus tareas
+# y su historial (las que sigue viendo vuelven en la misma página), y la de
+# una tarea arrastra su historial.
+#
+# Cada ventana arranca MARGEN antes del final de la anterior: una transacción
+# que confirma tarde con un `modificado` ya pasado se recoge en la siguiente
+# (a costa de reenviar algunas filas, que el cliente vuelve a aplicar igual).
+
+MARGEN = timedelta(minutes=2)
+LIMITE = 500
+LIMITE_MAXIMO = 2000
+# podar_sincronizacion borra CambioSync más viejos que esto; un cursor anterior
+# ya no puede traer sus bajas y el cliente debe descargar todo de nuevo
+RETENCION_DIAS = 90
+FASES = ('proyectos', 'etiquetas', 'tareas', 'historial', 'accesos')
+_SAL = 'tasks.sincronizacion'
+_NO_CARGADO = object()
+
+CAMPOS = {
+    'proyectos': ('id', 'titulo', 'descripcion', 'usuario', 'presupuesto', 'fecha_inicio', 'fecha_fin', 'estado', 'modificado'),
+    'etiquetas': ('id', 'nombre', 'color', 'usuario', 'modificado'),
+    'tareas': ('id', 'titulo', 'descripcion', 'proyecto', 'costo', 'fecha_objetivo', 'fecha_cierre', 'estado',
+               'avance', 'observaciones', 'usuario', 'responsable', 'modificado'),
+    'historial': ('id', 'tarea', 'usuario', 'comentario', 'monto', 'archivo', 'fecha', 'id_cliente', 'modificado'),
+}
+
+
+class CursorInvalido(Exception):
+    pass
+
+
+# --- Conjuntos visibles ---
+def _visibles(fase, usuario_id):
+    if fase == 'proyectos':
+        return proyectos_visibles_para(usuario_id)
+    if fase == 'tareas':
+        return tareas_visibles_para(usuario_id)
+    if fase == 'historial':
+        return HistorialAvance.objects.filter(tarea_id__in=tareas_visibles_para(usuario_id).values('id'))
+    # Las propias y las de otros que aparecen en tareas visibles
+    return Etiqueta.objects.filter(
+        Q(usuario_id=usuario_id)
+        | Q(id__in=Tarea.etiquetas.through.objects.filter(
+            tarea_id__in=tareas_visibles_para(usuario_id).values('id')
+        ).values('etiqueta_id'))
+    )
+
+
+# --- Cursor ---
+def _leer_cursor(cursor, usuario_id):
+    if not cursor:
+        return {'d': None}
+    try:
+        datos = signing.loads(cursor, salt=_SAL)
+    except signing.BadSignature:
+        raise CursorInvalido('Cursor inválido.')
+    if datos.get('u') != usuario_id:
+        raise CursorInvalido('El cursor pertenece a otro usuario.')
+    return datos
+
+
+def _cursor(usuario_id, **datos):
+    return signing.dumps({'u': usuario_id, **datos}, salt=_SAL, compress=True)
+
+
+def _fecha(texto):
+    return parse_datetime(texto) if texto else None
+
+
+# --- Armado de la respuesta ---
+class _Pagina:
+    def __init__(self):
+        self.cambios = {fase: {} for fase in CAMPOS}
+        self.bajas = {fase: set() for fase in CAMPOS}
+
+    def agregar(self, fase, filas):
+        for fila in filas:
+            self.cambios[fase][fila['id']] = fila
+
+    def completar(self):
+        """Listas M2M de tareas y proyectos, etiquetas referenciadas y nombres de usuario (una consulta cada una)."""
+        tareas, proyectos = self.cambios['tareas'], self.cambios['proyectos']
+        for fila in tareas.values():
+            fila['etiquetas'], fila['compartida_con'] = [], []
+        for fila in proyectos.values():
+            fila['equipo'] = []
+        if tareas:
+            for tarea_id, etiqueta_id in Tarea.etiquetas.through.objects.filter(tarea_id__in=tareas).values_list('tarea_id', 'etiqueta_id'):
+                tareas[tarea_id]['etiquetas'].append(etiqueta_id)
+            for tarea_id, user_id in Tarea.compartida_con.through.objects.filter(tarea_id__in=tareas).values_list('tarea_id', 'user_id'):
+                tareas[tarea_id]['compartida_con'].append(user_id)
+            # El cliente puede no tener etiquetas de otros usuarios que aparecen en estas tareas
+            faltantes = {e for fila in tareas.values() for e in fila['etiquetas']} - set(self.cambios['etiquetas'])
+            if faltantes:
+                self.agregar('etiquetas', Etiqueta.objects.filter(id__in=faltantes).values(*CAMPOS['etiquetas']))
+        if proyectos:
+            for proyecto_id, user_id in Proyecto.equipo.through.objects.filter(proyecto_id__in=proyectos).values_list('proyecto_id', 'user_id'):
+                proyectos[proyecto_id]['equipo'].append(user_id)
+
+        almacen = HistorialAvance.archivo.field.storage
+        for fila in self.cambios['historial'].values():
+            fila['archivo'] = almacen.url(fila['archivo']) if fila['archivo'] else None
+
+        ids = set()
+        for fila in proyectos.values():
+            ids.add(fila['usuario']); ids.update(fila['equipo'])
+        for fila in tareas.values():
+            ids.update((fila['usuario'], fila['responsable'])); ids.update(fila['compartida_con'])
+        for fase in ('etiquetas', 'historial'):
+            ids.update(fila['usuario'] for fila in self.cambios[fase].values())
+        ids.discard(None)
+        usuarios = dict(User.objects.filter(id__in=ids).values_list('id', 'username')) if ids else {}
+
+        return {
+            'cambios': {fase: list(filas.values()) for fase, filas in self.cambios.items()},
+            'bajas': {fase: sorted(ids) for fase, ids in self.bajas.items()},
+            'usuarios': usuarios,
+        }
+
+
+def _aplicar_accesos(pagina, usuario_id, filas):
+    """Convierte las filas de CambioSync en bajas y reenvíos según lo que el usuario ve ahora."""
+    por_tipo = defaultdict(set)
+    for modelo, objeto_id, tipo in filas:
+        por_tipo[modelo, tipo].add(objeto_id)
+
+    proyectos = por_tipo['PROYECTO', 'PERDIDO'] | por_tipo['PROYECTO', 'GANADO']
+    tareas = por_tipo['TAREA', 'PERDIDO'] | por_tipo['TAREA', 'GANADO']
+    proyectos_vistos = set(proyectos_visibles_para(usuario_id).filter(id__in=proyectos).values_list('id', flat=True)) if proyectos else set()
+    tareas_vistas = set(tareas_visibles_para(usuario_id).filter(id__in=tareas).values_list('id', flat=True)) if tareas else set()
+
+    pagina.bajas['proyectos'] |= por_tipo['PROYECTO', 'BORRADO'] | (por_tipo['PROYECTO', 'PERDIDO'] - proyectos_vistos)
+    pagina.bajas['tareas'] |= por_tipo['TAREA', 'BORRADO'] | (por_tipo['TAREA', 'PERDIDO'] - tareas_vistas)
+    pagina.bajas['etiquetas'] |= por_tipo['ETIQUETA', 'BORRADO']
+    pagina.bajas['historial'] |= por_tipo['HISTORIAL', 'BORRADO']
+
+    # Proyectos nuevos para el usuario: van completos. Proyectos perdidos: la
+    # baja arrastra sus tareas en el cliente, así que vuelven las que sigue viendo.
+    ganados = por_tipo['PROYECTO', 'GANADO'] & proyectos_vistos
+    if ganados:
+        pagina.agregar('proyectos', Proyecto.objects.filter(id__in=ganados).values(*CAMPOS['proyectos']))
+    reenviar = Q(id__in=por_tipo['TAREA', 'GANADO'] & tareas_vistas)
+    arrastrados = ganados | (por_tipo['PROYECTO', 'PERDIDO'] - proyectos_vistos)
+    if arrastrados:
+        reenviar |= Q(proyecto_id__in=arrastrados)
+    ids = list(tareas_visibles_para(usuario_id).filter(reenviar).values_list('id', flat=True))
+    if ids:
+        pagina.agregar('tareas', Tarea.objects.filter(id__in=ids).values(*CAMPOS['tareas']))
+        pagina.agregar('historial', HistorialAvance.objects.filter(tarea_id__in=ids).values(*CAMPOS['historial']))
+
+
+def pagina_de_cambios(usuario, cursor=None, limite=LIMITE):
+    """
+    Siguiente página de cambios para el usuario. Devuelve el dict de la
+    respuesta con `cursor` y `mas`. Lanza CursorInvalido si el cursor no es suyo
+    o fue alterado.
+    """
+    uid = usuario.id
+    datos = _leer_cursor(cursor, uid)
+    ahora = timezone.now()
+    desde = _fecha(datos['d'])
+    reinicio = bool(desde and desde < ahora - timedelta(days=RETENCION_DIAS))
+    if reinicio:
+        datos = {'d': None}
+        desde = None
+    hasta = _fecha(datos.get('h')) or ahora
+    fase = datos.get('f', 0)
+    ultima_fecha, ultimo_id = _fecha(datos.get('m')), datos.get('i', 0)
+
+    pagina = _Pagina()
+    restante = limite
+    while fase < len(FASES) and restante:
+        nombre = FASES[fase]
+        if nombre == 'accesos':
+            if desde is None:
+                # Descarga completa: no hay nada local que dar de baja
+                fase += 1
+                continue
+            filas = list(CambioSync.objects.filter(
+                Q(usuario_id=uid)
+                | Q(usuario=None, proyecto_id__in=proyectos_visibles_para(uid).values('id'))
+                | Q(usuario=None, proyecto=None),
+                fecha__gt=desde, fecha__lte=hasta, id__gt=ultimo_id,
+            ).order_by('id').values_list('id', 'modelo', 'objeto_id', 'tipo')[:restante])
+            _aplicar_accesos(pagina, uid, [f[1:] for f in filas])
+            if filas: ultimo_id = filas[-1][0]
+        else:
+            qs = _visibles(nombre, uid).filter(modificado__lte=hasta)
+            if desde: qs = qs.filter(modificado__gt=desde)
+            if ultima_fecha: qs = qs.filter(Q(modificado__gt=ultima_fecha) | Q(modificado=ultima_fecha, id__gt=ultimo_id))
+            filas = list(qs.order_by('modificado', 'id').values(*CAMPOS[nombre])[:restante])
+            pagina.agregar(nombre, filas)
+            if filas: ultima_fecha, ultimo_id = filas[-1]['modificado'], filas[-1]['id']
+
+        restante -= len(filas)
+        if restante:
+            fase, ultima_fecha, ultimo_id = fase + 1, None, 0
+
+    respuesta = pagina.completar()
+    if fase == len(FASES):
+        respuesta['cursor'] = _cursor(uid, d=(hasta - MARGEN).isoformat())
+    else:
+        respuesta['cursor'] = _cursor(
+            uid, d=desde.isoformat() if desde else None, h=hasta.isoformat(), f=fase,
+            m=ultima_fecha.isoformat() if ultima_fecha else None, i=ultimo_id,
+        )
+    respuesta['mas'] = fase < len(FASES)
+    respuesta['reinicio'] = reinicio
+    return respuesta
+
+
+# --- Registro de borrados y cambios de acceso ---
+def tocar(modelo, ids):
+    """Marca como modificados (para la sincronización) objetos cambiados sin save()."""
+    if ids:
+        modelo.objects.filter(id__in=list(ids)).update(modificado=timezone.now())
+
+
+def registrar_borrado_proyecto(proyecto_id, usuarios_ids):
+    """
+    Una baja por usuario que veía el proyecto (dueño, equipo, participantes de
+    sus tareas): al borrarse ya no hay membresía por la cual encontrarlos.
+    """
+    CambioSync.objects.bulk_create([
+        CambioSync(modelo='PROYECTO', objeto_id=proyecto_id, tipo='BORRADO', usuario_id=uid)
+        for uid in {u for u in usuarios_ids if u}
+    ])
+
+
+def _viene_de(origen, *modelos):
+    """`origin` de las señales de borrado es la instancia o el queryset que se borró."""
+    return isinstance(origen, modelos) or getattr(origen, 'model', None) in modelos
+
+
+@receiver(post_init, sender=Tarea)
+def _recordar_acceso(sender, instance, **kwargs):
+    d = instance.__dict__
+    instance._acceso_sync = (d.get('responsable_id', _NO_CARGADO), d.get('proyecto_id', _NO_CARGADO))
+
+
+@receiver(post_save, sender=Tarea)
+def _tarea_guardada(sender, instance, created, **kwargs):
+    responsable, proyecto = instance._acceso_sync
+    marcas = []
+    if not created:
+        base = {'modelo': 'TAREA', 'objeto_id': instance.pk}
+        if responsable is not _NO_CARGADO and responsable != instance.responsable_id:
+            if responsable: marcas.append(CambioSync(tipo='PERDIDO', usuario_id=responsable, **base))
+            if instance.responsable_id: marcas.append(CambioSync(tipo='GANADO', usuario_id=instance.responsable_id, **base))
+        if proyecto is not _NO_CARGADO and proyecto != instance.proyecto_id:
+            if proyecto: marcas.append(CambioSync(tipo='PERDIDO', proyecto_id=proyecto, **base))
+            if instance.proyecto_id: marcas.append(CambioSync(tipo='GANADO', proyecto_id=instance.proyecto_id, **base))
+    if marcas:
+        CambioSync.objects.bulk_create(marcas)
+    d = instance.__dict__
+    instance._acceso_sync = (d.get('responsable_id', _NO_CARGADO), d.get('proyecto_id', _NO_CARGADO))
+
+
+@receiver(pre_delete, sender=Tarea)
+def _tarea_por_borrar(sender, instance, origin=None, **kwargs):
+    if _viene_de(origin, Proyecto):
+        return  # La baja del proyecto ya la arrastra
+    # Los miembros del proyecto la reciben por el proyecto; los participantes, uno por uno
+    usuarios = {instance.usuario_id, instance.responsable_id} | set(
+        Tarea.compartida_con.through.objects.filter(tarea_id=instance.pk).values_list('user_id', flat=True)
+    )
+    marcas = [CambioSync(modelo='TAREA', objeto_id=instance.pk, tipo='BORRADO', usuario_id=u) for u in usuarios if u]
+    if instance.proyecto_id:
+        marcas.append(CambioSync(modelo='TAREA', objeto_id=instance.pk, tipo='BORRADO', proyecto_id=instance.proyecto_id))
+    CambioSync.objects.bulk_create(marcas)
+
+
+@receiver(pre_delete, sender=Proyecto)
+def _proyecto_por_borrar(sender, instance, **kwargs):
+    usuarios = usuarios_de_tareas(instance.tareas.all()) | {instance.usuario_id} | set(
+        Proyecto.equipo.through.objects.filter(proyecto_id=instance.pk).values_list('user_id', flat=True)
+    )
+    registrar_borrado_proyecto(instance.pk, usuarios)
+
+
+@receiver(pre_delete, sender=HistorialAvance)
+def _avance_por_borrar(sender, instance, origin=None, **kwargs):
+    # Solo los borrados sueltos (admin): en cascada los arrastra la baja de la tarea o del proyecto
+    if not _viene_de(origin, HistorialAvance):
+        return
+    tarea = Tarea.objects.filter(pk=instance.tarea_id).values('proyecto_id', 'usuario_id', 'responsable_id').first()
+    if not tarea:
+        return
+    usuarios = {tarea['usuario_id'], tarea['responsable_id']} | set(
+        Tarea.compartida_con.through.objects.filter(tarea_id=instance.tarea_id).values_list('user_id', flat=True)
+    )
+    marcas = [CambioSync(modelo='HISTORIAL', objeto_id=instance.pk, tipo='BORRADO', usuario_id=u) for u in usuarios if u]
+    if tarea['proyecto_id']:
+        marcas.append(CambioSync(modelo='HISTORIAL', objeto_id=instance.pk, tipo='BORRADO', proyecto_id=tarea['proyecto_id']))
+    CambioSync.objects.bulk_create(marcas)
+
+
+@receiver(post_delete, sender=Etiqueta)
+def _etiqueta_borrada(sender, instance, **kwargs):
+    # Puede estar en tareas de cualquiera: la baja va para todos (son solo ids)
+    CambioSync.objects.create(modelo='ETIQUETA', objeto_id=instance.pk, tipo='BORRADO')
+
+
+# Relaciones que dan acceso: (modelo, código, columna del objeto en la tabla intermedia)
+_ACCESO_M2M = {
+    Tarea.compartida_con.through: (Tarea, 'TAREA', 'tarea_id'),
+    Proyecto.equipo.through: (Proyecto, 'PROYECTO', 'proyecto_id'),
+}
+
+
+@receiver(m2m_changed, sender=Tarea.compartida_con.through)
+@receiver(m2m_changed, sender=Proyecto.equipo.through)
+def _acceso_cambiado(sender, instance, action, reverse, pk_set, **kwargs):
+    modelo, codigo, columna = _ACCESO_M2M[sender]
+    if action == 'pre_clear':
+        # clear() no informa pk_set: se guarda antes qué había
+        if reverse:
+            instance._previos_sync = set(sender.objects.filter(user_id=instance.pk).values_list(columna, flat=True))
+        else:
+            instance._previos_sync = set(sender.objects.filter(**{columna: instance.pk}).values_list('user_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    ids = pk_set if action != 'post_clear' else instance.__dict__.pop('_previos_sync', set())
+    if not ids:
+        return
+    # (objeto, usuario): en el sentido inverso instance es el User
+    pares = [(o, instance.pk) for o in ids] if reverse else [(instance.pk, u) for u in ids]
+    tipo = 'GANADO' if action == 'post_add' else 'PERDIDO'
+    tocar(modelo, {o for o, _ in pares})
+    CambioSync.objects.bulk_create([CambioSync(modelo=codigo, objeto_id=o, tipo=tipo, usuario_id=u) for o, u in pares])
+
+
+@receiver(m2m_changed, sender=Tarea.etiquetas.through)
+def _etiquetas_cambiadas(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._previos_sync = set(sender.objects.filter(etiqueta_id=instance.pk).values_list('tarea_id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            tocar(Tarea, {instance.pk})
+        else:
+            tocar(Tarea, pk_set if action != 'post_clear' else instance.__dict__.pop('_previos_sync', set()))
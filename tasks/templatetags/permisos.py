@@ -0,0 +1,23 @@
+from django import template
+
+from tasks import permisos
+
+register = template.Library()
+
+# Uso: {% load permisos %} ... {% if request|participa_en:tarea %}
+# Comparten la caché del request con las verificaciones hechas en la vista.
+
+
+@register.filter
+def participa_en(request, tarea):
+    return permisos.participa_en_tarea(request, tarea)
+
+
+@register.filter
+def es_miembro_de(request, proyecto):
+    return permisos.es_miembro_proyecto(request, proyecto)
+
+
+@register.filter
+def es_dueno_de(request, objeto):
+    return permisos.es_dueno(request, objeto)
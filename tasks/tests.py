@@ -1,3 +1,170 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import EventoTarea, HistorialAvance, Proyecto, Recurrencia, Tarea
+from .dependencias import agregar_dependencia, ruta_critica
+from .presupuesto import desviados
+from .recurrencia import crear_regla
+
+
+class BorradoConEventosTests(TestCase):
+    """Borrar un proyecto o un usuario no debe dejar eventos apuntando a un proyecto borrado."""
+
+    def setUp(self):
+        self.dueno = User.objects.create_user('dueno')
+        self.otro = User.objects.create_user('otro')
+        self.proyecto = Proyecto.objects.create(titulo='P', usuario=self.dueno)
+        self.ajeno = Proyecto.objects.create(titulo='Ajeno', usuario=self.otro)
+        for i in range(3):
+            Tarea.objects.create(titulo=f'T{i}', usuario=self.dueno, proyecto=self.proyecto, fecha_objetivo=date(2026, 12, 1))
+        # Tarea del dueño dentro de un proyecto que sobrevive al borrado del usuario
+        self.suelta = Tarea.objects.create(titulo='Suelta', usuario=self.dueno, proyecto=self.ajeno, fecha_objetivo=date(2026, 12, 1))
+
+    def test_borrar_proyecto(self):
+        self.proyecto.delete()
+        connection.check_constraints()
+        self.assertFalse(EventoTarea.objects.filter(proyecto_id=self.proyecto.pk).exists())
+
+    def test_borrar_usuario(self):
+        self.dueno.delete()
+        connection.check_constraints()
+        self.assertFalse(EventoTarea.objects.filter(proyecto_id=self.proyecto.pk).exists())
+        # El proyecto ajeno sí registra la baja de la tarea que se fue con el usuario
+        self.assertTrue(EventoTarea.objects.filter(proyecto=self.ajeno, tarea_id=self.suelta.pk, campo='BAJA').exists())
+
+    def test_borrar_usuarios_por_queryset(self):
+        # Como la acción "eliminar seleccionados" del admin
+        User.objects.filter(pk__in=[self.dueno.pk]).delete()
+        connection.check_constraints()
+        self.assertFalse(EventoTarea.objects.filter(proyecto_id=self.proyecto.pk).exists())
+        self.assertTrue(EventoTarea.objects.filter(proyecto=self.ajeno, tarea_id=self.suelta.pk, campo='BAJA').exists())
+
+    def test_borrar_tarea_registra_baja(self):
+        tarea = self.proyecto.tareas.first()
+        pk = tarea.pk
+        tarea.delete()
+        self.assertTrue(EventoTarea.objects.filter(proyecto=self.proyecto, tarea_id=pk, campo='BAJA').exists())
+
+
+class GastadoAcumuladoTests(TestCase):
+    """El total del proyecto sigue al historial sin pasar por conciliar_presupuestos."""
+
+    def setUp(self):
+        self.dueno = User.objects.create_user('dueno')
+        self.proyecto = Proyecto.objects.create(titulo='P', usuario=self.dueno, presupuesto=Decimal('100'))
+        self.otro = Proyecto.objects.create(titulo='Q', usuario=self.dueno, presupuesto=Decimal('100'))
+        self.tarea = Tarea.objects.create(titulo='T', usuario=self.dueno, proyecto=self.proyecto, fecha_objetivo=date(2026, 12, 1))
+        self.avance = HistorialAvance.objects.create(tarea=self.tarea, usuario=self.dueno, comentario='c', monto=Decimal('85'))
+
+    def gastado(self, proyecto):
+        proyecto.refresh_from_db()
+        return proyecto.gastado_acumulado
+
+    def test_alta_y_cambio_de_monto(self):
+        self.assertEqual(self.gastado(self.proyecto), Decimal('85'))
+        self.avance.monto = Decimal('60')
+        self.avance.save()
+        self.assertEqual(self.gastado(self.proyecto), Decimal('60'))
+
+    def test_borrar_reporte_y_tarea(self):
+        HistorialAvance.objects.create(tarea=self.tarea, usuario=self.dueno, comentario='d', monto=Decimal('5'))
+        self.avance.delete()
+        self.assertEqual(self.gastado(self.proyecto), Decimal('5'))
+        self.tarea.delete()
+        self.assertEqual(self.gastado(self.proyecto), Decimal('0'))
+        self.assertEqual(desviados(), [])
+
+    def test_borrar_usuario_que_reporto(self):
+        miembro = User.objects.create_user('miembro')
+        self.avance.monto = Decimal('10')
+        self.avance.save()
+        HistorialAvance.objects.create(tarea=self.tarea, usuario=miembro, comentario='m', monto=Decimal('75'))
+        HistorialAvance.objects.create(tarea=self.tarea, usuario=miembro, comentario='n', monto=Decimal('5'))
+        self.assertEqual(self.gastado(self.proyecto), Decimal('90'))
+        self.assertEqual(self.proyecto.umbrales_avisados, [80])
+        miembro.delete()
+        self.assertEqual(self.gastado(self.proyecto), Decimal('10'))
+        self.assertEqual(self.proyecto.umbrales_avisados, [])
+        self.assertEqual(desviados(), [])
+
+    def test_borrar_dueno_con_tareas_en_proyecto_ajeno(self):
+        # Sus reportes y las tareas que creó se van en la misma cascada: se resta una sola vez
+        ajeno = User.objects.create_user('ajeno')
+        proyecto = Proyecto.objects.create(titulo='R', usuario=ajeno, presupuesto=Decimal('100'))
+        tarea = Tarea.objects.create(titulo='T2', usuario=self.dueno, proyecto=proyecto, fecha_objetivo=date(2026, 12, 1))
+        HistorialAvance.objects.create(tarea=tarea, usuario=ajeno, comentario='a', monto=Decimal('30'))
+        HistorialAvance.objects.create(tarea=tarea, usuario=self.dueno, comentario='b', monto=Decimal('20'))
+        self.dueno.delete()
+        self.assertEqual(self.gastado(proyecto), Decimal('0'))
+        self.assertEqual(desviados(), [])
+
+    def test_mover_tarea_de_proyecto(self):
+        self.tarea.proyecto = self.otro
+        self.tarea.save()
+        self.assertEqual(self.gastado(self.proyecto), Decimal('0'))
+        self.assertEqual(self.gastado(self.otro), Decimal('85'))
+        self.assertEqual(desviados(), [])
+
+
+class RutaCriticaTests(TestCase):
+    """La ruta crítica del detalle del proyecto no hace una consulta por paso de la cadena."""
+
+    def setUp(self):
+        self.dueno = User.objects.create_user('dueno')
+
+    def cadena(self, largo):
+        proyecto = Proyecto.objects.create(titulo=f'P{largo}', usuario=self.dueno)
+        # Cada tarea depende de la anterior, que vence más tarde: la primera fija el fin
+        tareas = [Tarea.objects.create(titulo=f'T{i}', usuario=self.dueno, proyecto=proyecto,
+                                       fecha_objetivo=date(2026, 12, 1) + timedelta(days=largo - i)) for i in range(largo)]
+        for requisito, tarea in zip(tareas, tareas[1:]):
+            agregar_dependencia(tarea, requisito)
+        return proyecto, tareas
+
+    def test_consultas_fijas_y_camino(self):
+        for largo in (3, 8):
+            proyecto, tareas = self.cadena(largo)
+            with self.assertNumQueries(4):
+                ruta = ruta_critica(proyecto)
+            self.assertEqual(ruta['tareas'], tareas)
+            self.assertEqual(ruta['fin_proyectado'], tareas[0].fecha_objetivo)
+
+
+class EdicionRecurrenteTests(TestCase):
+    """Mover fechas de una tarea que se repite no choca con ocurrencia_unica_por_fecha."""
+
+    def setUp(self):
+        self.dueno = User.objects.create_user('dueno')
+        self.proyecto = Proyecto.objects.create(titulo='P', usuario=self.dueno)
+        self.inicio = timezone.now().date() + timedelta(days=1)
+        self.original = Tarea.objects.create(titulo='Semanal', usuario=self.dueno, proyecto=self.proyecto, fecha_objetivo=self.inicio)
+        self.regla = Recurrencia(frecuencia='SEMANAL', intervalo=1)
+        crear_regla(self.original, self.regla)
+        self.client.force_login(self.dueno)
+
+    def editar(self, tarea, fecha, **extra):
+        datos = {'titulo': tarea.titulo, 'proyecto': self.proyecto.pk, 'costo': '0', 'estado': 'PENDIENTE',
+                 'fecha_objetivo': fecha.isoformat(), **extra}
+        return self.client.post(reverse('editar_tarea', args=[tarea.pk]), datos)
+
+    def test_posponer_original_una_semana(self):
+        nueva = self.inicio + timedelta(days=7)
+        respuesta = self.editar(self.original, nueva, **{'rec-frecuencia': 'SEMANAL', 'rec-intervalo': '1'})
+        self.assertEqual(respuesta.status_code, 302)
+        self.original.refresh_from_db()
+        self.assertEqual(self.original.fecha_objetivo, nueva)
+        fechas = list(self.regla.ocurrencias.values_list('fecha_objetivo', flat=True))
+        self.assertTrue(fechas)
+        self.assertEqual(min(fechas), nueva + timedelta(days=7))
 
-# Create your tests here.
+    def test_ocurrencia_sobre_la_fecha_de_otra(self):
+        primera, segunda = self.regla.ocurrencias.order_by('fecha_objetivo')[:2]
+        respuesta = self.editar(primera, segunda.fecha_objetivo)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('fecha_objetivo', respuesta.context['form'].errors)
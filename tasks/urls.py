@@ -4,14 +4,28 @@ from . import views
 urlpatterns = [
     # 1. RUTAS PRINCIPALES
     path('tablero/', views.home, name='home'),
+    path('tablero/vistas/guardar/', views.guardar_vista, name='guardar_vista'),
+    path('tablero/vistas/<int:pk>/eliminar/', views.eliminar_vista, name='eliminar_vista'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('actividad/', views.actividad, name='actividad'),
+    path('notificaciones/', views.notificaciones, name='notificaciones'),
+    path('notificaciones/marcar-leidas/', views.marcar_notificaciones_leidas, name='marcar_notificaciones_leidas'),
+    path('notificaciones/<int:pk>/', views.abrir_notificacion, name='abrir_notificacion'),
+    path('calendario/', views.calendario, name='calendario'),
+    path('calendario/regenerar-enlace/', views.regenerar_token_calendario, name='regenerar_token_calendario'),
+    path('calendario/<str:token>.ics', views.feed_calendario, name='feed_calendario'),
     
     # 2. PROYECTOS (ASANA)
     path('proyectos/', views.lista_proyectos, name='lista_proyectos'),
     path('crear-proyecto/', views.crear_proyecto, name='crear_proyecto'),
     path('proyecto/<int:pk>/', views.detalle_proyecto, name='detalle_proyecto'),
+    path('proyecto/<int:pk>/kanban/', views.tablero_kanban, name='tablero_kanban'),
+    path('kanban/mover/<int:pk>/', views.mover_tarjeta, name='mover_tarjeta'),
     path('proyecto/editar/<int:pk>/', views.editar_proyecto, name='editar_proyecto'),
     path('proyecto/eliminar/<int:pk>/', views.eliminar_proyecto, name='eliminar_proyecto'),
+    path('proyecto/duplicar/<int:pk>/', views.duplicar_proyecto, name='duplicar_proyecto'),
+    path('proyecto/guardar-plantilla/<int:pk>/', views.guardar_plantilla, name='guardar_plantilla'),
+    path('plantilla/<int:pk>/', views.usar_plantilla, name='usar_plantilla'),
 
     # 3. OPERACIONES TÁCTICAS
     path('crear-tarea/', views.crear_tarea, name='crear_tarea'),
@@ -19,6 +33,8 @@ urlpatterns = [
     path('editar-tarea/<int:pk>/', views.editar_tarea, name='editar_tarea'),
     path('eliminar-tarea/<int:pk>/', views.eliminar_tarea, name='eliminar_tarea'),
     path('tarea/<int:pk>/detalle/', views.detalle_tarea, name='detalle_tarea'),
+    path('tarea/<int:pk>/dependencias/', views.agregar_requisito, name='agregar_requisito'),
+    path('tarea/<int:pk>/dependencias/<int:requisito_pk>/quitar/', views.quitar_requisito, name='quitar_requisito'),
     
     # 4. ACCIONES
     path('cambiar-estado/<int:pk>/<str:nuevo_estado>/', views.cambiar_estado, name='cambiar_estado'),
@@ -27,6 +43,11 @@ urlpatterns = [
     # 5. SISTEMA
     path('perfil/', views.perfil, name='perfil'),
     path('exportar-csv/', views.exportar_csv, name='exportar_csv'),
+    path('exportar-respaldo/', views.exportar_respaldo, name='exportar_respaldo'),
+    path('reporte-costos/', views.reporte_costos, name='reporte_costos'),
+    path('importar-tareas/', views.importar_tareas, name='importar_tareas'),
     path('signup/', views.signup, name='signup'),
     path('api/buscar-usuarios/', views.buscar_usuarios, name='buscar_usuarios'),
+    path('api/sync/', views.sync_cambios, name='sync_cambios'),
+    path('api/sync/avances/', views.sync_avances, name='sync_avances'),
 ]
\ No newline at end of file
@@ -1,6 +1,10 @@
 import csv
+import io
+import json
+from itertools import islice
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404
 from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth import login
@@ -11,9 +15,31 @@ from django.contrib.auth.models import User
 from django.core.mail import send_mail
 from django.conf import settings
 from django.core.paginator import Paginator
-from datetime import timedelta # <--- NECESARIO PARA EL RADAR DE FECHAS
-from .models import Tarea, HistorialAvance, Perfil, Etiqueta, Proyecto
-from .forms import TareaForm, HistorialForm, PerfilUpdateForm, EtiquetaForm, ProyectoForm, UserUpdateForm
+from datetime import timedelta, date # <--- NECESARIO PARA EL RADAR DE FECHAS
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, urlencode
+from django.views.decorators.http import require_POST
+from .models import Tarea, HistorialAvance, Perfil, Etiqueta, Proyecto, PlantillaProyecto, Actividad, Recurrencia, Notificacion, VistaGuardada
+from .forms import TareaForm, HistorialForm, PerfilUpdateForm, EtiquetaForm, ProyectoForm, UserUpdateForm, ImportarTareasForm, InstanciarProyectoForm, DependenciaForm, RecurrenciaForm, ReporteCostosForm, VistaGuardadaForm
+from .importacion import ImportadorTareas, ENCABEZADOS, fila_exportacion, detectar_formato
+from .plantillas import guardar_como_plantilla, instanciar, clonar_proyecto
+from .eliminacion import borrar_proyecto
+from .permisos import es_dueno, es_miembro_proyecto, participa_en_tarea, puede_ver_tarea, proyectos_visibles_para
+from .actividad import registrar_actividad
+from . import calendario as cal
+from .dependencias import agregar_dependencia, quitar_dependencia, ruta_critica
+from django.core.exceptions import ValidationError
+from django.db import transaction, IntegrityError
+from .kanban import ORDEN_COLUMNA, calcular_rango
+from .recurrencia import CAMPOS_COPIADOS, crear_regla, descartar_no_iniciadas, regenerar, quitar_regla
+from .eventos import datos_graficos
+from .sincronizacion import CursorInvalido, LIMITE, LIMITE_MAXIMO, pagina_de_cambios
+from . import notificaciones as avisos
+from .costos import filas_reporte
+from . import adjuntos
+from . import respaldo
+from . import presupuesto
+from .facetas import facetas, filtros_de, tareas_de
 
 # --- API BUSCADOR ---
 @login_required
@@ -97,13 +123,14 @@ def crear_proyecto(request):
             messages.success(request, 'Proyecto iniciado correctamente.')
             return redirect('detalle_proyecto', pk=p.id)
     else: form = ProyectoForm()
-    return render(request, 'tasks/formulario_proyecto.html', {'form': form, 'titulo': 'Nuevo Proyecto'})
+    plantillas = PlantillaProyecto.objects.filter(usuario=request.user).order_by('-creado_el')
+    return render(request, 'tasks/formulario_proyecto.html', {'form': form, 'titulo': 'Nuevo Proyecto', 'plantillas': plantillas})
 
 @login_required
 def detalle_proyecto(request, pk):
     proyecto = get_object_or_404(Proyecto, id=pk)
     # Seguridad: Solo dueño o equipo entra
-    if proyecto.usuario != request.user and request.user not in proyecto.equipo.all():
+    if not es_miembro_proyecto(request, proyecto):
         messages.error(request, 'Acceso denegado: Zona restringida.')
         return redirect('lista_proyectos')
 
@@ -114,15 +141,80 @@ def detalle_proyecto(request, pk):
         'tareas': tareas,
         'gastado': proyecto.presupuesto_gastado(),
         'restante': proyecto.presupuesto_restante(),
-        'avance': proyecto.porcentaje_avance()
+        'avance': proyecto.porcentaje_avance(),
+        'ruta': ruta_critica(proyecto),
+        # Precalculado por `actualizar_instantaneas`: aquí solo se leen las filas diarias
+        'graficos': datos_graficos(proyecto),
     }
     return render(request, 'tasks/detalle_proyecto.html', contexto)
 
+# --- TABLERO KANBAN ---
+@login_required
+def tablero_kanban(request, pk):
+    proyecto = get_object_or_404(Proyecto, id=pk)
+    if not es_miembro_proyecto(request, proyecto):
+        messages.error(request, 'Acceso denegado: Zona restringida.')
+        return redirect('lista_proyectos')
+
+    # Qué tarjetas puede arrastrar: las mismas reglas que cambiar_estado, sin una consulta por tarjeta
+    uid = request.user.id
+    compartidas = set(Tarea.compartida_con.through.objects.filter(
+        user_id=uid, tarea__proyecto=proyecto
+    ).values_list('tarea_id', flat=True))
+    dueno = es_dueno(request, proyecto)
+
+    columnas = {clave: [] for clave, _ in Tarea.ESTADOS}
+    for t in proyecto.tareas.select_related('responsable').order_by('estado', *ORDEN_COLUMNA):
+        t.movible = dueno or uid in (t.usuario_id, t.responsable_id) or t.id in compartidas
+        columnas[t.estado].append(t)
+
+    contexto = {
+        'proyecto': proyecto,
+        'columnas': [(clave, nombre, columnas[clave]) for clave, nombre in Tarea.ESTADOS],
+    }
+    return render(request, 'tasks/kanban.html', contexto)
+
+@login_required
+@require_POST
+def mover_tarjeta(request, pk):
+    """
+    JSON: {"estado": ..., "antes": id|null, "despues": id|null}, con las
+    tarjetas vecinas en la columna destino. Escribe una sola fila.
+    """
+    t = get_object_or_404(Tarea.objects.select_related('proyecto'), id=pk)
+    if t.proyecto is None or not (participa_en_tarea(request, t) or es_dueno(request, t.proyecto)):
+        return JsonResponse({'error': 'No puede mover esta tarea.'}, status=403)
+    try:
+        datos = json.loads(request.body)
+        estado = datos.get('estado') or t.estado
+        antes = int(datos['antes']) if datos.get('antes') else None
+        despues = int(datos['despues']) if datos.get('despues') else None
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Solicitud inválida.'}, status=400)
+    if estado not in dict(Tarea.ESTADOS):
+        return JsonResponse({'error': 'Estado inválido.'}, status=400)
+
+    with transaction.atomic():
+        try:
+            t.rango = calcular_rango(t, estado, antes, despues)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=409)
+        campos = ['rango']
+        estado_anterior = t.estado
+        if estado != estado_anterior:
+            t.estado = estado
+            t.fecha_cierre = timezone.now().date() if estado == 'COMPLETADA' else None
+            campos += ['estado', 'fecha_cierre', 'modificado']
+        t.save(update_fields=campos)
+        if estado != estado_anterior:
+            registrar_actividad(t, request.user, 'ESTADO', f"Estado: {t.get_estado_display()}")
+    return JsonResponse({'id': t.id, 'estado': t.estado, 'rango': t.rango})
+
 @login_required
 def editar_proyecto(request, pk):
     proyecto = get_object_or_404(Proyecto, id=pk)
     # Seguridad: Solo el dueño edita el proyecto
-    if proyecto.usuario != request.user:
+    if not es_dueno(request, proyecto):
         messages.error(request, "Solo el Comandante (Creador) puede modificar el proyecto.")
         return redirect('detalle_proyecto', pk=pk)
 
@@ -130,6 +222,8 @@ def editar_proyecto(request, pk):
         form = ProyectoForm(request.POST, instance=proyecto)
         if form.is_valid():
             form.save()
+            if {'presupuesto', 'umbrales_alerta'} & set(form.changed_data):
+                presupuesto.reevaluar(proyecto.id)
             messages.success(request, 'Proyecto actualizado.')
             return redirect('detalle_proyecto', pk=pk)
     else: form = ProyectoForm(instance=proyecto)
@@ -138,14 +232,60 @@ def editar_proyecto(request, pk):
 @login_required
 def eliminar_proyecto(request, pk):
     proyecto = get_object_or_404(Proyecto, id=pk)
-    if proyecto.usuario != request.user: return redirect('lista_proyectos')
+    if not es_dueno(request, proyecto): return redirect('lista_proyectos')
     
     if request.method == 'POST':
-        proyecto.delete()
+        # Borrado por conjuntos: no carga tareas/historial en memoria y deja los adjuntos en cola
+        borrar_proyecto(proyecto)
         messages.success(request, 'Proyecto desmantelado.')
         return redirect('lista_proyectos')
     return render(request, 'tasks/eliminar_generico.html', {'objeto': proyecto, 'tipo': 'Proyecto', 'cancel_url': 'lista_proyectos'})
 
+# --- PLANTILLAS Y DUPLICADO DE PROYECTOS ---
+@login_required
+def guardar_plantilla(request, pk):
+    proyecto = get_object_or_404(Proyecto, id=pk)
+    if not es_dueno(request, proyecto) or request.method != 'POST':
+        return redirect('detalle_proyecto', pk=pk)
+    guardar_como_plantilla(proyecto, request.user)
+    messages.success(request, 'Plantilla guardada. Disponible al crear un nuevo proyecto.')
+    return redirect('detalle_proyecto', pk=pk)
+
+@login_required
+def duplicar_proyecto(request, pk):
+    proyecto = get_object_or_404(Proyecto, id=pk)
+    if not es_dueno(request, proyecto):
+        messages.error(request, "Solo el Comandante (Creador) puede duplicar el proyecto.")
+        return redirect('detalle_proyecto', pk=pk)
+
+    if request.method == 'POST':
+        form = InstanciarProyectoForm(request.POST)
+        if form.is_valid():
+            nuevo = clonar_proyecto(proyecto, request.user, form.cleaned_data['titulo'], form.cleaned_data['fecha_inicio'])
+            messages.success(request, 'Proyecto duplicado correctamente.')
+            return redirect('detalle_proyecto', pk=nuevo.id)
+    else:
+        form = InstanciarProyectoForm(initial={'titulo': f"{proyecto.titulo} (copia)", 'fecha_inicio': timezone.now().date()})
+    return render(request, 'tasks/instanciar_proyecto.html', {'form': form, 'origen': proyecto.titulo, 'total_tareas': proyecto.tareas.count()})
+
+@login_required
+def usar_plantilla(request, pk):
+    plantilla = get_object_or_404(PlantillaProyecto, id=pk, usuario=request.user)
+
+    if request.method == 'POST':
+        if 'eliminar' in request.POST:
+            plantilla.delete()
+            messages.success(request, 'Plantilla eliminada.')
+            return redirect('crear_proyecto')
+        form = InstanciarProyectoForm(request.POST)
+        if form.is_valid():
+            nuevo = instanciar(plantilla.datos, request.user, form.cleaned_data['titulo'], form.cleaned_data['fecha_inicio'])
+            messages.success(request, 'Proyecto creado desde plantilla.')
+            return redirect('detalle_proyecto', pk=nuevo.id)
+    else:
+        form = InstanciarProyectoForm(initial={'titulo': plantilla.nombre, 'fecha_inicio': timezone.now().date()})
+    return render(request, 'tasks/instanciar_proyecto.html', {'form': form, 'origen': plantilla.nombre, 'total_tareas': plantilla.total_tareas(), 'plantilla': plantilla})
+
 # --- DASHBOARD & OPERACIONES ---
 # tasks/views.py
 
@@ -153,12 +293,8 @@ def eliminar_proyecto(request, pk):
 
 @login_required
 def home(request):
-    # 1. Base de operaciones
-    misiones = Tarea.objects.filter(
-        Q(usuario=request.user) | 
-        Q(compartida_con=request.user) | 
-        Q(responsable=request.user)
-    ).distinct()
+    # 1. Base de operaciones (propias, compartidas o como responsable; sin DISTINCT)
+    misiones = tareas_de(request.user.id)
     
     # 2. Captura de parámetros (AHORA SON INDEPENDIENTES)
     search = request.GET.get('search', '')
@@ -211,9 +347,46 @@ def home(request):
         'status_filter': status_filter, 
         'time_filter': time_filter, # <--- Enviamos esto al HTML
         'ownership_filter': ownership, 
-        'hoy': hoy
+        'hoy': hoy,
+        # Conteos de cada botón (una consulta, cacheada por usuario) y vistas guardadas
+        'facetas': facetas(request.user.id, hoy),
+        'vistas': request.user.vistas_guardadas.all(),
+        'filtros_actuales': filtros_de(request.GET),
+        'vista_form': VistaGuardadaForm(),
     })
 
+MAXIMO_VISTAS = 20
+
+@login_required
+@require_POST
+def guardar_vista(request):
+    filtros = filtros_de(request.POST)
+    destino = reverse('home') + ('?' + urlencode(filtros) if filtros else '')
+    vista = VistaGuardada(usuario=request.user, filtros=filtros)
+    form = VistaGuardadaForm(request.POST, instance=vista)
+    if request.user.vistas_guardadas.count() >= MAXIMO_VISTAS:
+        messages.error(request, f'Puede guardar hasta {MAXIMO_VISTAS} vistas. Elimine alguna primero.')
+    elif not filtros:
+        messages.error(request, 'Aplique algún filtro antes de guardar la vista.')
+    elif form.is_valid():
+        try:
+            with transaction.atomic():
+                form.save()
+            messages.success(request, f'Vista "{vista.nombre}" guardada.')
+        except IntegrityError:
+            messages.error(request, f'Ya tiene una vista llamada "{vista.nombre}".')
+    else:
+        messages.error(request, 'Indique un nombre para la vista.')
+    return redirect(destino)
+
+@login_required
+@require_POST
+def eliminar_vista(request, pk):
+    vista = get_object_or_404(VistaGuardada, pk=pk, usuario=request.user)
+    vista.delete()
+    messages.success(request, f'Vista "{vista.nombre}" eliminada.')
+    return redirect('home')
+
 @login_required
 def dashboard(request):
     # 1. BASE DE DATOS
@@ -243,8 +416,9 @@ def dashboard(request):
     
     # 4. FINANZAS GLOBALES (Solo Proyectos Propios)
     proyectos_propios = Proyecto.objects.filter(usuario=request.user)
-    total_presupuesto = proyectos_propios.aggregate(Sum('presupuesto'))['presupuesto__sum'] or 0
-    total_gastado = HistorialAvance.objects.filter(tarea__proyecto__in=proyectos_propios).aggregate(Sum('monto'))['monto__sum'] or 0
+    finanzas = proyectos_propios.aggregate(total_presupuesto=Sum('presupuesto'), total_gastado=Sum('gastado_acumulado'))
+    total_presupuesto = finanzas['total_presupuesto'] or 0
+    total_gastado = finanzas['total_gastado'] or 0
 
     # 5. --- NUEVO: RADAR DE VENCIMIENTOS (Próximos 7 días) ---
     hoy = timezone.now().date()
@@ -254,10 +428,10 @@ def dashboard(request):
     ).exclude(estado='COMPLETADA').order_by('fecha_objetivo')[:5]
 
     # 6. --- NUEVO: BITÁCORA EN VIVO (Últimos 5 movimientos) ---
-    # Traemos historial de MIS tareas o tareas compartidas conmigo
-    ultimos_movimientos = HistorialAvance.objects.filter(
-        tarea__in=mis_misiones
-    ).order_by('-fecha')[:5]
+    # Leemos el feed ya repartido al usuario (rango sobre el índice usuario/fecha)
+    ultimos_movimientos = Actividad.objects.filter(
+        usuario=request.user
+    ).select_related('autor__perfil', 'tarea')[:5]
 
     # 7. --- NUEVO: DETALLE DE PROYECTOS (Para la tabla) ---
     # Calculamos datos al vuelo para mostrarlos en la tabla
@@ -297,6 +471,142 @@ def dashboard(request):
     }
     return render(request, 'tasks/dashboard.html', contexto)
 
+@login_required
+def actividad(request):
+    movimientos = Actividad.objects.filter(usuario=request.user).select_related('autor__perfil', 'tarea')
+    paginator = Paginator(movimientos, 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'tasks/actividad.html', {'movimientos': page_obj})
+
+# --- REPORTE DE COSTOS ---
+FILAS_EN_PANTALLA = 1000  # Más que esto se descarga en CSV
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+    def write(self, valor):
+        return valor
+
+@login_required
+def reporte_costos(request):
+    visibles = Proyecto.objects.filter(id__in=proyectos_visibles_para(request.user.id).values('id'))
+    form = ReporteCostosForm(request.GET or None, proyectos=visibles)
+    if not form.is_bound or not form.is_valid():
+        return render(request, 'tasks/reporte_costos.html', {'form': form})
+
+    datos = form.cleaned_data
+    filas = filas_reporte(
+        request.user.id, desde=datos['desde'], hasta=datos['hasta'],
+        proyectos=list(datos['proyectos']), con_tareas=datos['tareas'],
+    )
+    if request.GET.get('exportar') == 'csv':
+        w = csv.writer(_Eco())
+        def lineas():
+            yield w.writerow(['Nivel', 'Proyecto', 'Responsable', 'Mes', 'Tarea', 'Tareas', 'Estimado', 'Gastado', 'Desvío', 'Desvío %'])
+            for f in filas:
+                yield w.writerow([
+                    f['nivel'], f['proyecto'] or '', f['responsable'] or '',
+                    f['mes'].strftime('%Y-%m') if f['mes'] else '', f['tarea'] or '',
+                    f['tareas'], f['estimado'], f['gastado'], f['desvio'],
+                    '' if f['porcentaje'] is None else f['porcentaje'],
+                ])
+        r = StreamingHttpResponse(lineas(), content_type='text/csv')
+        r['Content-Disposition'] = 'attachment; filename="desvio_costos.csv"'
+        return r
+
+    # En pantalla se corta; el total general va siempre al final del CSV
+    filas = list(islice(filas, FILAS_EN_PANTALLA + 1))
+    recortado = len(filas) > FILAS_EN_PANTALLA
+    return render(request, 'tasks/reporte_costos.html', {
+        'form': form, 'filas': filas[:FILAS_EN_PANTALLA], 'recortado': recortado,
+        'limite': FILAS_EN_PANTALLA, 'consulta': request.GET.urlencode(),
+    })
+
+# --- ARCHIVOS SUBIDOS ---
+@login_required
+def archivo_subido(request, ruta):
+    if not adjuntos.puede_descargar(request.user.id, ruta):
+        raise Http404
+    return adjuntos.servir(request, ruta)
+
+# --- NOTIFICACIONES ---
+@login_required
+def notificaciones(request):
+    bandeja = Notificacion.objects.filter(usuario=request.user).select_related('autor__perfil')
+    paginator = Paginator(bandeja, 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'tasks/notificaciones.html', {'avisos': page_obj})
+
+@login_required
+@require_POST
+def marcar_notificaciones_leidas(request):
+    avisos.marcar_todas(request.user.id)
+    return redirect('notificaciones')
+
+@login_required
+def abrir_notificacion(request, pk):
+    aviso = get_object_or_404(Notificacion, pk=pk, usuario=request.user)
+    avisos.marcar_leida(aviso)
+    if aviso.tipo == 'PRESUPUESTO': return redirect('dashboard')
+    if aviso.tarea_id: return redirect('detalle_tarea', pk=aviso.tarea_id)
+    if aviso.tipo == 'TRASPASO': return redirect('home')
+    messages.error(request, 'La tarea de este aviso ya no existe.')
+    return redirect('notificaciones')
+
+# --- CALENDARIO ---
+@login_required
+def calendario(request):
+    hoy = timezone.now().date()
+    try:
+        anio, mes = (int(x) for x in request.GET.get('mes', '').split('-'))
+        primero = date(anio, mes, 1)
+    except ValueError:
+        primero = hoy.replace(day=1)
+    anterior = (primero - timedelta(days=1)).replace(day=1)
+    siguiente = (primero + timedelta(days=32)).replace(day=1)
+
+    return render(request, 'tasks/calendario.html', {
+        'semanas': cal.semanas_del_mes(primero.year, primero.month, request.user.id),
+        'primero': primero,
+        'anterior': anterior,
+        'siguiente': siguiente,
+        'hoy': hoy,
+        'url_feed': request.build_absolute_uri(reverse('feed_calendario', args=[cal.token_de(request.user)])),
+    })
+
+@login_required
+@require_POST
+def regenerar_token_calendario(request):
+    cal.regenerar_token(request.user)
+    messages.success(request, 'Enlace del calendario regenerado. Actualiza la suscripción en tu aplicación.')
+    return redirect('calendario')
+
+def feed_calendario(request, token):
+    # Sin sesión: las apps de calendario se autentican solo con el token de la URL
+    perfil = Perfil.objects.filter(token_calendario=token).select_related('usuario').first()
+    if perfil is None:
+        raise Http404
+
+    usuario = perfil.usuario
+    firma, ultima = cal.firma_feed(usuario.id)
+    etag = f'"cal-{usuario.id}-{firma}"'
+    no_modificado = get_conditional_response(request, etag=etag, last_modified=ultima)
+    if no_modificado is not None:
+        return no_modificado
+
+    cacheado = cal.ics_cacheado(usuario.id, firma)
+    if cacheado is not None:
+        respuesta = HttpResponse(cacheado, content_type='text/calendar; charset=utf-8')
+    else:
+        partes = cal.generar_ics(usuario, ultima, request.build_absolute_uri('/').rstrip('/'))
+        respuesta = StreamingHttpResponse(
+            cal.guardando_en_cache(partes, usuario.id, firma), content_type='text/calendar; charset=utf-8'
+        )
+    respuesta['ETag'] = etag
+    respuesta['Last-Modified'] = http_date(ultima)
+    respuesta['Cache-Control'] = 'private, max-age=300'
+    respuesta['Content-Disposition'] = 'inline; filename="uptask.ics"'
+    return respuesta
+
 @login_required
 def crear_tarea(request):
     pid = request.GET.get('proyecto_id')
@@ -304,12 +614,16 @@ def crear_tarea(request):
     
     if request.method == 'POST':
         form = TareaForm(request.POST, user=request.user, proyecto_vinculado=p_obj)
-        if form.is_valid():
+        form_rec = RecurrenciaForm(request.POST, prefix='rec')
+        if form.is_valid() and form_rec.is_valid():
             t = form.save(commit=False)
             t.usuario = request.user
             if p_obj: t.proyecto = p_obj
             t.save()
             form.save_m2m()
+            if form_rec.cleaned_data['frecuencia']:
+                crear_regla(t, form_rec.save(commit=False))
+            avisos.notificar(avisos.participantes(t), request.user, t, 'ASIGNACION', f"@{request.user.username} te asignó: {t.titulo}")
             
             # Notificar por correo
             destinatarios = [u.email for u in t.compartida_con.all() if u.email]
@@ -330,35 +644,70 @@ def crear_tarea(request):
     else:
         initial = {'proyecto': p_obj} if p_obj else {}
         form = TareaForm(user=request.user, proyecto_vinculado=p_obj, initial=initial)
-    return render(request, 'tasks/formulario_tarea.html', {'form': form, 'titulo_pagina': 'Nueva Tarea', 'proyecto_id': pid})
+        form_rec = RecurrenciaForm(prefix='rec')
+    return render(request, 'tasks/formulario_tarea.html', {'form': form, 'form_rec': form_rec, 'titulo_pagina': 'Nueva Tarea', 'proyecto_id': pid})
 
 @login_required
 def editar_tarea(request, pk):
     t = get_object_or_404(Tarea, id=pk)
     
     # --- SEGURIDAD: SOLO EL DUEÑO EDITA ---
-    if t.usuario != request.user:
+    if not es_dueno(request, t):
         messages.error(request, "Solo el Comandante (Creador) puede modificar las órdenes.")
         # Redirigimos al colaborador a la pantalla de reporte
         return redirect('reportar_avance', pk=pk)
 
+    # La repetición se edita en la tarea original; las ocurrencias generadas se editan sueltas
+    regla = Recurrencia.objects.filter(origen=t).first()
+    es_ocurrencia = t.recurrencia_id is not None
+
     if request.method == 'POST':
+        estado_anterior = t.estado
+        asignados_antes = avisos.participantes(t)
         form = TareaForm(request.POST, instance=t, user=request.user, proyecto_vinculado=t.proyecto)
-        if form.is_valid():
-            form.save()
-            messages.success(request, 'Órdenes actualizadas.')
-            if t.proyecto: return redirect('detalle_proyecto', pk=t.proyecto.id)
-            return redirect('home')
+        form_rec = RecurrenciaForm(request.POST, instance=regla, prefix='rec')
+        if form.is_valid() and (es_ocurrencia or form_rec.is_valid()):
+            rehacer = (not es_ocurrencia and regla is not None and form_rec.cleaned_data['frecuencia']
+                       and (form_rec.has_changed() or set(form.changed_data) & {'fecha_objetivo', *CAMPOS_COPIADOS}))
+            try:
+                with transaction.atomic():
+                    # Las ocurrencias no iniciadas se van antes de mover la fecha, así no chocan con la nueva
+                    if rehacer: descartar_no_iniciadas(regla)
+                    form.save()
+            except IntegrityError:
+                # Otra ocurrencia de la misma repetición tomó esa fecha entre la validación y el guardado
+                form.add_error('fecha_objetivo', 'Ya hay otra ocurrencia de esta repetición en esa fecha.')
+            else:
+                # Solo a quienes se suman como responsable o colaborador
+                avisos.notificar(avisos.participantes(t) - asignados_antes, request.user, t, 'ASIGNACION', f"@{request.user.username} te asignó: {t.titulo}")
+                if estado_anterior != t.estado:
+                    registrar_actividad(t, request.user, 'ESTADO', f"Estado: {t.get_estado_display()}")
+                if not es_ocurrencia:
+                    if not form_rec.cleaned_data['frecuencia']:
+                        if regla: quitar_regla(regla)
+                    elif regla is None:
+                        crear_regla(t, form_rec.save(commit=False))
+                    elif rehacer:
+                        # Solo se rehacen las ocurrencias no iniciadas
+                        regenerar(form_rec.save())
+                messages.success(request, 'Órdenes actualizadas.')
+                if t.proyecto: return redirect('detalle_proyecto', pk=t.proyecto.id)
+                return redirect('home')
     else:
         form = TareaForm(instance=t, user=request.user, proyecto_vinculado=t.proyecto)
+        form_rec = RecurrenciaForm(instance=regla, prefix='rec')
     
     resp_init = {'id': t.responsable.id, 'text': f"@{t.responsable.username}"} if t.responsable else None
-    return render(request, 'tasks/formulario_tarea.html', {'form': form, 'titulo_pagina': 'Editar', 'responsable_inicial': resp_init, 'proyecto_id': t.proyecto.id if t.proyecto else None})
+    return render(request, 'tasks/formulario_tarea.html', {
+        'form': form, 'titulo_pagina': 'Editar', 'responsable_inicial': resp_init, 'proyecto_id': t.proyecto.id if t.proyecto else None,
+        'form_rec': None if es_ocurrencia else form_rec, 'es_ocurrencia': es_ocurrencia,
+        'origen_id': Recurrencia.objects.filter(pk=t.recurrencia_id).values_list('origen_id', flat=True).first() if es_ocurrencia else None,
+    })
 
 @login_required
 def eliminar_tarea(request, pk):
     t = get_object_or_404(Tarea, id=pk)
-    if t.usuario != request.user: return redirect('home')
+    if not es_dueno(request, t): return redirect('home')
     p_orig = t.proyecto
     if request.method == 'POST':
         t.delete()
@@ -379,56 +728,74 @@ def crear_etiqueta(request):
 def cambiar_estado(request, pk, nuevo_estado):
     t = get_object_or_404(Tarea, id=pk)
     # Cualquiera asignado puede cambiar estado
-    if t.usuario == request.user or request.user in t.compartida_con.all() or t.responsable == request.user:
+    if participa_en_tarea(request, t):
+        estado_anterior = t.estado
         t.estado = nuevo_estado
         t.fecha_cierre = timezone.now().date() if nuevo_estado == 'COMPLETADA' else None
         t.save()
+        if estado_anterior != t.estado:
+            registrar_actividad(t, request.user, 'ESTADO', f"Estado: {t.get_estado_display()}")
         messages.success(request, f'Estado actualizado: {nuevo_estado}')
     return redirect(request.META.get('HTTP_REFERER', 'home'))
 
+def _registrar_avance(request, tarea, form, id_cliente=None):
+    """Guarda el reporte de un HistorialForm válido con todos sus efectos (web y cola offline)."""
+    # 1. Guardar el Historial (Bitácora)
+    avance = form.save(commit=False)
+    avance.tarea = tarea
+    avance.usuario = request.user
+    avance.id_cliente = id_cliente
+    # La señal de presupuesto suma el monto al total del proyecto (y avisa los
+    # umbrales que cruza) en la misma transacción que el reporte
+    with transaction.atomic():
+        avance.save()
+
+    # 2. Actualizar el Estado de la Tarea (Si se seleccionó uno nuevo)
+    nuevo_estado = form.cleaned_data.get('nuevo_estado')
+    estado_cambiado = False
+    if nuevo_estado and nuevo_estado != tarea.estado:
+        tarea.estado = nuevo_estado
+        if nuevo_estado == 'COMPLETADA':
+            tarea.fecha_cierre = timezone.now().date()
+        else:
+            tarea.fecha_cierre = None
+        tarea.save()
+        estado_cambiado = True
+
+    # Feed de actividad de todos los involucrados
+    registrar_actividad(tarea, request.user, 'AVANCE', avance.comentario, avance.monto, historial=avance)
+    if estado_cambiado:
+        registrar_actividad(tarea, request.user, 'ESTADO', f"Estado: {tarea.get_estado_display()}")
+    texto = f"@{request.user.username} reportó avance en {tarea.titulo}" + (f" ({tarea.get_estado_display()})" if estado_cambiado else '')
+    avisos.notificar(avisos.participantes(tarea), request.user, tarea, 'AVANCE', texto)
+
+    # 3. Notificar al Dueño (Radio Frecuencia)
+    # Si yo NO soy el dueño, le aviso al dueño que reporté
+    if not es_dueno(request, tarea) and tarea.usuario.email:
+        asunto = f"Avance en: {tarea.titulo}"
+        mensaje = f"""
+        El agente @{request.user.username} ha reportado novedades.
+        
+        Comentario: {avance.comentario}
+        Gasto: ${avance.monto}
+        Nuevo Estado: {nuevo_estado if estado_cambiado else 'Sin cambios'}
+        """
+        send_mail(asunto, mensaje, settings.EMAIL_HOST_USER, [tarea.usuario.email], fail_silently=True)
+    return avance
+
 @login_required
 def reportar_avance(request, pk):
     tarea = get_object_or_404(Tarea, id=pk)
     
     # Validación de acceso
-    if tarea.usuario != request.user and request.user not in tarea.compartida_con.all() and tarea.responsable != request.user:
+    if not participa_en_tarea(request, tarea):
         messages.error(request, 'No tienes permiso en esta misión.')
         return redirect('home')
 
     if request.method == 'POST':
         form = HistorialForm(request.POST, request.FILES) 
         if form.is_valid():
-            # 1. Guardar el Historial (Bitácora)
-            avance = form.save(commit=False)
-            avance.tarea = tarea
-            avance.usuario = request.user
-            avance.save()
-
-            # 2. Actualizar el Estado de la Tarea (Si se seleccionó uno nuevo)
-            nuevo_estado = form.cleaned_data.get('nuevo_estado')
-            estado_cambiado = False
-            if nuevo_estado and nuevo_estado != tarea.estado:
-                tarea.estado = nuevo_estado
-                if nuevo_estado == 'COMPLETADA':
-                    tarea.fecha_cierre = timezone.now().date()
-                else:
-                    tarea.fecha_cierre = None
-                tarea.save()
-                estado_cambiado = True
-
-            # 3. Notificar al Dueño (Radio Frecuencia)
-            # Si yo NO soy el dueño, le aviso al dueño que reporté
-            if tarea.usuario != request.user and tarea.usuario.email:
-                asunto = f"Avance en: {tarea.titulo}"
-                mensaje = f"""
-                El agente @{request.user.username} ha reportado novedades.
-                
-                Comentario: {avance.comentario}
-                Gasto: ${avance.monto}
-                Nuevo Estado: {nuevo_estado if estado_cambiado else 'Sin cambios'}
-                """
-                send_mail(asunto, mensaje, settings.EMAIL_HOST_USER, [tarea.usuario.email], fail_silently=True)
-
+            _registrar_avance(request, tarea, form)
             messages.success(request, 'Bitácora actualizada y órdenes ejecutadas.')
             
             # Retorno inteligente
@@ -477,10 +844,47 @@ def exportar_csv(request):
     r = HttpResponse(content_type='text/csv')
     r['Content-Disposition'] = 'attachment; filename="reporte.csv"'
     w = csv.writer(r)
-    w.writerow(['ID', 'Título', 'Estado', 'Proyecto'])
-    for m in Tarea.objects.filter(Q(usuario=request.user)|Q(compartida_con=request.user)): w.writerow([m.id, m.titulo, m.get_estado_display(), m.proyecto])
+    w.writerow(ENCABEZADOS)
+    tareas = Tarea.objects.filter(
+        Q(usuario=request.user)|Q(compartida_con=request.user)
+    ).distinct().select_related('proyecto', 'responsable').prefetch_related('etiquetas', 'compartida_con')
+    for m in tareas.iterator(chunk_size=500): w.writerow(fila_exportacion(m))
+    return r
+
+@login_required
+def exportar_respaldo(request):
+    """ZIP con todo el espacio de trabajo (o un proyecto, con ?proyecto=<id>), generado al vuelo."""
+    proyecto = None
+    if request.GET.get('proyecto'):
+        proyecto = get_object_or_404(Proyecto, id=request.GET['proyecto'])
+        if not es_miembro_proyecto(request, proyecto):
+            messages.error(request, 'Acceso denegado: Zona restringida.')
+            return redirect('lista_proyectos')
+    nombre = f'proyecto-{proyecto.pk}' if proyecto else f'uptask-{request.user.username}'
+    r = StreamingHttpResponse(
+        respaldo.exportar(proyecto=proyecto, usuario=None if proyecto else request.user), content_type='application/zip'
+    )
+    r['Content-Disposition'] = f'attachment; filename="{nombre}-{timezone.localdate():%Y%m%d}.zip"'
     return r
 
+@login_required
+def importar_tareas(request):
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarTareasForm(request.POST, request.FILES, user=request.user)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            # Leemos el archivo subido como texto, fila a fila (sin cargarlo entero)
+            flujo = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', newline='')
+            resultado = ImportadorTareas(
+                request.user, proyecto=form.cleaned_data['proyecto']
+            ).importar(flujo, formato=detectar_formato(archivo.name))
+            if resultado.creadas:
+                messages.success(request, f'{resultado.creadas} tareas importadas.')
+    else:
+        form = ImportarTareasForm(user=request.user)
+    return render(request, 'tasks/importar_tareas.html', {'form': form, 'resultado': resultado})
+
 def landing_page(request):
     if request.user.is_authenticated: return redirect('dashboard')
     return render(request, 'tasks/landing.html')
@@ -488,6 +892,9 @@ def landing_page(request):
 @login_required
 def detalle_tarea(request, pk):
     tarea = get_object_or_404(Tarea, pk=pk)
+    if not puede_ver_tarea(request, tarea):
+        messages.error(request, 'No tienes permiso en esta misión.')
+        return redirect('home')
     
     # --- CORRECCIÓN AQUÍ ---
     # Usamos '-fecha' porque así se llama el campo en su base de datos
@@ -495,5 +902,110 @@ def detalle_tarea(request, pk):
     
     return render(request, 'tasks/detalle_tarea.html', {
         'tarea': tarea, 
-        'bitacoras': bitacoras 
-    })
\ No newline at end of file
+        'bitacoras': bitacoras,
+        'requisitos': tarea.depende_de.all(),
+        'bloqueadas': tarea.bloquea.all(),
+        'puede_encadenar': _puede_encadenar(request, tarea),
+        'form_dependencia': DependenciaForm(tarea=tarea),
+    })
+
+# --- DEPENDENCIAS ---
+def _puede_encadenar(request, tarea):
+    # El creador de la tarea o el dueño del proyecto
+    return tarea.proyecto_id is not None and (es_dueno(request, tarea) or tarea.proyecto.usuario_id == request.user.id)
+
+@login_required
+@require_POST
+def agregar_requisito(request, pk):
+    tarea = get_object_or_404(Tarea.objects.select_related('proyecto'), pk=pk)
+    if not _puede_encadenar(request, tarea):
+        messages.error(request, 'Solo el creador de la tarea o el dueño del proyecto define sus dependencias.')
+        return redirect('detalle_tarea', pk=pk)
+
+    form = DependenciaForm(request.POST, tarea=tarea)
+    if form.is_valid():
+        try:
+            agregar_dependencia(tarea, form.cleaned_data['requisito'])
+            messages.success(request, 'Dependencia agregada.')
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+    else:
+        messages.error(request, form.errors['requisito'][0])
+    return redirect('detalle_tarea', pk=pk)
+
+@login_required
+@require_POST
+def quitar_requisito(request, pk, requisito_pk):
+    tarea = get_object_or_404(Tarea.objects.select_related('proyecto'), pk=pk)
+    if _puede_encadenar(request, tarea) and quitar_dependencia(tarea, requisito_pk):
+        messages.success(request, 'Dependencia eliminada.')
+    return redirect('detalle_tarea', pk=pk)
+
+# --- SINCRONIZACIÓN (CLIENTES OFFLINE) ---
+MAXIMO_AVANCES = 200
+
+@login_required
+def sync_cambios(request):
+    # Sin cursor es la descarga inicial; después, solo lo que cambió (ver tasks/sincronizacion.py)
+    try:
+        limite = min(max(int(request.GET.get('limite', LIMITE)), 1), LIMITE_MAXIMO)
+    except ValueError:
+        return JsonResponse({'error': 'Límite inválido.'}, status=400)
+    try:
+        return JsonResponse(pagina_de_cambios(request.user, request.GET.get('cursor'), limite))
+    except CursorInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@login_required
+@require_POST
+def sync_avances(request):
+    """
+    Cola de reportes hechos sin conexión, en el orden en que se hicieron:
+    {"avances": [{"id_cliente", "tarea", "comentario", "monto", "nuevo_estado"}, ...]}.
+    Cada uno se aplica o se rechaza por separado, y reenviar la cola no duplica
+    los que ya entraron. Los adjuntos se suben después desde la web.
+    """
+    try:
+        avances = json.loads(request.body)['avances']
+    except (ValueError, KeyError, TypeError):
+        avances = None
+    if not isinstance(avances, list) or not all(isinstance(a, dict) for a in avances):
+        return JsonResponse({'error': 'Solicitud inválida.'}, status=400)
+    if len(avances) > MAXIMO_AVANCES:
+        return JsonResponse({'error': f'Máximo {MAXIMO_AVANCES} avances por envío.'}, status=400)
+
+    claves = [str(a.get('id_cliente') or '')[:64] for a in avances]
+    tareas = Tarea.objects.select_related('usuario').in_bulk({a.get('tarea') for a in avances if isinstance(a.get('tarea'), int)})
+    cargados = dict(HistorialAvance.objects.filter(usuario=request.user, id_cliente__in=claves).values_list('id_cliente', 'id'))
+
+    resultados = []
+    for clave, datos in zip(claves, avances):
+        resultado = {'id_cliente': clave}
+        resultados.append(resultado)
+        if not clave:
+            resultado.update(estado='RECHAZADO', errores={'id_cliente': ['Obligatorio.']})
+            continue
+        if clave in cargados:
+            resultado.update(estado='DUPLICADO', id=cargados[clave])
+            continue
+        tarea = tareas.get(datos.get('tarea'))
+        if tarea is None or not participa_en_tarea(request, tarea):
+            resultado.update(estado='RECHAZADO', errores={'tarea': ['No existe o no tienes permiso en esta misión.']})
+            continue
+        form = HistorialForm({
+            'comentario': datos.get('comentario', ''), 'monto': datos.get('monto', 0), 'nuevo_estado': datos.get('nuevo_estado', ''),
+        })
+        if not form.is_valid():
+            resultado.update(estado='RECHAZADO', errores={campo: list(e) for campo, e in form.errors.items()})
+            continue
+        try:
+            with transaction.atomic():
+                avance = _registrar_avance(request, tarea, form, id_cliente=clave)
+        except IntegrityError:
+            # Entró por otro envío concurrente de la misma cola
+            avance = HistorialAvance.objects.get(usuario=request.user, id_cliente=clave)
+            resultado.update(estado='DUPLICADO', id=avance.id)
+            continue
+        cargados[clave] = avance.id
+        resultado.update(estado='CREADO', id=avance.id)
+    return JsonResponse({'resultados': resultados})